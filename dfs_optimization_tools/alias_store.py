@@ -0,0 +1,85 @@
+import logging
+import sqlite3
+
+from utils import DFSException
+
+
+class PlayerAliasStore(object):
+    # Persistent SQLite store of player name mappings resolved by fuzzy matching or by a human.
+    # Confirmed mappings and rejected pairs are scoped by season so a season can be invalidated on its own
+    def __init__(self, db_file, season=None):
+        self.db_file = db_file
+        self.season = "" if season is None else str(season)
+
+        # Cache hit/miss counters for lookups made through the store
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            self.conn = sqlite3.connect(db_file, timeout=60)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS aliases "
+                              "(season TEXT NOT NULL, name TEXT NOT NULL, pos TEXT NOT NULL, team TEXT NOT NULL, "
+                              "ref_name TEXT NOT NULL, PRIMARY KEY (season, name, pos, team))")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS rejected "
+                              "(season TEXT NOT NULL, name TEXT NOT NULL, pos TEXT NOT NULL, team TEXT NOT NULL, "
+                              "ref_name TEXT NOT NULL, PRIMARY KEY (season, name, pos, team, ref_name))")
+            self.conn.commit()
+        except sqlite3.Error as e:
+            err_msg = "Unable to open player alias store '{0}': {1}".format(db_file, e)
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+
+        # Load current season into memory so lookups don't hit the database
+        self.aliases = {}
+        self.rejected = set()
+        for name, pos, team, ref_name in self.conn.execute("SELECT name, pos, team, ref_name FROM aliases "
+                                                           "WHERE season = ?", (self.season,)):
+            self.aliases[(name, pos, team)] = ref_name
+        for name, pos, team, ref_name in self.conn.execute("SELECT name, pos, team, ref_name FROM rejected "
+                                                           "WHERE season = ?", (self.season,)):
+            self.rejected.add((name, pos, team, ref_name))
+
+    def get_alias(self, name, pos, team):
+        # Return confirmed reference name for a player or None if it hasn't been resolved before
+        ref_name = self.aliases.get((name, pos, team))
+        if ref_name is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return ref_name
+
+    def is_rejected(self, name, pos, team, ref_name):
+        return (name, pos, team, ref_name) in self.rejected
+
+    def add_alias(self, name, pos, team, ref_name):
+        self.aliases[(name, pos, team)] = ref_name
+        self.conn.execute("INSERT OR REPLACE INTO aliases VALUES (?, ?, ?, ?, ?)",
+                          (self.season, name, pos, team, ref_name))
+        self.conn.commit()
+
+    def add_rejection(self, name, pos, team, ref_name):
+        self.rejected.add((name, pos, team, ref_name))
+        self.conn.execute("INSERT OR REPLACE INTO rejected VALUES (?, ?, ?, ?, ?)",
+                          (self.season, name, pos, team, ref_name))
+        self.conn.commit()
+
+    def invalidate(self, season=None):
+        # Remove all mappings for a season (defaults to the store's season)
+        season = self.season if season is None else str(season)
+        self.conn.execute("DELETE FROM aliases WHERE season = ?", (season,))
+        self.conn.execute("DELETE FROM rejected WHERE season = ?", (season,))
+        self.conn.commit()
+        if season == self.season:
+            self.aliases = {}
+            self.rejected = set()
+        logging.info("Invalidated player alias store for season '{0}'".format(season))
+
+    def log_stats(self):
+        total = self.hits + self.misses
+        hit_rate = 100.0 * self.hits / total if total else 0.0
+        logging.info("Player alias store: {0} hits, {1} misses ({2:.1f}% hit rate)".format(self.hits,
+                                                                                           self.misses,
+                                                                                           hit_rate))
+
+    def close(self):
+        self.conn.close()
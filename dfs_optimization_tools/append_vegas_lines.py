@@ -32,13 +32,13 @@ def configure_argparser(argparser_obj):
                                required=True,
                                help="Path to harmonized player spreadsheet")
 
-    # Path to league config
+    # Path to vegas lines
     argparser_obj.add_argument("--lines",
                                action="store",
                                type=file_type,
                                dest="lines_file",
                                required=True,
-                               help="Path to vegas lines for the wee")
+                               help="Path to vegas lines for the week")
 
     # Path to output file
     argparser_obj.add_argument("--out",
@@ -77,18 +77,14 @@ def main():
     lines_file    = args.lines_file
     out_file    = args.output_file
 
-    logging.info("Reading current draft kings prices")
-    dk_df = imp.DKPriceImporter(dfs_file)
+    logging.info("Reading harmonized player data...")
+    data = pd.read_csv(harm_file)
 
-    logging.info("Reading FFA Projections...")
-    proj_df = imp.FFAProjectionsImporter(proj_file)
+    logging.info("Reading vegas lines...")
+    lines_df = imp.GameLinesImporter(lines_file)
 
-    print(proj_df.data.head(25))
-    print()
-    print(dk_df.data.head(25))
-
-    # Merge the two datasets
-    data = imp.merge_datasets(proj_df.data, ref_data=dk_df.data)
+    # Attach lines to each player by team/opponent
+    data = imp.append_game_lines(data, lines_df.data)
 
     # Write to output file
     data.to_csv(out_file, index=False)
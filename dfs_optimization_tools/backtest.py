@@ -0,0 +1,458 @@
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+import utils
+import optimizer as opt
+from result_cache import ResultCache, cached_generate_lineups
+from contest_results import ContestEvaluator, load_contest_standings
+from lineups import LineupSet
+
+# Lineup generation options that aren't lineup model options
+GENERATION_OPTIONS = {"num_lineups": 20,
+                      "max_overlap": None,
+                      "max_exposure": 1.0,
+                      "max_qb_exposure": 1.0,
+                      "backend": "pulp"}
+
+# Contest used to rank each lineup and contests used to rank each week's best lineup (first found is used)
+LINEUP_CONTEST_FILE = "du_results/wk{week}_du_5.csv"
+BEST_LINEUP_CONTEST_FILES = ["gpp_results/wk{week}_gpp_3.csv", "gpp_results/wk{week}_gpp_20.csv"]
+
+HARM_FILE_REGEX = re.compile(r"^dfk_harm_wk(\d+)_(\d+)\.csv$")
+OK_STATUS = "ok"
+ERROR_STATUS = "error"
+
+# Slates compiled by this worker process keyed by harmonized file, least recently used first. Tasks are
+# ordered by week so only the last few are kept to hold memory flat over multi-season runs
+MAX_LOADED_SLATES = 2
+_loaded_slates = OrderedDict()
+
+# Lineup result caches opened by this worker process keyed by directory
+_result_caches = {}
+
+
+def configure_argparser(argparser_obj):
+
+    def dir_type(arg_string):
+        """
+        This function checks the existance of input directory
+        :param arg_string: directory name as string
+        :return: directory name as string
+        """
+        if not os.path.isdir(arg_string):
+            err_msg = "%s does not exist! " \
+                      "Please provide a valid directory!" % arg_string
+            raise argparse.ArgumentTypeError(err_msg)
+
+        return arg_string
+
+    def file_type(arg_string):
+        """
+        This function check both the existance of input file and the file size
+        :param arg_string: file name as string
+        :return: file name as string
+        """
+        if not os.path.exists(arg_string):
+            err_msg = "%s does not exist! " \
+                      "Please provide a valid file!" % arg_string
+            raise argparse.ArgumentTypeError(err_msg)
+
+        return arg_string
+
+    # Path to data directory
+    argparser_obj.add_argument("--data-dir",
+                               action="store",
+                               type=dir_type,
+                               dest="data_dir",
+                               required=True,
+                               help="Path to data directory containing harmonized_datasets/, dfs_results/ and other/")
+
+    # Seasons to backtest
+    argparser_obj.add_argument("--seasons",
+                               action="store",
+                               type=str,
+                               dest="seasons",
+                               required=True,
+                               help="Comma-separated seasons to backtest")
+
+    # Weeks to backtest
+    argparser_obj.add_argument("--weeks",
+                               action="store",
+                               type=str,
+                               dest="weeks",
+                               default=None,
+                               help="Weeks to backtest (e.g. '1-8,10'). Defaults to every harmonized week")
+
+    # Model configurations
+    argparser_obj.add_argument("--models",
+                               action="store",
+                               type=file_type,
+                               dest="models_file",
+                               required=True,
+                               help="JSON file of {model_name: {lineup model and generation options}}")
+
+    # Path to results store
+    argparser_obj.add_argument("--output",
+                               action="store",
+                               type=str,
+                               dest="output_dir",
+                               required=True,
+                               help="Directory of Parquet result parts. Tasks already stored are skipped")
+
+    # Number of worker processes
+    argparser_obj.add_argument("--workers",
+                               action="store",
+                               type=int,
+                               dest="num_workers",
+                               default=os.cpu_count(),
+                               help="Number of worker processes")
+
+    # Rank considered paid
+    argparser_obj.add_argument("--payoff-rank",
+                               action="store",
+                               type=int,
+                               dest="payoff_rank",
+                               default=200,
+                               help="Lineups finishing at or above this rank are counted as paid")
+
+    # Path to contest standings cache directory
+    argparser_obj.add_argument("--cache-dir",
+                               action="store",
+                               type=str,
+                               dest="cache_dir",
+                               default=None,
+                               help="Directory for cached contest standings")
+
+    # Path to lineup result cache directory
+    argparser_obj.add_argument("--result-cache-dir",
+                               action="store",
+                               type=str,
+                               dest="result_cache_dir",
+                               default=None,
+                               help="Directory for cached lineups so unchanged (slate, model) pairs aren't re-solved")
+
+    # Number of results to buffer before writing a part file
+    argparser_obj.add_argument("--flush-every",
+                               action="store",
+                               type=int,
+                               dest="flush_every",
+                               default=8,
+                               help="Number of finished tasks to buffer before writing them to the store")
+
+    # Verbosity level
+    argparser_obj.add_argument("-v",
+                               action='count',
+                               dest='verbosity_level',
+                               required=False,
+                               default=0,
+                               help="Increase verbosity of the program."
+                                    "Multiple -v's increase the verbosity level:\n"
+                                    "0 = Errors\n"
+                                    "1 = Errors + Warnings\n"
+                                    "2 = Errors + Warnings + Info\n"
+                                    "3 = Errors + Warnings + Info + Debug")
+
+
+def parse_weeks(weeks_string):
+    # Parse week ranges like '1-8,10' into a sorted list of weeks
+    weeks = set()
+    for week_range in weeks_string.split(","):
+        bounds = [int(x) for x in week_range.split("-")]
+        weeks.update(range(bounds[0], bounds[-1] + 1))
+    return sorted(weeks)
+
+
+def find_harmonized_weeks(data_dir, season):
+    # Return {week: harmonized file} for a season
+    harm_dir = os.path.join(data_dir, "harmonized_datasets", season)
+    weekly_files = {}
+    if not os.path.isdir(harm_dir):
+        return weekly_files
+    for file_name in os.listdir(harm_dir):
+        match = HARM_FILE_REGEX.match(file_name)
+        if match:
+            weekly_files[int(match.group(1))] = os.path.join(harm_dir, file_name)
+    return weekly_files
+
+
+def get_task_id(season, week, model_name, model_config, payoff_rank=200):
+    # Stable id of a (season, week, model config, payoff rank) task used to resume interrupted runs.
+    # Paid lineup counts depend on payoff rank so results stored with a different one are rerun
+    task_key = json.dumps([str(season), int(week), model_name, model_config, int(payoff_rank)], sort_keys=True)
+    return hashlib.sha1(task_key.encode("utf-8")).hexdigest()[:16]
+
+
+def get_backtest_tasks(data_dir, seasons, models, weeks=None, payoff_rank=200):
+    tasks = []
+    for season in seasons:
+        harm_files = find_harmonized_weeks(data_dir, season)
+        if weeks is None:
+            season_weeks = sorted(harm_files)
+        else:
+            season_weeks = [week for week in weeks if week in harm_files]
+            for week in set(weeks) - set(season_weeks):
+                logging.warning("No harmonized dataset for season {0} week {1}. Skipping...".format(season, week))
+
+        # Order tasks by week so a worker tends to reuse the slate it already compiled
+        for week in season_weeks:
+            for model_name, model_config in models.items():
+                tasks.append({"task_id": get_task_id(season, week, model_name, model_config, payoff_rank),
+                              "season": season,
+                              "week": week,
+                              "model": model_name,
+                              "model_config": model_config,
+                              "harm_file": harm_files[week]})
+    return tasks
+
+
+def load_non_main_slate_teams(data_dir, season, week):
+    non_main_slate_file = os.path.join(data_dir, "other", "non_main_slate_teams_{0}.json".format(season))
+    if not os.path.exists(non_main_slate_file):
+        return []
+    return opt.load_non_main_slate_teams(non_main_slate_file, week)
+
+
+def load_slate(harm_file, non_main_slate_teams):
+    # Compile a slate once per worker process
+    slate_key = (harm_file, tuple(sorted(non_main_slate_teams)))
+    if slate_key in _loaded_slates:
+        _loaded_slates.move_to_end(slate_key)
+        return _loaded_slates[slate_key]
+    slate = opt.Slate.from_csv(harm_file, non_main_slate_teams)
+    _loaded_slates[slate_key] = slate
+    while len(_loaded_slates) > MAX_LOADED_SLATES:
+        _loaded_slates.popitem(last=False)
+    return slate
+
+
+def get_result_cache(result_cache_dir):
+    # Open the lineup result cache once per worker process
+    if result_cache_dir is None:
+        return None
+    if result_cache_dir not in _result_caches:
+        _result_caches[result_cache_dir] = ResultCache(result_cache_dir)
+    return _result_caches[result_cache_dir]
+
+
+def find_contest_file(data_dir, season, week, contest_files):
+    for contest_file in contest_files:
+        contest_file = os.path.join(data_dir, "dfs_results", season, contest_file.format(week=week))
+        if os.path.exists(contest_file):
+            return contest_file
+    return None
+
+
+def run_backtest_task(task, data_dir, payoff_rank=200, cache_dir=None, result_cache_dir=None):
+    # Generate lineups for one (season, week, model) and score them against actual points and contest results.
+    # Errors are returned as a result row so one bad task never stops the run
+    result = {"task_id": task["task_id"], "season": task["season"], "week": task["week"], "model": task["model"],
+              "status": OK_STATUS, "error": None}
+    start = time.perf_counter()
+    try:
+        model_config = dict(task["model_config"])
+        generation = {option: model_config.pop(option, default) for option, default in GENERATION_OPTIONS.items()}
+        pos_max = model_config.pop("pos_max", None)
+        pos_min = model_config.pop("pos_min", None)
+
+        non_main_slate_teams = load_non_main_slate_teams(data_dir, task["season"], task["week"])
+        slate = load_slate(task["harm_file"], non_main_slate_teams)
+        result["load_secs"] = time.perf_counter() - start
+
+        lineups, stats = cached_generate_lineups(get_result_cache(result_cache_dir), slate, pos_max=pos_max,
+                                                 pos_min=pos_min, **generation, **model_config)
+        result.update(stats)
+
+        score_start = time.perf_counter()
+        add_lineup_stats(result, slate, lineups, data_dir, task["season"], task["week"], payoff_rank, cache_dir)
+        result["score_secs"] = time.perf_counter() - score_start
+    except (Exception, utils.DFSException) as e:
+        logging.error("Backtest task failed (season {0}, week {1}, model {2}): {3}".format(task["season"], task["week"],
+                                                                                        task["model"], e))
+        result["status"] = ERROR_STATUS
+        result["error"] = traceback.format_exc()
+    result["total_secs"] = time.perf_counter() - start
+    return result
+
+
+def add_lineup_stats(result, slate, lineups, data_dir, season, week, payoff_rank=200, cache_dir=None):
+    # Same weekly stats as the notebook generate_weekly_lineups plus cash and ROI in the lineup contest
+    result["num_lineups"] = len(lineups)
+    if not len(lineups):
+        return
+    lineup_set = LineupSet.from_lineups(slate.num_players, lineups, len(lineups[0].player_idx), dedup=False)
+    # Players without points score 0, same as ContestEvaluator.evaluate
+    scores = np.nan_to_num(slate.actual)[lineup_set.player_idx].sum(axis=1)
+
+    lineup_contest = find_contest_file(data_dir, season, week, [LINEUP_CONTEST_FILE])
+    ranks = np.full(len(lineups), -1)
+    result["num_lineups_cashed"] = -1
+    result["winnings"] = np.nan
+    result["roi"] = np.nan
+    if lineup_contest is not None:
+        evaluator = ContestEvaluator.from_file(lineup_contest, cache_dir)
+        evaluation = evaluator.evaluate_scores(scores)
+        ranks = evaluation["rank"].to_numpy()
+        if evaluator.payout_table is not None:
+            result["num_lineups_cashed"] = int(evaluation.cash.sum())
+            result["winnings"] = evaluation.prize.sum()
+            result["roi"] = evaluator.portfolio_roi(evaluation)
+
+    best = int(np.argmax(scores))
+    result["first_team_score"] = scores[0]
+    result["first_team_rank"] = ranks[0]
+    result["best_team_score"] = scores[best]
+    result["best_team_score_order"] = best
+    result["num_lineups_paid"] = int(((ranks > 0) & (ranks <= payoff_rank)).sum())
+    result["num_gt_200"] = int((scores >= 200).sum())
+    result["points_avg"] = scores.mean()
+    result["points_sd"] = pd.Series(scores).std()
+    result["best_lineup"] = "|".join(slate.player_ids[lineups[best].player_idx])
+
+    best_contest = find_contest_file(data_dir, season, week, BEST_LINEUP_CONTEST_FILES)
+    result["best_team_rank"] = -1
+    result["best_total_entries"] = -1
+    if best_contest is not None:
+        standings = load_contest_standings(best_contest, cache_dir)
+        result["best_team_rank"], result["best_total_entries"] = standings.team_rank(scores[best])
+
+
+def cache_contest_standings(tasks, data_dir, cache_dir):
+    # Parse every contest file once up front so workers only read the compact cached arrays
+    contest_files = set()
+    for task in tasks:
+        for patterns in [[LINEUP_CONTEST_FILE], BEST_LINEUP_CONTEST_FILES]:
+            contest_file = find_contest_file(data_dir, task["season"], task["week"], patterns)
+            if contest_file is not None:
+                contest_files.add(contest_file)
+    for contest_file in sorted(contest_files):
+        try:
+            load_contest_standings(contest_file, cache_dir)
+        except (Exception, utils.DFSException) as e:
+            logging.warning("Unable to cache contest standings for {0}: {1}".format(contest_file, e))
+
+
+class ResultStore(object):
+    # Append-only store of backtest results. Every flush writes a new Parquet part file,
+    # so an interrupted run loses at most the results still buffered
+    def __init__(self, store_dir, flush_every=8):
+        self.store_dir = store_dir
+        self.flush_every = flush_every
+        self.buffer = []
+        if not os.path.isdir(store_dir):
+            os.makedirs(store_dir)
+
+    def part_files(self):
+        return sorted(glob.glob(os.path.join(self.store_dir, "part-*.parquet")))
+
+    def read(self):
+        part_files = self.part_files()
+        if not part_files:
+            return pd.DataFrame()
+        return pd.concat([pd.read_parquet(part_file) for part_file in part_files], ignore_index=True)
+
+    def completed_task_ids(self):
+        results = self.read()
+        if not len(results):
+            return set()
+        return set(results[results.status == OK_STATUS].task_id)
+
+    def append(self, result):
+        self.buffer.append(result)
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        part_file = os.path.join(self.store_dir, "part-{0}-{1}.parquet".format(time.strftime("%Y%m%d%H%M%S"),
+                                                                               len(self.part_files())))
+        # Write to temporary file first so readers never see a partial part
+        tmp_file = "{0}.tmp".format(part_file)
+        pd.DataFrame(self.buffer).to_parquet(tmp_file, index=False)
+        os.replace(tmp_file, part_file)
+        logging.debug("Wrote {0} backtest results to {1}".format(len(self.buffer), part_file))
+        self.buffer = []
+
+
+def run_backtest(tasks, data_dir, store, num_workers=None, payoff_rank=200, cache_dir=None, result_cache_dir=None):
+    # Run tasks not already in the store across a bounded process pool
+    completed = store.completed_task_ids()
+    tasks_to_run = [task for task in tasks if task["task_id"] not in completed]
+    logging.info("Running {0} of {1} backtest tasks with {2} workers".format(len(tasks_to_run), len(tasks), num_workers))
+
+    # Share parsed contest standings with workers through the standings cache
+    cache_dir = os.path.join(store.store_dir, "contest_cache") if cache_dir is None else cache_dir
+    cache_contest_standings(tasks_to_run, data_dir, cache_dir)
+
+    errors = 0
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(run_backtest_task, task, data_dir, payoff_rank, cache_dir,
+                                   result_cache_dir) for task in tasks_to_run]
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                if result["status"] != OK_STATUS:
+                    errors += 1
+                store.append(result)
+        finally:
+            store.flush()
+    return errors
+
+
+def main():
+    # Configure argparser
+    argparser = argparse.ArgumentParser(prog="backtest.py")
+    configure_argparser(argparser)
+
+    # Parse the arguments
+    args = argparser.parse_args()
+
+    # Configure logging
+    utils.configure_logging(args.verbosity_level)
+
+    with open(args.models_file, "r") as fh:
+        models = json.load(fh)
+
+    seasons = args.seasons.split(",")
+    weeks = parse_weeks(args.weeks) if args.weeks else None
+    tasks = get_backtest_tasks(args.data_dir, seasons, models, weeks, args.payoff_rank)
+    if not tasks:
+        err_msg = "No harmonized weeks found to backtest for seasons {0} in {1}".format(args.seasons, args.data_dir)
+        logging.error(err_msg)
+        raise utils.DFSException(err_msg)
+
+    store = ResultStore(args.output_dir, args.flush_every)
+    errors = run_backtest(tasks, args.data_dir, store, args.num_workers, args.payoff_rank, args.cache_dir,
+                          args.result_cache_dir)
+
+    # Summarize stored results for tasks in this run
+    task_ids = set(task["task_id"] for task in tasks)
+    results = store.read()
+    results = results[results.task_id.isin(task_ids) & (results.status == OK_STATUS)]
+    if len(results):
+        summary = results.sort_values(by=["season", "week", "model"])
+        print(summary[["season", "week", "model", "num_lineups", "best_team_score", "best_team_rank",
+                       "num_lineups_paid", "points_avg", "total_secs"]].to_string(index=False))
+        if "generation_status" in results:
+            truncated = results[results.generation_status.notnull() &
+                                ~results.generation_status.isin([opt.GENERATION_COMPLETE, opt.GENERATION_EXHAUSTED])]
+            if len(truncated):
+                logging.warning("{0} backtest tasks stopped generating lineups early ({1}). Their portfolios are "
+                                "short".format(len(truncated), ", ".join(truncated.generation_status.unique())))
+
+    if errors:
+        raise utils.DFSException("{0} backtest tasks failed! See errors in {1}".format(errors, args.output_dir))
+
+if __name__ == "__main__":
+    main()
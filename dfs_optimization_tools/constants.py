@@ -8,6 +8,14 @@ SALARY_FIELD = "salary"
 TEAM_FIELD = "team"
 OPP_TEAM_FIELD = "opp"
 HOME_TEAM_FIELD = "home_team"
+
+# Game line fields
+SPREAD_FIELD = "spread"
+MONEYLINE_FIELD = "moneyline"
+OVER_UNDER_FIELD = "over_under"
+IMPLIED_TOTAL_FIELD = "implied_total"
+OPP_IMPLIED_TOTAL_FIELD = "opp_implied_total"
+
 REQUIRED_POS = {"QB": "QB",
                 "RB": "RB",
                 "WR": "WR",
@@ -51,6 +59,42 @@ TEAM_MAP = {
     "Los Angeles": "Rams"
 }
 
+# Reference team abbreviation for each team nickname in TEAM_MAP
+TEAM_ABBREVIATIONS = {
+    "Bears": "CHI",
+    "Jets": "NYJ",
+    "Jaguars": "JAX",
+    "Saints": "NO",
+    "Patriots": "NE",
+    "Lions": "DET",
+    "Panthers": "CAR",
+    "Packers": "GB",
+    "Cowboys": "DAL",
+    "Bills": "BUF",
+    "Steelers": "PIT",
+    "Browns": "CLE",
+    "Rams": "LAR",
+    "Buccaneers": "TB",
+    "Texans": "HOU",
+    "49ers": "SF",
+    "Vikings": "MIN",
+    "Giants": "NYG",
+    "Bengals": "CIN",
+    "Redskins": "WAS",
+    "Chargers": "LAC",
+    "Eagles": "PHI",
+    "Chiefs": "KC",
+    "Seahawks": "SEA",
+    "Dolphins": "MIA",
+    "Colts": "IND",
+    "Falcons": "ATL",
+    "Titans": "TEN",
+    "Broncos": "DEN",
+    "Cardinals": "ARI",
+    "Ravens": "BAL",
+    "Raiders": "OAK"
+}
+
 team_synonyms = {
     "CHI": ["chi"],
     "NE": ["nwe", "ne"],
@@ -72,7 +116,7 @@ team_synonyms = {
     "MIN": ["min"],
     "NYG": ["nyg"],
     "CIN": ["cin"],
-    "WAS": ["was"],
+    "WAS": ["was", "wsh"],
     "LAC": ["lac", "sdg", "sd"],
     "PHI": ["phi"],
     "SEA": ["sea"],
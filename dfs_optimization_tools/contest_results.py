@@ -0,0 +1,262 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import numpy as np
+import pandas as pd
+
+from utils import DFSException
+
+RANK_FIELD = "Rank"
+POINTS_FIELD = "Points"
+CHUNK_SIZE = 250000
+
+# Contest files are named like wk3_du_5.csv (contest type and entry fee)
+CONTEST_FILE_REGEX = re.compile(r"_(du|gpp)_(\d+(?:\.\d+)?)$")
+DOUBLE_UP_CONTEST = "du"
+DOUBLE_UP_PAID_FRACTION = 0.45
+PAYOUT_FILE_SUFFIX = "_payouts.json"
+
+# Standings already loaded by this process keyed by cache key
+_loaded_standings = {}
+
+
+class ContestStandings(object):
+    # Final standings of a contest stored as compact numpy arrays.
+    # Entries are ordered by points (descending), ties broken by rank, so every lookup is a searchsorted call
+    def __init__(self, points, ranks):
+        if len(points) != len(ranks):
+            err_msg = "Different number of contest points ({0}) and ranks ({1})!".format(len(points), len(ranks))
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+
+        order = np.lexsort((ranks, -points))
+        self.points = np.ascontiguousarray(points[order], dtype=np.float64)
+        self.ranks = np.ascontiguousarray(ranks[order], dtype=np.int64)
+
+        # Ascending copy of points for searchsorted
+        self.points_asc = self.points[::-1].copy()
+
+    def __len__(self):
+        return len(self.points)
+
+    @classmethod
+    def from_csv(cls, results_file, chunksize=CHUNK_SIZE):
+        # Stream standings file in chunks reading only the rank and points columns
+        if not os.path.exists(results_file):
+            err_msg = "Contest results file does not exist: {0}".format(results_file)
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+
+        points = []
+        ranks = []
+        reader = pd.read_csv(results_file,
+                             usecols=lambda x: x.strip().capitalize() in [RANK_FIELD, POINTS_FIELD],
+                             chunksize=chunksize)
+        for chunk in reader:
+            chunk.columns = [x.strip().capitalize() for x in chunk.columns]
+            if RANK_FIELD not in chunk.columns or POINTS_FIELD not in chunk.columns:
+                err_msg = "Contest results file missing Rank/Points columns: {0}".format(results_file)
+                logging.error(err_msg)
+                raise DFSException(err_msg)
+            chunk = chunk[~pd.isnull(chunk[POINTS_FIELD]) & ~pd.isnull(chunk[RANK_FIELD])]
+            points.append(chunk[POINTS_FIELD].to_numpy(dtype=np.float64))
+            ranks.append(chunk[RANK_FIELD].to_numpy(dtype=np.int64))
+
+        if not points:
+            err_msg = "Contest results file contains no entries: {0}".format(results_file)
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+
+        return cls(np.concatenate(points), np.concatenate(ranks))
+
+    @classmethod
+    def from_npz(cls, npz_file):
+        with np.load(npz_file) as npz:
+            standings = cls.__new__(cls)
+            standings.points = npz["points"]
+            standings.ranks = npz["ranks"]
+            standings.points_asc = standings.points[::-1].copy()
+        return standings
+
+    def to_npz(self, npz_file):
+        # Write to temporary file first so other processes never read a partial file
+        tmp_file = "{0}.{1}.tmp.npz".format(os.path.splitext(npz_file)[0], os.getpid())
+        np.savez(tmp_file, points=self.points, ranks=self.ranks)
+        os.replace(tmp_file, npz_file)
+
+    def num_greater(self, team_scores):
+        # Number of entries scoring strictly more than each team score
+        return len(self.points) - np.searchsorted(self.points_asc, team_scores, side="right")
+
+    def num_greater_or_equal(self, team_scores):
+        return len(self.points) - np.searchsorted(self.points_asc, team_scores, side="left")
+
+    def team_ranks(self, team_scores):
+        # Vectorized rank each team score would have finished with in the contest. Scores that aren't
+        # finite (e.g. a lineup with a player missing points) get rank -1 instead of sorting above every entry
+        team_scores = np.asarray(team_scores, dtype=np.float64)
+        num_greater_equal = self.num_greater_or_equal(team_scores)
+
+        # Team finishes one spot behind the last entry that scored at least as much (ties included, as in the
+        # notebook get_team_rank), or first if no entry did
+        last_idx = np.maximum(num_greater_equal - 1, 0)
+        ranks = np.where(num_greater_equal == 0, 1, self.ranks[last_idx] + 1)
+        return np.where(np.isfinite(team_scores), ranks, -1)
+
+    def team_rank(self, team_score):
+        return int(self.team_ranks([team_score])[0]), len(self)
+
+    def percentiles(self, team_scores):
+        # Percent of contest entries each team score beat or tied
+        team_scores = np.asarray(team_scores, dtype=np.float64)
+        percentiles = 100.0 * (len(self.points) - self.num_greater(team_scores)) / len(self.points)
+        return np.where(np.isfinite(team_scores), percentiles, np.nan)
+
+    def payout_score(self, payout_rank=10000):
+        # Points scored by the last entry finishing at or above payout rank
+        paid = np.flatnonzero(self.ranks <= payout_rank)
+        if not len(paid):
+            err_msg = "No contest entries finished at or above rank {0}".format(payout_rank)
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+        return float(self.points[paid[-1]])
+
+
+def get_cache_key(results_file):
+    stat = os.stat(results_file)
+    cache_key = "{0}|{1}|{2}".format(os.path.abspath(results_file), stat.st_mtime_ns, stat.st_size)
+    return hashlib.sha1(cache_key.encode("utf-8")).hexdigest()[:16]
+
+
+def load_contest_standings(results_file, cache_dir=None):
+    # Load contest standings once per process, reusing the compact arrays persisted in cache_dir if available
+    cache_key = get_cache_key(results_file)
+    if cache_key in _loaded_standings:
+        return _loaded_standings[cache_key]
+
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = os.path.join(cache_dir, "{0}_{1}.npz".format(os.path.splitext(os.path.basename(results_file))[0],
+                                                                  cache_key))
+    if cache_file is not None and os.path.exists(cache_file):
+        logging.debug("Reading cached contest standings for {0} from {1}".format(results_file, cache_file))
+        standings = ContestStandings.from_npz(cache_file)
+    else:
+        logging.info("Reading contest standings from {0}".format(results_file))
+        standings = ContestStandings.from_csv(results_file)
+        if cache_file is not None:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir, exist_ok=True)
+            standings.to_npz(cache_file)
+
+    _loaded_standings[cache_key] = standings
+    return standings
+
+
+def get_team_rank(results_file, team_score, cache_dir=None):
+    return load_contest_standings(results_file, cache_dir).team_rank(team_score)
+
+
+def get_payout_score(results_file, payout_rank=10000, cache_dir=None):
+    return load_contest_standings(results_file, cache_dir).payout_score(payout_rank)
+
+
+class PayoutTable(object):
+    # Prize paid to each finishing rank. max_ranks are the last rank of each payout band (ascending)
+    def __init__(self, max_ranks, prizes, entry_fee):
+        if len(max_ranks) != len(prizes):
+            err_msg = "Different number of payout ranks ({0}) and prizes ({1})!".format(len(max_ranks), len(prizes))
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+        order = np.argsort(max_ranks)
+        self.max_ranks = np.asarray(max_ranks, dtype=np.int64)[order]
+        self.prizes = np.asarray(prizes, dtype=np.float64)[order]
+        self.entry_fee = float(entry_fee)
+
+    @classmethod
+    def double_up(cls, entry_fee, paid_rank):
+        return cls([paid_rank], [2 * entry_fee], entry_fee)
+
+    @classmethod
+    def from_json(cls, payout_file):
+        # {"entry_fee": 3, "payouts": [{"max_rank": 1, "prize": 1000}, ...]}
+        with open(payout_file, "r") as fh:
+            payouts = json.load(fh)
+        return cls([payout["max_rank"] for payout in payouts["payouts"]],
+                   [payout["prize"] for payout in payouts["payouts"]], payouts["entry_fee"])
+
+    @property
+    def paid_rank(self):
+        return int(self.max_ranks[-1]) if len(self.max_ranks) else 0
+
+    def get_prizes(self, ranks):
+        # Vectorized prize won by each finishing rank
+        ranks = np.asarray(ranks, dtype=np.int64)
+        if not len(self.max_ranks):
+            return np.zeros(ranks.shape)
+        band = np.searchsorted(self.max_ranks, ranks, side="left")
+        paid = (ranks > 0) & (band < len(self.max_ranks))
+        return np.where(paid, self.prizes[np.minimum(band, len(self.prizes) - 1)], 0.0)
+
+
+def load_payout_table(results_file, num_entries):
+    # Payout table from <contest>_payouts.json next to the results file. Double ups without one pay
+    # twice the entry fee (from the file name) to the top DOUBLE_UP_PAID_FRACTION of entries
+    contest_name = os.path.splitext(results_file)[0]
+    payout_file = contest_name + PAYOUT_FILE_SUFFIX
+    if os.path.exists(payout_file):
+        return PayoutTable.from_json(payout_file)
+
+    match = CONTEST_FILE_REGEX.search(os.path.basename(contest_name))
+    if match is not None and match.group(1) == DOUBLE_UP_CONTEST:
+        return PayoutTable.double_up(float(match.group(2)), int(num_entries * DOUBLE_UP_PAID_FRACTION))
+
+    logging.warning("No payout table for {0}. Cash and ROI will not be scored".format(results_file))
+    return None
+
+
+class ContestEvaluator(object):
+    # Scores a whole portfolio of lineups against one contest's standings and payout table in a single pass
+    def __init__(self, standings, payout_table=None):
+        self.standings = standings
+        self.payout_table = payout_table
+
+    @classmethod
+    def from_file(cls, results_file, cache_dir=None):
+        standings = load_contest_standings(results_file, cache_dir)
+        return cls(standings, load_payout_table(results_file, len(standings)))
+
+    def evaluate_scores(self, team_scores):
+        # Rank, percentile, cash flag, prize and ROI of each team score
+        team_scores = np.asarray(team_scores, dtype=np.float64)
+        if not np.all(np.isfinite(team_scores)):
+            logging.warning("{0} team scores aren't finite. They are unranked and win no prize".format(
+                int((~np.isfinite(team_scores)).sum())))
+        ranks = self.standings.team_ranks(team_scores)
+        evaluation = pd.DataFrame({"score": team_scores,
+                                   "rank": ranks,
+                                   "percentile": self.standings.percentiles(team_scores)})
+        if self.payout_table is None:
+            evaluation["cash"] = False
+            evaluation["prize"] = np.nan
+            evaluation["roi"] = np.nan
+            return evaluation
+
+        evaluation["prize"] = self.payout_table.get_prizes(ranks)
+        evaluation["cash"] = evaluation.prize > 0
+        evaluation["roi"] = evaluation.prize / self.payout_table.entry_fee - 1
+        return evaluation
+
+    def evaluate(self, lineup_set, points):
+        # Evaluate every lineup of a LineupSet given points scored by each slate player (e.g. slate.actual).
+        # Players without points score 0
+        points = np.nan_to_num(np.asarray(points, dtype=np.float64))
+        return self.evaluate_scores(points[lineup_set.player_idx].sum(axis=1))
+
+    def portfolio_roi(self, evaluation):
+        # Net return on the total entry fees of a portfolio
+        if self.payout_table is None or not len(evaluation):
+            return np.nan
+        return evaluation.prize.sum() / (len(evaluation) * self.payout_table.entry_fee) - 1
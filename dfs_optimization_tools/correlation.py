@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+
+from utils import DFSException
+import constants as cols
+
+TEAM_RELATION = "team"
+OPP_RELATION = "opp"
+CORRELATION_CACHE_VERSION = 1
+MOMENT_COLS = ["n", "sum_x", "sum_y", "sum_xy", "sum_xx", "sum_yy"]
+MIN_EIGENVALUE = 1e-6
+
+
+def get_residuals(data, min_projection=2):
+    # Standardized projection error of each player: (actual - projected) / sd.
+    # Players without a usable sd use the sd of projection errors at their position that week
+    data = data[(data[cols.PROJ_POINTS_FIELD] >= min_projection) & ~pd.isnull(data[cols.POINTS_FIELD])]
+    error = data[cols.POINTS_FIELD] - data[cols.PROJ_POINTS_FIELD]
+    sd = data[cols.PROJ_POINTS_SD_FIELD] if cols.PROJ_POINTS_SD_FIELD in data.columns else pd.Series(np.nan, index=data.index)
+    pos_sd = error.groupby(data[cols.POS_FIELD]).transform("std")
+    sd = sd.where(sd > 0, pos_sd)
+
+    residuals = pd.DataFrame({"idx": np.arange(len(data)),
+                              "pos": data[cols.POS_FIELD].to_numpy(),
+                              "team": data[cols.TEAM_FIELD].to_numpy(),
+                              "opp": data[cols.OPP_TEAM_FIELD].to_numpy(),
+                              "z": (error / sd).to_numpy(dtype=np.float64)})
+    return residuals[np.isfinite(residuals.z)]
+
+
+def get_pair_moments(residuals):
+    # Sums needed to compute the correlation of every (position, position, relation) across player pairs
+    pairs = []
+    for relation, right_on in [(TEAM_RELATION, "team"), (OPP_RELATION, "opp")]:
+        merged = residuals.merge(residuals, left_on="team", right_on=right_on, suffixes=("_a", "_b"))
+        merged = merged[merged.idx_a < merged.idx_b]
+
+        # Order each pair by position so every pair of a key is measured the same way round
+        swap = merged.pos_a > merged.pos_b
+        pairs.append(pd.DataFrame({"pos_a": np.where(swap, merged.pos_b, merged.pos_a),
+                                   "pos_b": np.where(swap, merged.pos_a, merged.pos_b),
+                                   "relation": relation,
+                                   "x": np.where(swap, merged.z_b, merged.z_a),
+                                   "y": np.where(swap, merged.z_a, merged.z_b)}))
+    pairs = pd.concat(pairs, ignore_index=True)
+    pairs["xy"] = pairs.x * pairs.y
+    pairs["xx"] = pairs.x ** 2
+    pairs["yy"] = pairs.y ** 2
+    moments = pairs.groupby(["pos_a", "pos_b", "relation"]).agg(n=("x", "size"), sum_x=("x", "sum"), sum_y=("y", "sum"),
+                                                                 sum_xy=("xy", "sum"), sum_xx=("xx", "sum"),
+                                                                 sum_yy=("yy", "sum"))
+    return moments
+
+
+def get_file_signature(harm_files):
+    signature = {}
+    for harm_file in harm_files:
+        stat = os.stat(harm_file)
+        signature[os.path.abspath(harm_file)] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def estimate_correlations(harm_files, min_projection=2, min_pairs=30):
+    # Pool player pairs across historical harmonized weeks into one correlation per (position, position, relation)
+    if not harm_files:
+        err_msg = "No harmonized datasets to estimate correlations from!"
+        logging.error(err_msg)
+        raise DFSException(err_msg)
+
+    moments = None
+    for harm_file in harm_files:
+        logging.info("Reading projection errors from {0}".format(harm_file))
+        week_moments = get_pair_moments(get_residuals(pd.read_csv(harm_file), min_projection))
+        moments = week_moments if moments is None else moments.add(week_moments, fill_value=0)
+
+    moments = moments.reset_index()
+    n = moments.n
+    cov = n * moments.sum_xy - moments.sum_x * moments.sum_y
+    var = (n * moments.sum_xx - moments.sum_x ** 2) * (n * moments.sum_yy - moments.sum_y ** 2)
+    moments["corr"] = np.where((var > 0) & (n >= min_pairs), cov / np.sqrt(var.where(var > 0, 1)), 0.0)
+    return moments[["pos_a", "pos_b", "relation", "n", "corr"]]
+
+
+class CorrelationModel(object):
+    # Correlation between the projection errors of two players given their positions and whether
+    # they're teammates or opponents. Players in different games are independent
+    def __init__(self, correlations):
+        self.correlations = {}
+        for row in correlations.itertuples(index=False):
+            self.correlations[(row.pos_a, row.pos_b, row.relation)] = float(row.corr)
+            self.correlations[(row.pos_b, row.pos_a, row.relation)] = float(row.corr)
+
+    def get_correlation(self, pos_a, pos_b, relation):
+        return self.correlations.get((pos_a, pos_b, relation), 0.0)
+
+    def get_game_matrix(self, positions, teams):
+        # Correlation matrix of players from one game
+        positions = list(positions)
+        same_team = np.equal.outer(teams, teams)
+        corr = np.empty((len(positions), len(positions)))
+        for i, pos_a in enumerate(positions):
+            for j, pos_b in enumerate(positions):
+                corr[i, j] = self.get_correlation(pos_a, pos_b, TEAM_RELATION if same_team[i, j] else OPP_RELATION)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def get_game_factors(self, positions, teams, opps):
+        # Cholesky factor of each game's correlation block as [(player indices, lower triangular factor)]
+        positions = np.asarray(positions)
+        teams = np.asarray(teams)
+        games = np.array(["_".join(sorted([team, opp])) for team, opp in zip(teams, opps)])
+        factors = []
+        for game in np.unique(games):
+            players = np.flatnonzero(games == game)
+            if len(players) < 2:
+                continue
+            corr = nearest_correlation_matrix(self.get_game_matrix(positions[players], teams[players]))
+            factors.append((players, np.linalg.cholesky(corr).astype(np.float32)))
+        return factors
+
+    def to_frame(self):
+        rows = [(pos_a, pos_b, relation, corr) for (pos_a, pos_b, relation), corr in self.correlations.items()
+                if pos_a <= pos_b]
+        return pd.DataFrame(rows, columns=["pos_a", "pos_b", "relation", "corr"])
+
+
+def nearest_correlation_matrix(corr):
+    # Clip negative eigenvalues so pooled pairwise correlations form a valid (positive definite) correlation matrix
+    eigenvalues, eigenvectors = np.linalg.eigh(corr)
+    if eigenvalues.min() >= MIN_EIGENVALUE:
+        return corr
+    corr = (eigenvectors * np.maximum(eigenvalues, MIN_EIGENVALUE)) @ eigenvectors.T
+    scale = 1 / np.sqrt(np.diag(corr))
+    return corr * np.outer(scale, scale)
+
+
+def write_correlations(cache_file, correlations, harm_files, min_projection):
+    cache = {"version": CORRELATION_CACHE_VERSION,
+             "min_projection": min_projection,
+             "files": get_file_signature(harm_files),
+             "correlations": correlations.to_dict(orient="records")}
+    with open(cache_file, "w") as fh:
+        json.dump(cache, fh, indent=2)
+
+
+def load_correlation_model(cache_file, harm_files=None, min_projection=2, min_pairs=30):
+    # Load cached correlations. If harm_files are given, correlations are re-estimated (and re-cached)
+    # whenever the historical weeks changed since the cache was written
+    cache = None
+    if os.path.exists(cache_file):
+        with open(cache_file, "r") as fh:
+            cache = json.load(fh)
+        if cache.get("version") != CORRELATION_CACHE_VERSION:
+            cache = None
+        elif harm_files is not None and (cache["files"] != get_file_signature(harm_files) or
+                                         cache["min_projection"] != min_projection):
+            logging.info("Historical weeks changed since correlations were cached. Re-estimating...")
+            cache = None
+
+    if cache is not None:
+        return CorrelationModel(pd.DataFrame(cache["correlations"]))
+
+    if harm_files is None:
+        err_msg = "Correlation cache does not exist: {0}".format(cache_file)
+        logging.error(err_msg)
+        raise DFSException(err_msg)
+
+    correlations = estimate_correlations(harm_files, min_projection, min_pairs)
+    write_correlations(cache_file, correlations, harm_files, min_projection)
+    return CorrelationModel(correlations)
@@ -1,11 +1,17 @@
+import hashlib
 import logging
+import os
 import re
 from fuzzywuzzy import fuzz
+import numpy as np
 import pandas as pd
 
 from utils import DFSException
 import constants as cols
 
+# Column holding the dataframe index in cached imports
+CACHE_INDEX_FIELD = "__index__"
+
 def clean_string_for_file_name(value):
     clean_val = re.sub('[^\w\s-]', '', value).strip().lower()
     clean_val = re.sub('[-\s]+', '-', clean_val)
@@ -17,59 +23,169 @@ def normalize_string(value):
     return clean_val
 
 
+def build_team_index():
+    # Inverted index from every known (lower-cased) team spelling to its reference team abbreviation
+    team_index = {}
+
+    # City names and nicknames
+    for city, nickname in cols.TEAM_MAP.items():
+        team_index[city.lower()] = cols.TEAM_ABBREVIATIONS[nickname]
+        team_index[nickname.lower()] = cols.TEAM_ABBREVIATIONS[nickname]
+
+    # Synonyms take precedence over city names. First reference team listing a synonym wins
+    synonym_index = {}
+    for ref_team_name, team_syns in cols.team_synonyms.items():
+        for team_syn in team_syns:
+            if team_syn.lower() not in synonym_index:
+                synonym_index[team_syn.lower()] = ref_team_name
+    team_index.update(synonym_index)
+
+    # Reference abbreviations always map to themselves
+    for ref_team_name in cols.team_synonyms:
+        team_index[ref_team_name.lower()] = ref_team_name
+    return team_index
+
+
+# Built once at import and shared by every import path
+TEAM_INDEX = build_team_index()
+
+
+def harmonize_team_series(series):
+    # Map a series of team names to reference teams with one lookup per distinct team. Unknown teams become None
+    team_codes, teams = pd.factorize(series)
+    ref_teams = np.array([TEAM_INDEX.get(str(team).lower()) for team in teams] + [None], dtype=object)
+    return pd.Series(ref_teams[team_codes], index=series.index)
+
+
+def map_unique_values(series, func):
+    # Apply a function once per unique value of a series instead of once per row
+    return series.map({value: func(value) for value in series.unique()})
+
+
 def match_ref_player(name, pos, team, reference_names, reference_pos, reference_teams, match_threshold=90, min_match_threshold=70):
     # Find reference name for a player to harmonize names across two datasets
+    name_index = PlayerNameIndex(reference_names, reference_pos, reference_teams)
+    return name_index.match(name, pos, team, match_threshold, min_match_threshold)
+
+
+class PlayerNameIndex(object):
+    # Index of reference player names built once per reference dataset.
+    # Exact matches are resolved through (normalized name, position, team) buckets and fuzzy matching
+    # only scores reference names whose character counts leave them a chance of clearing the threshold
+    def __init__(self, reference_names, reference_pos, reference_teams):
+
+        # Check to see if reference names, pos are same length
+        if len(reference_names) != len(reference_pos) or len(reference_names) != len(reference_teams):
+            err_msg = "Different number of reference names ({0}), " \
+                      "positions ({1}), and teams({2})!".format(len(reference_names),
+                                                                len(reference_pos),
+                                                                len(reference_teams))
+            logging.error(err_msg)
+            raise DFSException(err_msg)
 
-    # Check to see if reference names, pos are same length
-    if len(reference_names) != len(reference_pos) or len(reference_names) != len(reference_teams):
-        err_msg = "Different number of reference names ({0}), " \
-                  "positions ({1}), and teams({2})!".format(len(reference_names),
-                                                            len(reference_pos),
-                                                            len(reference_teams))
-        logging.error(err_msg)
-        raise DFSException(err_msg)
-
-    # Normalize player names to remove differences in cases and punctuation
-    norm_name = normalize_string(name)
-
-    # Generate normalized list of reference players
-    norm_reference_names = {}
-    for i in range(len(reference_names)):
-        norm_ref_name = normalize_string(reference_names[i])
-        if norm_ref_name in norm_reference_names:
-            norm_reference_names[norm_ref_name].append((reference_names[i], reference_pos[i], reference_teams[i]))
-        else:
-            norm_reference_names[norm_ref_name] = [(reference_names[i], reference_pos[i], reference_teams[i])]
+        self.reference_names = set(reference_names)
+        self.reference_players = set(zip(reference_names, reference_pos, reference_teams))
 
-    if norm_name in norm_reference_names:
-        for player in norm_reference_names[norm_name]:
-            if pos == player[1] and team == player[2]:
+        # Reference players grouped by normalized name (in reference order) and exact match buckets
+        self.norm_reference_names = {}
+        self.exact_matches = {}
+        for ref_name, ref_pos, ref_team in zip(reference_names, reference_pos, reference_teams):
+            norm_ref_name = normalize_string(ref_name)
+            if norm_ref_name in self.norm_reference_names:
+                self.norm_reference_names[norm_ref_name].append((ref_name, ref_pos, ref_team))
+            else:
+                self.norm_reference_names[norm_ref_name] = [(ref_name, ref_pos, ref_team)]
+            if (norm_ref_name, ref_pos, ref_team) not in self.exact_matches:
+                self.exact_matches[(norm_ref_name, ref_pos, ref_team)] = ref_name
+
+        # Character count matrix used to bound fuzzy match scores before computing them
+        self.norm_name_list = list(self.norm_reference_names)
+        self.char_cols = {}
+        for norm_ref_name in self.norm_name_list:
+            for char in norm_ref_name:
+                if char not in self.char_cols:
+                    self.char_cols[char] = len(self.char_cols)
+
+        self.char_counts = np.zeros((len(self.norm_name_list), max(len(self.char_cols), 1)), dtype=np.int32)
+        for i, norm_ref_name in enumerate(self.norm_name_list):
+            for char in norm_ref_name:
+                self.char_counts[i, self.char_cols[char]] += 1
+        self.name_lengths = np.array([len(x) for x in self.norm_name_list], dtype=np.int32)
+
+    @classmethod
+    def from_data(cls, ref_data):
+        return cls(ref_data[cols.NAME_FIELD].tolist(),
+                   ref_data[cols.POS_FIELD].tolist(),
+                   ref_data[cols.TEAM_FIELD].tolist())
+
+    def fuzzy_candidates(self, norm_name, min_ratio):
+        # Return reference names (in reference order) that could have a partial_ratio >= min_ratio.
+        # partial_ratio compares the shorter string (length L) to a window of the longer one, so
+        # with c characters in common the score can never exceed 200*c/(L+c)
+        if min_ratio <= 0:
+            return list(self.norm_name_list)
+
+        query_counts = {}
+        for char in norm_name:
+            if char in self.char_cols:
+                query_counts[char] = query_counts.get(char, 0) + 1
+
+        if not query_counts:
+            return []
+
+        char_idx = [self.char_cols[char] for char in query_counts]
+        common = np.minimum(self.char_counts[:, char_idx], np.array(list(query_counts.values()))).sum(axis=1)
+        shorter = np.minimum(self.name_lengths, len(norm_name))
+        max_ratio = 200.0 * common / np.maximum(shorter + common, 1)
+
+        # Allow a point of slack so rounding inside fuzzywuzzy can never flip a result
+        return [self.norm_name_list[i] for i in np.flatnonzero(max_ratio + 1 >= min_ratio)]
+
+    def match(self, name, pos, team, match_threshold=90, min_match_threshold=70, norm_name=None, alias_store=None,
+              review_queue=None):
+        # Find reference name for a player to harmonize names across two datasets.
+        # If a review queue is provided, uncertain matches are queued for review instead of prompting the user
+
+        # Normalize player names to remove differences in cases and punctuation
+        norm_name = normalize_string(name) if norm_name is None else norm_name
+
+        if norm_name in self.norm_reference_names:
+            if (norm_name, pos, team) in self.exact_matches:
                 # Return name if name matches and same position
-                if name not in reference_names:
-                    print(norm_name)
+                ref_name = self.exact_matches[(norm_name, pos, team)]
+                if name not in self.reference_names:
                     logging.debug("Normalizing resolved names: {0} | {1}".format(norm_name,
-                                                                                 player[0]))
-                return player[0]
+                                                                                 ref_name))
+                return ref_name
 
-        # Return none if can't find player match
-        logging.warning("Player name matched but we disagree on position and/or team:\n"
-                        "Name: {0} ({1}, {2})".format(name,pos,team))
-        return None
+            # Return none if can't find player match
+            logging.warning("Player name matched but we disagree on position and/or team:\n"
+                            "Name: {0} ({1}, {2})".format(name, pos, team))
+            return None
+
+        # Use mapping resolved in a previous run if it still points to a reference player with the same
+        # position and team (a stale alias may point to a player who has since moved)
+        if alias_store is not None:
+            ref_name = alias_store.get_alias(name, pos, team)
+            if ref_name is not None and (ref_name, pos, team) in self.reference_players:
+                logging.debug("Player alias store resolved names: {0} | {1}".format(name, ref_name))
+                return ref_name
 
-    elif norm_name not in norm_reference_names:
         # Do fuzzy matching to see if name closely matches another name
         # Store results in case none exceed fuzzy match threshold and human input needed
         match_results = []
-        for norm_ref_name in norm_reference_names:
+        for norm_ref_name in self.fuzzy_candidates(norm_name, min(match_threshold + 1, min_match_threshold)):
             match_ratio = fuzz.partial_ratio(norm_name, norm_ref_name)
 
             # Return name if fuzzy match is over threshold
             if match_ratio > match_threshold:
-                for player in norm_reference_names[norm_ref_name]:
+                for player in self.norm_reference_names[norm_ref_name]:
                     if player[1] == pos and player[2] == team:
-                        print(match_ratio)
+                        logging.debug("Fuzzy match ratio: {0}".format(match_ratio))
                         logging.warning("Fuzzy match resolved names: {0} | {1}".format(norm_name,
-                                                                                       norm_reference_names[norm_ref_name][0]))
+                                                                                       self.norm_reference_names[norm_ref_name][0]))
+                        if alias_store is not None:
+                            alias_store.add_alias(name, pos, team, player[0])
                         return player[0]
 
                 # Return none if can't find player match with same team/pos
@@ -80,53 +196,74 @@ def match_ref_player(name, pos, team, reference_names, reference_pos, reference_
             # Otherwise add match results to list of names
             match_results.append((norm_ref_name, match_ratio))
 
-    # If no matches found > match threshold, ask user if any matches are correct
-    match_results = sorted(match_results, key=lambda x: x[1], reverse=True)
-    for match_result in match_results:
-        # Break loop and return if the next closest match is below minimum match threshold
-        if match_result[1] < min_match_threshold:
-            logging.warning("Unable to match player: {0}".format(name))
-            return None
+        # If no matches found > match threshold, ask user if any matches are correct
+        match_results = sorted(match_results, key=lambda x: x[1], reverse=True)
+        for match_result in match_results:
+            # Break loop and return if the next closest match is below minimum match threshold
+            if match_result[1] < min_match_threshold:
+                logging.warning("Unable to match player: {0}".format(name))
+                return None
+
+            for player in self.norm_reference_names[match_result[0]]:
+                # Ask for user input to determine whether match is correct
+                ref_player = player[0]
+                ref_pos    = player[1]
+                ref_team   = player[2]
+
+                # Skip pairs that were already rejected in a previous run
+                if alias_store is not None and alias_store.is_rejected(name, pos, team, ref_player):
+                    continue
+
+                # Defer decision to review instead of blocking on user input
+                if review_queue is not None:
+                    review_queue.add(name, pos, team, ref_player, ref_pos, ref_team, match_result[1])
+                    continue
+
+                is_match = None
+                while is_match not in ["0", "1"]:
+                    is_match = input("Is this the same player (match score: {0})? "
+                                     "{0} ({1}, {2}) and {3} ({4}, {5}) [0=No, 1=Yes]: ".format(match_result[1],
+                                                                                                name,
+                                                                                                pos,
+                                                                                                team,
+                                                                                                ref_player,
+                                                                                                ref_pos,
+                                                                                                ref_team))
+                # Return player name if user thinks it's a match
+                if is_match == "1":
+                    if alias_store is not None:
+                        alias_store.add_alias(name, pos, team, ref_player)
+                    return ref_player
+                elif alias_store is not None:
+                    alias_store.add_rejection(name, pos, team, ref_player)
+
+        # If user loops through all potential matches and doesn't agree, return None
+        logging.warning("Unable to match player: {0}".format(name))
+        return None
+
+    def match_frame(self, data, match_threshold=90, min_match_threshold=70, alias_store=None, review_queue=None):
+        # Resolve reference names for every row of a player dataframe in a single pass
+        norm_names = data[cols.NAME_FIELD].str.replace(r'[^\w\s-]', '', regex=True).str.strip().str.lower()
+        ref_names = [self.match(name, pos, team, match_threshold, min_match_threshold,
+                                norm_name=norm_name, alias_store=alias_store, review_queue=review_queue)
+                     for name, pos, team, norm_name in zip(data[cols.NAME_FIELD],
+                                                           data[cols.POS_FIELD],
+                                                           data[cols.TEAM_FIELD],
+                                                           norm_names)]
+        return pd.Series(ref_names, index=data.index)
 
-        for player in norm_reference_names[match_result[0]]:
-            # Ask for user input to determine whether match is correct
-            ref_player = player[0]
-            ref_pos    = player[1]
-            ref_team   = player[2]
-            is_match = None
-            while is_match not in ["0", "1"]:
-                is_match = input("Is this the same player (match score: {0})? "
-                                 "{0} ({1}, {2}) and {3} ({4}, {5}) [0=No, 1=Yes]: ".format(match_result[1],
-                                                                                            name,
-                                                                                            pos,
-                                                                                            team,
-                                                                                            ref_player,
-                                                                                            ref_pos,
-                                                                                            ref_team))
-            # Return player name if user thinks it's a match
-            if is_match == "1":
-                return ref_player
-
-    # If user loops through all potential matches and doesn't agree, return None
-    logging.warning("Unable to match player: {0}".format(name))
-    return None
-
-
-def harmonize_player_names(data, ref_data, match_threshold=90, min_match_threshold=75):
+
+def harmonize_player_names(data, ref_data, match_threshold=90, min_match_threshold=75, name_index=None, alias_store=None,
+                           review_queue=None):
     # Apply fuzzing matching
     old_data = data.copy()
 
-    def harm_names(row):
-        return match_ref_player(row[cols.NAME_FIELD],
-                                row[cols.POS_FIELD],
-                                row[cols.TEAM_FIELD],
-                                ref_data[cols.NAME_FIELD].tolist(),
-                                ref_data[cols.POS_FIELD].tolist(),
-                                ref_data[cols.TEAM_FIELD].tolist(),
-                                match_threshold,
-                                min_match_threshold)
+    # Build index of reference players unless one was already built for this reference dataset
+    if name_index is None:
+        name_index = PlayerNameIndex.from_data(ref_data)
 
-    data[cols.NAME_FIELD] = data.apply(harm_names, axis=1)
+    data[cols.NAME_FIELD] = name_index.match_frame(data, match_threshold, min_match_threshold,
+                                                   alias_store=alias_store, review_queue=review_queue)
 
     # Remove players that weren't found in reference dataset
     dropped_players = old_data[pd.isnull(data[cols.NAME_FIELD])]
@@ -136,10 +273,11 @@ def harmonize_player_names(data, ref_data, match_threshold=90, min_match_thresho
     return data[~pd.isnull(data[cols.NAME_FIELD])].copy()
 
 
-def merge_datasets(data, ref_data):
+def merge_datasets(data, ref_data, name_index=None, alias_store=None, review_queue=None):
 
     # Harmonize data so it's in same team/player namespace as reference dataset
-    data = harmonize_player_names(data, ref_data)
+    data = harmonize_player_names(data, ref_data, name_index=name_index, alias_store=alias_store,
+                                  review_queue=review_queue)
 
     # Merge dataframes
     merged_data = ref_data.merge(data, how="inner", on=[cols.NAME_FIELD, cols.TEAM_FIELD, cols.POS_FIELD])
@@ -149,8 +287,55 @@ def merge_datasets(data, ref_data):
 class PlayerDataImporter(object):
     REQUIRED_COLS = []
 
-    def __init__(self, source=None):
-        self.data = self.get_data(source)
+    # Bump when an importer's output changes so cached imports are rebuilt
+    CACHE_VERSION = 1
+
+    def __init__(self, source=None, cache_dir=None):
+        self.cache_dir = cache_dir
+        if cache_dir is None:
+            self.data = self.get_data(source)
+        else:
+            self.data = self.get_cached_data(source)
+
+    def get_cache_file(self, source):
+        # Cache file is keyed by source path, modification time, size and importer version
+        stat = os.stat(source)
+        cache_key = "{0}|{1}|{2}|{3}|{4}".format(os.path.abspath(source),
+                                                 stat.st_mtime_ns,
+                                                 stat.st_size,
+                                                 self.__class__.__name__,
+                                                 self.CACHE_VERSION)
+        cache_hash = hashlib.sha1(cache_key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, "{0}_{1}_{2}.feather".format(self.__class__.__name__,
+                                                                         clean_string_for_file_name(os.path.basename(source)),
+                                                                         cache_hash))
+
+    def get_cached_data(self, source):
+        # Return imported data from columnar cache if available, otherwise import and cache it
+        try:
+            import pyarrow.feather as feather
+        except ImportError:
+            logging.warning("pyarrow not installed! Unable to cache imported player data")
+            return self.get_data(source)
+
+        cache_file = self.get_cache_file(source)
+        if os.path.exists(cache_file):
+            logging.debug("Reading cached import of {0} from {1}".format(source, cache_file))
+            data = feather.read_table(cache_file, memory_map=True).to_pandas()
+            data = data.set_index(CACHE_INDEX_FIELD)
+            data.index.name = None
+            return data
+
+        data = self.get_data(source)
+
+        # Write to temporary file first so other processes never read a partial cache file
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_file = "{0}.{1}.tmp".format(cache_file, os.getpid())
+        data.rename_axis(CACHE_INDEX_FIELD).reset_index().to_feather(tmp_file)
+        os.replace(tmp_file, cache_file)
+        logging.debug("Cached import of {0} to {1}".format(source, cache_file))
+        return data
 
     def get_data(self, source):
         # Read data
@@ -233,25 +418,16 @@ class PlayerDataImporter(object):
             raise IOError("Unable to import data from source: {0}\nFile handle must be .csv or .xlsx!".format(source))
 
     def harmonize_team(self, team_name):
-        if team_name.upper() in cols.team_synonyms:
-            #logging.debug("Found team exactly in team synonym list {0}".format(team_name.upper()))
-            return team_name.upper()
-        for ref_team_name, team_syns in cols.team_synonyms.items():
-            team_syns = [team_syn.lower() for team_syn in team_syns]
-            if team_name.lower() in team_syns:
-                logging.debug("Used synonym list to match team {0} to {1}".format(team_name, ref_team_name))
-                return ref_team_name
-        return None
+        return TEAM_INDEX.get(team_name.lower())
 
     def harmonize_teams(self, data, team_col=cols.TEAM_FIELD):
-        team_map = {team: self.harmonize_team(team) for team in data[team_col].unique()}
-        for team in team_map:
-            if team is None:
-                logging.error("Unable to map team '{0}' to reference teams!".format(team))
-                raise DFSException("Unable to harmonize teams from input source!")
-
         # Map team names to reference name
-        data[team_col] = data[team_col].map(team_map)
+        ref_teams = harmonize_team_series(data[team_col])
+        unmapped = data[team_col][pd.isnull(ref_teams) & ~pd.isnull(data[team_col])].unique()
+        for team in unmapped:
+            logging.warning("Unable to map team '{0}' to reference teams!".format(team))
+
+        data[team_col] = ref_teams
         return data
 
     def preprocess_data(self, data):
@@ -264,8 +440,8 @@ class PlayerDataImporter(object):
 class DKResultsImporter(PlayerDataImporter):
     REQUIRED_COLS = [cols.OPP_TEAM_FIELD, cols.POINTS_FIELD, cols.SALARY_FIELD]
 
-    def __init__(self, source):
-         super().__init__(source)
+    def __init__(self, source, cache_dir=None):
+         super().__init__(source, cache_dir)
 
     def preprocess_data(self, data):
 
@@ -282,26 +458,19 @@ class DKResultsImporter(PlayerDataImporter):
         # Replace def with D in pos field
         data[cols.POS_FIELD] = data[cols.POS_FIELD].str.replace("Def", cols.REQUIRED_POS["D"])
 
-        # Split out player names from commas
-        def fix_player_name(name):
-            name = [x.strip() for x in name.split(",")]
-            if len(name) > 1:
-                # Return player names in firstname lastname order
-                return " ".join([name[1], name[0]])
-            else:
-                # Return team defense by team name
-                name = name[0].replace("Defense", "").strip()
-                return cols.TEAM_MAP[name]
-
-        data[cols.NAME_FIELD] = data[cols.NAME_FIELD].map(fix_player_name)
+        # Split out player names from commas and return player names in firstname lastname order
+        name_parts = data[cols.NAME_FIELD].str.split(",")
+        last_names = name_parts.str[0].str.strip()
+        player_names = name_parts.str[1].str.strip() + " " + last_names
 
-        def home_away_to_boolean(home_away):
-            if home_away == "h":
-                return True
-            return False
+        # Return team defense by team name
+        is_defense = name_parts.str.len() == 1
+        def_names = map_unique_values(last_names[is_defense].str.replace("Defense", "").str.strip(),
+                                      lambda name: cols.TEAM_MAP[name])
+        data[cols.NAME_FIELD] = player_names.where(~is_defense, def_names).astype(data[cols.NAME_FIELD].dtype)
 
         # Convert home/away to boolean field
-        data[cols.HOME_TEAM_FIELD] = data[cols.HOME_TEAM_FIELD].map(home_away_to_boolean)
+        data[cols.HOME_TEAM_FIELD] = data[cols.HOME_TEAM_FIELD] == "h"
 
         # Remove any players with null salaries
         data = data[~pd.isnull(data[cols.SALARY_FIELD])]
@@ -314,8 +483,8 @@ class DKResultsImporter(PlayerDataImporter):
 class DKPriceImporter(PlayerDataImporter):
     REQUIRED_COLS = [cols.OPP_TEAM_FIELD, cols.POINTS_FIELD, cols.SALARY_FIELD]
 
-    def __init__(self, source):
-         super().__init__(source)
+    def __init__(self, source, cache_dir=None):
+         super().__init__(source, cache_dir)
 
     def preprocess_data(self, data):
 
@@ -327,25 +496,20 @@ class DKPriceImporter(PlayerDataImporter):
         # Rename columns to standard
         data = data[["Name", "Roster Position", "Game Info", "TeamAbbrev", "AvgPointsPerGame", "Salary"]].copy()
 
-        # Parse out home and opponent teams
-        def get_opp_team(row):
-            player_team = row["TeamAbbrev"]
-            field = row["Game Info"]
-            for team in field.split()[0].split("@"):
-                if team != player_team:
-                    return team
-
-        data[cols.OPP_TEAM_FIELD] = data.apply(get_opp_team, axis=1)
+        # Parse out away/home teams once per game and use whichever isn't the player's team as opponent
+        game_codes, game_infos = pd.factorize(data["Game Info"])
+        game_teams = [game_info.split()[0].split("@") for game_info in game_infos]
+        away_teams = np.array([teams[0] for teams in game_teams], dtype=object)[game_codes]
+        home_teams = np.array([teams[1] if len(teams) > 1 else None for teams in game_teams], dtype=object)[game_codes]
+        opp_teams = np.where(away_teams != data["TeamAbbrev"].to_numpy(dtype=object), away_teams, home_teams)
+        data[cols.OPP_TEAM_FIELD] = pd.Series(opp_teams.tolist(), index=data.index)
         data = data[["Name", "Roster Position", "TeamAbbrev", cols.OPP_TEAM_FIELD, "AvgPointsPerGame", "Salary"]].copy()
         data.columns = [cols.NAME_FIELD,cols.POS_FIELD, cols.TEAM_FIELD,
                         cols.OPP_TEAM_FIELD, cols.POINTS_FIELD, cols.SALARY_FIELD]
 
         # Replace DST with D in pos field
-        def fix_pos(field):
-            return field.split("/")[0]
-
-        data[cols.POS_FIELD] = data[cols.POS_FIELD].map(fix_pos)
-        data[cols.POS_FIELD] = data[cols.POS_FIELD].str.replace("DST", cols.REQUIRED_POS["D"])
+        data[cols.POS_FIELD] = map_unique_values(data[cols.POS_FIELD],
+                                                 lambda field: field.split("/")[0].replace("DST", cols.REQUIRED_POS["D"]))
         return data
 
     def postprocess_data(self, data):
@@ -355,8 +519,8 @@ class DKPriceImporter(PlayerDataImporter):
 class FFAProjectionsImporter(PlayerDataImporter):
     REQUIRED_COLS = [cols.PROJ_POINTS_FIELD, cols.PROJ_POINTS_SD_FIELD]
 
-    def __init__(self, source):
-        super().__init__(source)
+    def __init__(self, source, cache_dir=None):
+        super().__init__(source, cache_dir)
 
     def preprocess_data(self, data):
         assert "_".join(data.columns[0:5]) == "_".join(["playerId", "player", "team", "position", "age"]), \
@@ -389,3 +553,68 @@ class FFAProjectionsImporter(PlayerDataImporter):
         data = data[~pd.isnull(data[cols.PROJ_POINTS_FIELD])]
         data = data[data[cols.TEAM_FIELD] != "FA"]
         return data
+
+
+class GameLinesImporter(PlayerDataImporter):
+    # Weekly vegas lines with one row per team: Team, Opp ("vs. MIA" at home, "@ CLE" away), Time, Line, Money,
+    # Implied Points
+    REQUIRED_COLS = [cols.TEAM_FIELD, cols.OPP_TEAM_FIELD, cols.SPREAD_FIELD, cols.IMPLIED_TOTAL_FIELD]
+
+    def __init__(self, source, cache_dir=None):
+        super().__init__(source, cache_dir)
+
+    def get_data(self, source):
+        # Game lines have no players so skip the player/position checks of a draftboard import
+        data = self.preprocess_data(self.read_data(source))
+        self.validate_cols(data, required_cols=self.REQUIRED_COLS)
+
+        # Harmonize teams and opponents so lines join on the same codes as harmonized player data
+        data = self.harmonize_teams(data)
+        data = self.harmonize_teams(data, team_col=cols.OPP_TEAM_FIELD)
+        data = data[~pd.isnull(data[cols.TEAM_FIELD]) & ~pd.isnull(data[cols.OPP_TEAM_FIELD])]
+        data = data.drop_duplicates(subset=[cols.TEAM_FIELD]).reset_index(drop=True)
+        return self.postprocess_data(data)
+
+    def preprocess_data(self, data):
+        assert {"Team", "Opp", "Line", "Money", "Implied Points"}.issubset(data.columns), \
+            "Unexpected columns for Game Lines Importer!"
+
+        # Rename columns to standard
+        data = data[["Team", "Opp", "Line", "Money", "Implied Points"]].copy()
+        data.columns = [cols.TEAM_FIELD, cols.OPP_TEAM_FIELD, cols.SPREAD_FIELD,
+                        cols.MONEYLINE_FIELD, cols.IMPLIED_TOTAL_FIELD]
+
+        # Split home/away marker from opponent
+        opp_parts = data[cols.OPP_TEAM_FIELD].astype(str).str.split()
+        data[cols.HOME_TEAM_FIELD] = opp_parts.str[0].str.lower().str.startswith("vs")
+        data[cols.OPP_TEAM_FIELD] = opp_parts.str[-1]
+        return data
+
+    def postprocess_data(self, data):
+        # Opponent implied totals from one self merge on team. If the opponent's row is missing
+        # its implied total is implied total + spread
+        opp_totals = data[[cols.TEAM_FIELD, cols.IMPLIED_TOTAL_FIELD]]
+        opp_totals.columns = [cols.OPP_TEAM_FIELD, cols.OPP_IMPLIED_TOTAL_FIELD]
+        data = data.merge(opp_totals, how="left", on=cols.OPP_TEAM_FIELD)
+        data[cols.OPP_IMPLIED_TOTAL_FIELD] = data[cols.OPP_IMPLIED_TOTAL_FIELD].fillna(data[cols.IMPLIED_TOTAL_FIELD] +
+                                                                                       data[cols.SPREAD_FIELD])
+        data[cols.OVER_UNDER_FIELD] = data[cols.IMPLIED_TOTAL_FIELD] + data[cols.OPP_IMPLIED_TOTAL_FIELD]
+        return data
+
+
+# Game line features attached to each player
+GAME_LINES_FIELDS = [cols.SPREAD_FIELD, cols.MONEYLINE_FIELD, cols.OVER_UNDER_FIELD,
+                     cols.IMPLIED_TOTAL_FIELD, cols.OPP_IMPLIED_TOTAL_FIELD]
+
+
+def append_game_lines(data, lines):
+    # Attach game lines to harmonized player data with a single merge on team/opp. Players without a line get NaNs
+    data = data.drop(columns=[col for col in GAME_LINES_FIELDS if col in data.columns])
+    merged_data = data.merge(lines[[cols.TEAM_FIELD, cols.OPP_TEAM_FIELD] + GAME_LINES_FIELDS],
+                             how="left", on=[cols.TEAM_FIELD, cols.OPP_TEAM_FIELD], validate="many_to_one")
+    merged_data.index = data.index
+
+    missing_teams = merged_data[cols.TEAM_FIELD][pd.isnull(merged_data[cols.SPREAD_FIELD])].unique()
+    for team in missing_teams:
+        logging.warning("No game line found for team '{0}'!".format(team))
+    return merged_data
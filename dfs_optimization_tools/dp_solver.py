@@ -0,0 +1,426 @@
+import heapq
+import logging
+import time
+from itertools import product
+import numpy as np
+import scipy.sparse as sp
+
+from utils import DFSException
+import optimizer as opt
+import lineups
+
+MAX_SALARY_BUCKETS = 2000
+DEFAULT_MAX_NODES = 100000
+# Knapsack tables and position curves kept per template solver. Tables are (max_count + 1) x num_buckets
+# so their size depends on salary resolution; the cache is cleared once it holds this many bytes
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+EPSILON = 1e-9
+
+
+def get_salary_unit(salaries, salary_cap):
+    # Largest salary unit that divides every salary and the cap, so salaries become small integer buckets
+    salaries = np.asarray(salaries)
+    if not np.allclose(salaries, np.round(salaries)):
+        err_msg = "DP solver requires integer salaries!"
+        logging.error(err_msg)
+        raise DFSException(err_msg)
+    unit = int(np.gcd.reduce(np.append(np.round(salaries).astype(np.int64), int(salary_cap))))
+    return max(unit, 1)
+
+
+def knapsack_tables(values, weights, max_count, num_buckets):
+    # best[c, s] is the best total value of exactly c players with total salary at most s buckets.
+    # keep[j, c, s] records whether player j was taken to reach best[c, s] so lineups can be rebuilt
+    best = np.full((max_count + 1, num_buckets), -np.inf)
+    best[0] = 0.0
+    keep = np.zeros((len(values), max_count + 1, num_buckets), dtype=bool)
+    if not max_count:
+        return best, keep
+    for j, (value, weight) in enumerate(zip(values, weights)):
+        if weight >= num_buckets:
+            continue
+        candidate = best[:-1, :num_buckets - weight] + value
+        better = candidate > best[1:, weight:]
+        best[1:, weight:] = np.where(better, candidate, best[1:, weight:])
+        keep[j, 1:, weight:] = better
+    return best, keep
+
+
+def knapsack_players(keep, weights, count, budget):
+    # Players chosen for (count, budget) by knapsack_tables
+    chosen = []
+    for j in range(len(keep) - 1, -1, -1):
+        if count == 0:
+            break
+        if keep[j, count, budget]:
+            chosen.append(j)
+            count -= 1
+            budget -= weights[j]
+    return chosen
+
+
+class TemplateSolver(object):
+    # Exact solver for a roster template: exactly roster_size players, salary cap and min/max players per position.
+    # Each position is solved as a salary bucketed knapsack per player count, then positions are combined with
+    # max-plus convolutions over salary for every valid count per position (e.g. 3/3/1, 2/4/1, 2/3/2 RB/WR/TE)
+    def __init__(self, pos_codes, salary, positions, pos_min, pos_max, roster_size, salary_cap):
+        self.unit = get_salary_unit(salary, salary_cap)
+        self.num_buckets = int(salary_cap) // self.unit + 1
+        if self.num_buckets > MAX_SALARY_BUCKETS:
+            err_msg = "Too many salary buckets for DP solver ({0}). Salaries share a unit of only {1}".format(
+                self.num_buckets, self.unit)
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+        self.weights = (np.round(salary).astype(np.int64) // self.unit)
+        self.pos_codes = np.asarray(pos_codes)
+        self.roster_size = roster_size
+
+        # Only positions with players on the slate are constrained (same as build_lineup_model). Positions with a
+        # fixed count and few players go first so combined curves of the leading positions are shared the most
+        self.positions = [i for i, pos in enumerate(positions) if np.any(self.pos_codes == i)]
+        self.pos_min = {i: pos_min[positions[i]] for i in self.positions}
+        self.pos_max = {i: pos_max[positions[i]] for i in self.positions}
+        self.positions.sort(key=lambda i: (self.pos_max[i] - self.pos_min[i], np.sum(self.pos_codes == i)))
+
+        # Offsets used to convolve two budget curves in one vectorized max
+        buckets = np.arange(self.num_buckets)
+        self.conv_idx = buckets[:, None] - buckets[None, :]
+        self.conv_invalid = self.conv_idx < 0
+        self.conv_idx[self.conv_invalid] = 0
+
+        # Knapsack tables and combined position curves are reused across searches that share available players
+        self.tables = {}
+        self.curves = {}
+        self.cache_bytes = 0
+
+        # Table ids key combined curves so they're never reused, even after the cache is cleared
+        self.next_table_id = 0
+
+    def clear_cache(self):
+        self.tables = {}
+        self.curves = {}
+        self.cache_bytes = 0
+
+    def convolve(self, prefix, curve):
+        # out[s] = max_t prefix[t] + curve[s - t], and the maximizing t for every budget s
+        values = prefix[None, :] + curve[self.conv_idx]
+        values[self.conv_invalid] = -np.inf
+        split = np.argmax(values, axis=1)
+        return values[np.arange(self.num_buckets), split], split
+
+    def get_table(self, objective, players, max_count):
+        key = (players.tobytes(), max_count)
+        if key not in self.tables:
+            if self.cache_bytes >= MAX_CACHE_BYTES:
+                logging.debug("Clearing DP table cache ({0} tables, {1:.0f} MB)".format(len(self.tables),
+                                                                                     self.cache_bytes / 2 ** 20))
+                self.clear_cache()
+            best, keep = knapsack_tables(objective[players], self.weights[players], max_count, self.num_buckets)
+            self.tables[key] = (self.next_table_id, players, best, keep)
+            self.next_table_id += 1
+            self.cache_bytes += players.nbytes + best.nbytes + keep.nbytes
+        return self.tables[key]
+
+    def solve(self, objective, available, locked):
+        # Best lineup using all locked players and any available players. Returns (value, player indices) or None
+        locked = np.flatnonzero(locked)
+        budget = (self.num_buckets - 1) - int(self.weights[locked].sum())
+        roster_left = self.roster_size - len(locked)
+        if budget < 0 or roster_left < 0 or np.any(~np.isin(self.pos_codes[locked], self.positions)):
+            return None
+
+        # Knapsack tables of available players at every position
+        tables = []
+        count_ranges = []
+        for pos in self.positions:
+            num_locked = int(np.sum(self.pos_codes[locked] == pos))
+            players = np.flatnonzero(available & (self.pos_codes == pos))
+            lo = max(self.pos_min[pos] - num_locked, 0)
+            hi = min(self.pos_max[pos] - num_locked, len(players), roster_left)
+            if hi < lo:
+                return None
+            tables.append(self.get_table(objective, players, hi))
+            count_ranges.append(range(lo, hi + 1))
+
+        # Combine positions for every count per position filling the roster, sharing common prefixes. Only the
+        # leading positions need full curves, the last position is only evaluated at the remaining budget
+        table_ids = tuple(table[0] for table in tables)
+        last = len(tables) - 1
+        best_value = -np.inf
+        best_counts = None
+        best_split = budget
+        for counts in product(*count_ranges):
+            if sum(counts) != roster_left:
+                continue
+            curve = None
+            for i, count in enumerate(counts[:last]):
+                key = (table_ids[:i + 1], counts[:i + 1])
+                if key not in self.curves:
+                    pos_curve = tables[i][2][count]
+                    if curve is None:
+                        self.curves[key] = (pos_curve, None)
+                    else:
+                        self.curves[key] = self.convolve(curve, pos_curve)
+                        self.cache_bytes += self.curves[key][0].nbytes + self.curves[key][1].nbytes
+                curve = self.curves[key][0]
+
+            last_curve = tables[last][2][counts[last]]
+            if curve is None:
+                split, value = 0, last_curve[budget]
+            else:
+                values = curve[:budget + 1] + last_curve[budget::-1]
+                split = int(np.argmax(values))
+                value = values[split]
+            if value > best_value:
+                best_value = value
+                best_counts = counts
+                best_split = split
+        if best_counts is None or best_value == -np.inf:
+            return None
+
+        # Walk back through the convolutions to the salary given to each position
+        _, players, best, keep = tables[last]
+        chosen = list(locked)
+        chosen.extend(players[knapsack_players(keep, self.weights[players], best_counts[last], budget - best_split)])
+        pos_budget = best_split
+        for i in range(last - 1, -1, -1):
+            split = self.curves[(table_ids[:i + 1], best_counts[:i + 1])][1]
+            prefix_budget = 0 if split is None else int(split[pos_budget])
+            _, players, best, keep = tables[i]
+            chosen.extend(players[knapsack_players(keep, self.weights[players], best_counts[i],
+                                                   pos_budget - prefix_budget)])
+            pos_budget = prefix_budget
+        chosen = np.array(chosen, dtype=np.int64)
+        return float(objective[chosen].sum()), chosen
+
+
+class DpBackend(object):
+    # In-process exact backend for lineup models built on the classic roster template. The template is solved
+    # by TemplateSolver and every other row must be a packing row over players (e.g. max overlap cuts, max per
+    # team). Packing rows are enforced lazily with best-first branch and bound: a lineup violating a row is split
+    # into children that each exclude one of its players in the row (locking the ones before it), and each child's
+    # template optimum is an upper bound for everything below it
+    def __init__(self, model, max_nodes=DEFAULT_MAX_NODES):
+        self.model = model
+        self.max_nodes = max_nodes
+        slate = model.slate
+        self.template = TemplateSolver(slate.pos_codes, slate.salary, slate.positions, model.pos_min,
+                                       model.pos_max, model.roster_size, model.salary_cap)
+        self.rows_synced = model.num_template_rows
+        self.cut_indices = []
+        self.cut_coefs = []
+        self.cut_ub = []
+        self.cuts = sp.csr_matrix((0, model.num_players))
+        self.heap = None
+        self.counter = 0
+        self.objective_version = None
+        self.row_bounds_version = model.row_bounds_version
+        self.col_lb = None
+        self.col_ub = None
+        self.num_solves = 0
+        self.num_nodes = 0
+
+    def sync(self):
+        model = self.model
+        if model.num_cols != model.num_players:
+            err_msg = "DP backend only supports lineup models without auxiliary columns ({0} found)".format(
+                model.num_cols - model.num_players)
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+
+        # Re-read packing rows if any bounds changed. Relaxed rows also invalidate the search tree
+        num_cuts = len(self.cut_ub)
+        if self.row_bounds_version != model.row_bounds_version:
+            self.rows_synced = model.num_template_rows
+            self.cut_indices, self.cut_coefs, self.cut_ub = [], [], []
+            self.col_lb = None
+            self.row_bounds_version = model.row_bounds_version
+            num_cuts = None
+
+        for row in range(self.rows_synced, model.num_rows):
+            indices = model.row_indices[row]
+            coefs = model.row_coefs[row]
+            if model.row_lb[row] > 0 or np.any(coefs < 0):
+                err_msg = "DP backend only supports packing constraints beyond the roster template (row {0})".format(row)
+                logging.error(err_msg)
+                raise DFSException(err_msg)
+
+            # Skip rows no lineup can violate (including relaxed rows)
+            if np.sort(coefs)[::-1][:model.roster_size].sum() <= model.row_ub[row] + EPSILON:
+                continue
+            self.cut_indices.append(indices)
+            self.cut_coefs.append(coefs)
+            self.cut_ub.append(model.row_ub[row])
+        self.rows_synced = model.num_rows
+
+        if not self.cut_ub:
+            self.cuts = sp.csr_matrix((0, model.num_players))
+        elif len(self.cut_ub) != num_cuts:
+            indptr = np.concatenate([[0], np.cumsum([len(x) for x in self.cut_indices])])
+            self.cuts = sp.csr_matrix((np.concatenate(self.cut_coefs), np.concatenate(self.cut_indices), indptr),
+                                      shape=(len(self.cut_ub), model.num_players))
+
+    def solve_node(self, objective, available, locked, node_excluded, node_locked):
+        # Players locked by branching may have been fixed out since
+        if len(node_locked) and not np.all(available[list(node_locked)]):
+            return None
+        available = available.copy()
+        locked = locked.copy()
+        available[list(node_excluded)] = False
+        available[list(node_locked)] = False
+        locked[list(node_locked)] = True
+        self.num_nodes += 1
+        return self.template.solve(objective, available, locked)
+
+    def reset_search(self, col_lb, col_ub):
+        # Search tree is kept across solves while the model only gets tighter (new rows, players fixed out).
+        # Bounds of open nodes stay valid then, only lineups already found need re-solving if bounds changed
+        model = self.model
+        tightened = self.col_lb is not None and np.all(col_lb >= self.col_lb) and np.all(col_ub <= self.col_ub)
+        if self.objective_version != model.objective_version or not tightened:
+            self.template.clear_cache()
+            self.heap = [(-np.inf, 0, (), (), None)]
+        elif np.any(col_lb != self.col_lb) or np.any(col_ub != self.col_ub):
+            self.heap = [(neg_bound, i, excluded, locked, None) for neg_bound, i, excluded, locked, _ in self.heap]
+            heapq.heapify(self.heap)
+        self.objective_version = model.objective_version
+        self.col_lb = col_lb
+        self.col_ub = col_ub
+
+    def solve(self):
+        start = time.perf_counter()
+        self.sync()
+        self.num_solves += 1
+        model = self.model
+        objective = model.objective[:model.num_players]
+        col_lb = np.array(model.col_lb[:model.num_players])
+        col_ub = np.array(model.col_ub[:model.num_players])
+        self.reset_search(col_lb, col_ub)
+        locked = col_lb > 0.5
+        available = (col_ub > 0.5) & ~locked
+        cut_ub = np.array(self.cut_ub)
+
+        # Nodes are (-bound, tie breaker, excluded players, locked players, lineup if solved)
+        solution = opt.LineupSolution("infeasible")
+        heap = self.heap
+        num_pushed = 0
+        while heap:
+            if num_pushed > self.max_nodes:
+                solution = opt.LineupSolution("node_limit")
+                break
+            node = heapq.heappop(heap)
+            neg_bound, _, node_excluded, node_locked, lineup = node
+            if lineup is None:
+                solved = self.solve_node(objective, available, locked, node_excluded, node_locked)
+                if solved is not None:
+                    self.counter += 1
+                    num_pushed += 1
+                    heapq.heappush(heap, (-solved[0], self.counter, node_excluded, node_locked, solved[1]))
+                continue
+
+            # Lineup is optimal once it satisfies every packing row. It stays in the tree for later solves
+            violated = np.flatnonzero(self.cuts[:, lineup].sum(axis=1).A1 > cut_ub + EPSILON) if len(cut_ub) else []
+            if not len(violated):
+                heapq.heappush(heap, node)
+                solution = opt.LineupSolution("optimal", lineup, -neg_bound)
+                break
+
+            num_pushed += self.branch(node, self.cut_indices[violated[0]][self.cut_coefs[violated[0]] > 0], locked)
+
+        solution.solve_secs = time.perf_counter() - start
+        return solution
+
+    def branch(self, node, row_players, locked):
+        # Split a node whose lineup uses too many row_players into children that each exclude one of them
+        # (locking the ones before it), so every lineup of the node except those using all of them is kept once
+        neg_bound, _, node_excluded, node_locked, lineup = node
+        row_players = set(row_players)
+        branch_players = [player for player in np.sort(lineup) if player in row_players
+                          and player not in node_locked and not locked[player]]
+        for i, player in enumerate(branch_players):
+            self.counter += 1
+            heapq.heappush(self.heap, (neg_bound, self.counter, node_excluded + (player,),
+                                       node_locked + tuple(branch_players[:i]), None))
+        return len(branch_players)
+
+    def top_lineups(self, num_lineups, max_overlap=None, max_lineups=None):
+        # Best num_lineups lineups where no two share more than max_overlap players, found in a single best-first
+        # search. Lineups are popped in order of their bound, so once num_lineups are accepted no remaining node
+        # can beat the last one and the search stops. Overlap with accepted lineups is checked lazily against
+        # their bitsets instead of adding a cut per lineup. max_lineups optionally caps lineups per player
+        start = time.perf_counter()
+        self.sync()
+        self.num_solves += 1
+        model = self.model
+        max_overlap = model.roster_size - 1 if max_overlap is None else max_overlap
+        objective = model.objective[:model.num_players]
+        col_lb = np.array(model.col_lb[:model.num_players])
+        col_ub = np.array(model.col_ub[:model.num_players])
+        self.reset_search(col_lb, col_ub)
+        self.heap = [(-np.inf, 0, (), (), None)]
+        locked = col_lb > 0.5
+        available = (col_ub > 0.5) & ~locked
+        cut_ub = np.array(self.cut_ub)
+        exposure = np.zeros(model.num_players, dtype=np.int64)
+
+        lineup_set = lineups.LineupSet(model.num_players, model.roster_size)
+        solutions = []
+        heap = self.heap
+        num_pushed = 0
+        while heap and len(solutions) < num_lineups:
+            if num_pushed > self.max_nodes:
+                logging.warning("Stopped lineup search at node limit after {0} lineups".format(len(solutions)))
+                break
+            node = heapq.heappop(heap)
+            neg_bound, _, node_excluded, node_locked, lineup = node
+            if lineup is None:
+                solved = self.solve_node(objective, available, locked, node_excluded, node_locked)
+                if solved is not None:
+                    self.counter += 1
+                    num_pushed += 1
+                    heapq.heappush(heap, (-solved[0], self.counter, node_excluded, node_locked, solved[1]))
+                continue
+
+            # Re-solve lineups using players who reached max exposure after the lineup was found
+            if not np.all(available[lineup] | locked[lineup]):
+                heapq.heappush(heap, (neg_bound, node[1], node_excluded, node_locked, None))
+                continue
+
+            violated = np.flatnonzero(self.cuts[:, lineup].sum(axis=1).A1 > cut_ub + EPSILON) if len(cut_ub) else []
+            if len(violated):
+                num_pushed += self.branch(node, self.cut_indices[violated[0]][self.cut_coefs[violated[0]] > 0], locked)
+                continue
+
+            overlapping = np.flatnonzero(lineup_set.overlap_with(lineup) > max_overlap)
+            if len(overlapping):
+                num_pushed += self.branch(node, lineup_set[overlapping[0]].astype(np.int64), locked)
+                continue
+
+            # Accept lineup. It overlaps itself, so the next time it's popped its node is split around it
+            lineup_set.add(lineup, dedup=False)
+            solution = opt.LineupSolution("optimal", lineup, -neg_bound)
+            solution.solve_secs = time.perf_counter() - start
+            solutions.append(solution)
+            start = time.perf_counter()
+            heapq.heappush(heap, node)
+            if max_lineups is not None:
+                exposure[lineup] += 1
+                available[lineup[exposure[lineup] >= max_lineups[lineup]]] = False
+
+        if len(solutions) < num_lineups:
+            logging.info("Exhausted list of possible teams fitting constraints after {0} lineups".format(len(solutions)))
+
+        # Search state no longer matches the model
+        self.heap = None
+        self.col_lb = None
+        return solutions, lineup_set
+
+
+def generate_top_lineups(slate, num_lineups, pos_max=None, pos_min=None, max_overlap=None, max_exposure=1.0,
+                         max_qb_exposure=1.0, max_nodes=DEFAULT_MAX_NODES, **config):
+    # Same lineups as optimizer.generate_lineups from one search instead of one solve per lineup
+    model = opt.build_lineup_model(slate, pos_max, pos_min, **config)
+    backend = DpBackend(model, max_nodes)
+    max_lineups = opt.get_max_lineups_per_player(slate, num_lineups, max_exposure, max_qb_exposure)
+    solutions, lineup_set = backend.top_lineups(num_lineups, max_overlap, max_lineups)
+    return solutions, lineup_set, backend
@@ -0,0 +1,73 @@
+import argparse
+import glob
+
+import utils
+import correlation as corr
+
+
+def configure_argparser(argparser_obj):
+
+    # Path to historical harmonized weekly datasets
+    argparser_obj.add_argument("--harm-files",
+                               action="store",
+                               type=str,
+                               dest="harm_glob",
+                               required=True,
+                               help="Glob of historical harmonized weekly datasets (e.g. '../data/harmonized_datasets/*/*.csv')")
+
+    # Path to correlation cache
+    argparser_obj.add_argument("--output",
+                               action="store",
+                               type=str,
+                               dest="output_file",
+                               required=True,
+                               help="Path to write estimated correlations (json)")
+
+    # Minimum projected points for a player to be included
+    argparser_obj.add_argument("--min-projection",
+                               action="store",
+                               type=float,
+                               dest="min_projection",
+                               default=2,
+                               help="Ignore players projected for fewer points")
+
+    # Minimum player pairs for a correlation to be used
+    argparser_obj.add_argument("--min-pairs",
+                               action="store",
+                               type=int,
+                               dest="min_pairs",
+                               default=30,
+                               help="Position pairs observed fewer times are treated as uncorrelated")
+
+    # Verbosity level
+    argparser_obj.add_argument("-v",
+                               action='count',
+                               dest='verbosity_level',
+                               required=False,
+                               default=0,
+                               help="Increase verbosity of the program."
+                                    "Multiple -v's increase the verbosity level:\n"
+                                    "0 = Errors\n"
+                                    "1 = Errors + Warnings\n"
+                                    "2 = Errors + Warnings + Info\n"
+                                    "3 = Errors + Warnings + Info + Debug")
+
+
+def main():
+    # Configure argparser
+    argparser = argparse.ArgumentParser(prog="estimate_correlations.py")
+    configure_argparser(argparser)
+
+    # Parse the arguments
+    args = argparser.parse_args()
+
+    # Configure logging
+    utils.configure_logging(args.verbosity_level)
+
+    harm_files = sorted(glob.glob(args.harm_glob))
+    correlations = corr.estimate_correlations(harm_files, args.min_projection, args.min_pairs)
+    corr.write_correlations(args.output_file, correlations, harm_files, args.min_projection)
+    print(correlations.sort_values(by=["relation", "pos_a", "pos_b"]).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import argparse
+import logging
+import os
+import re
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+import utils
+import data_import as imp
+from alias_store import PlayerAliasStore
+from review_queue import MatchReviewQueue
+
+PROJ_FILE_REGEX = re.compile(r"^ffa_projections_scoring_wk(\d+)\.(csv|xlsx)$")
+DK_RESULTS_FILE_REGEX = re.compile(r"^dk_points_wk(\d+)_(\d+)\.(csv|xlsx)$")
+DK_PRICES_FILE_REGEX = re.compile(r"^dk_prices_wk(\d+)_(\d+)\.(csv|xlsx)$")
+GAME_LINES_FILE_REGEX = re.compile(r"^game_lines_wk(\d+)_(\d+)\.(csv|xlsx)$")
+MANIFEST_FILE = "harmonize_manifest.json"
+
+
+def configure_argparser(argparser_obj):
+
+    def dir_type(arg_string):
+        """
+        This function checks the existance of input directory
+        :param arg_string: directory name as string
+        :return: directory name as string
+        """
+        if not os.path.isdir(arg_string):
+            err_msg = "%s does not exist! " \
+                      "Please provide a valid directory!" % arg_string
+            raise argparse.ArgumentTypeError(err_msg)
+
+        return arg_string
+
+    # Path to data directory
+    argparser_obj.add_argument("--data-dir",
+                               action="store",
+                               type=dir_type,
+                               dest="data_dir",
+                               required=True,
+                               help="Path to data directory containing projections/, dfs_results/, dfs_prices/ "
+                                    "and optionally game_lines/")
+
+    # Season to harmonize
+    argparser_obj.add_argument("--season",
+                               action="store",
+                               type=str,
+                               dest="season",
+                               required=True,
+                               help="Season to harmonize")
+
+    # Prefer price lists over historical results
+    argparser_obj.add_argument("--prices",
+                               action="store_true",
+                               dest="prefer_prices",
+                               help="Use DK price lists instead of DK results when both exist for a week")
+
+    # Number of worker processes
+    argparser_obj.add_argument("--workers",
+                               action="store",
+                               type=int,
+                               dest="num_workers",
+                               default=os.cpu_count(),
+                               help="Number of worker processes")
+
+    # Path to persistent player alias store
+    argparser_obj.add_argument("--alias-db",
+                               action="store",
+                               type=str,
+                               dest="alias_db",
+                               default=None,
+                               help="Path to SQLite store of resolved player name mappings reused across runs")
+
+    # Force re-harmonizing all weeks
+    argparser_obj.add_argument("--force",
+                               action="store_true",
+                               dest="force",
+                               help="Harmonize every week even if inputs haven't changed")
+
+    # Path to timing report
+    argparser_obj.add_argument("--report",
+                               action="store",
+                               type=str,
+                               dest="report_file",
+                               default=None,
+                               help="Path to write per-week timing report (csv)")
+
+    # Path to import cache directory
+    argparser_obj.add_argument("--cache-dir",
+                               action="store",
+                               type=str,
+                               dest="cache_dir",
+                               default=None,
+                               help="Directory for columnar cache of imported player data")
+
+    # Verbosity level
+    argparser_obj.add_argument("-v",
+                               action='count',
+                               dest='verbosity_level',
+                               required=False,
+                               default=0,
+                               help="Increase verbosity of the program."
+                                    "Multiple -v's increase the verbosity level:\n"
+                                    "0 = Errors\n"
+                                    "1 = Errors + Warnings\n"
+                                    "2 = Errors + Warnings + Info\n"
+                                    "3 = Errors + Warnings + Info + Debug")
+
+
+def find_weekly_files(data_dir, file_regex):
+    # Return {week: file} for files in a directory matching a weekly file regex. Prefer csv over xlsx
+    weekly_files = {}
+    if not os.path.isdir(data_dir):
+        return weekly_files
+
+    for file_name in sorted(os.listdir(data_dir)):
+        match = file_regex.match(file_name)
+        if not match:
+            continue
+        week = int(match.group(1))
+        if week in weekly_files and not file_name.endswith(".csv"):
+            continue
+        weekly_files[week] = os.path.join(data_dir, file_name)
+    return weekly_files
+
+
+def find_season_weeks(data_dir, season, prefer_prices=False):
+    # Pair weekly projection files with DK results/prices (and game lines if available) for a season
+    proj_files = find_weekly_files(os.path.join(data_dir, "projections", season), PROJ_FILE_REGEX)
+    result_files = find_weekly_files(os.path.join(data_dir, "dfs_results", season), DK_RESULTS_FILE_REGEX)
+    price_files = find_weekly_files(os.path.join(data_dir, "dfs_prices", season), DK_PRICES_FILE_REGEX)
+    lines_files = find_weekly_files(os.path.join(data_dir, "game_lines", season), GAME_LINES_FILE_REGEX)
+    out_dir = os.path.join(data_dir, "harmonized_datasets", season)
+
+    weeks = []
+    for week in sorted(proj_files):
+        is_price_list = week in price_files and (prefer_prices or week not in result_files)
+        if not is_price_list and week not in result_files:
+            logging.warning("No DK results or prices found for week {0}. Skipping...".format(week))
+            continue
+        weeks.append({"week": week,
+                      "proj_file": proj_files[week],
+                      "dfs_file": price_files[week] if is_price_list else result_files[week],
+                      "is_price_list": is_price_list,
+                      "lines_file": lines_files.get(week),
+                      "out_file": os.path.join(out_dir, "dfk_harm_wk{0}_{1}.csv".format(week, season))})
+    return weeks
+
+
+def get_input_signature(week_task):
+    # Signature of a week's inputs used to skip weeks that haven't changed
+    signature = {"is_price_list": week_task["is_price_list"]}
+    for input_file in [week_task["proj_file"], week_task["dfs_file"], week_task["lines_file"]]:
+        if input_file is None:
+            continue
+        stat = os.stat(input_file)
+        signature[os.path.basename(input_file)] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def read_manifest(manifest_file):
+    if not os.path.exists(manifest_file):
+        return {}
+    with open(manifest_file, "r") as fh:
+        return json.load(fh)
+
+
+def write_manifest(manifest_file, manifest):
+    with open(manifest_file, "w") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+
+
+def harmonize_week(week_task, season, alias_db=None, cache_dir=None):
+    # Harmonize a single week. Runs in a worker process so it never prompts for uncertain matches
+    timing = {"week": week_task["week"]}
+    start = time.time()
+
+    if week_task["is_price_list"]:
+        dk_df = imp.DKPriceImporter(week_task["dfs_file"], cache_dir=cache_dir)
+    else:
+        dk_df = imp.DKResultsImporter(week_task["dfs_file"], cache_dir=cache_dir)
+    proj_df = imp.FFAProjectionsImporter(week_task["proj_file"], cache_dir=cache_dir)
+    timing["import_secs"] = time.time() - start
+
+    alias_store = PlayerAliasStore(alias_db, season=season) if alias_db is not None else None
+    review_queue = MatchReviewQueue()
+    merge_start = time.time()
+    data = imp.merge_datasets(proj_df.data, ref_data=dk_df.data, alias_store=alias_store, review_queue=review_queue)
+    timing["merge_secs"] = time.time() - merge_start
+
+    # Attach vegas lines so downstream backtests get lines features without reading them again
+    if week_task["lines_file"] is not None:
+        lines_df = imp.GameLinesImporter(week_task["lines_file"], cache_dir=cache_dir)
+        data = imp.append_game_lines(data, lines_df.data)
+
+    data.to_csv(week_task["out_file"], index=False)
+    if len(review_queue):
+        review_queue.write("{0}.review.csv".format(os.path.splitext(week_task["out_file"])[0]))
+
+    if alias_store is not None:
+        timing["alias_hits"] = alias_store.hits
+        timing["alias_misses"] = alias_store.misses
+        alias_store.close()
+
+    timing["num_players"] = len(data)
+    timing["num_review"] = len(review_queue)
+    timing["total_secs"] = time.time() - start
+    return timing
+
+
+def main():
+    # Configure argparser
+    argparser = argparse.ArgumentParser(prog="harmonize_season.py")
+    configure_argparser(argparser)
+
+    # Parse the arguments
+    args = argparser.parse_args()
+
+    # Configure logging
+    utils.configure_logging(args.verbosity_level)
+
+    # Find weeks to harmonize
+    week_tasks = find_season_weeks(args.data_dir, args.season, args.prefer_prices)
+    if not week_tasks:
+        err_msg = "No weeks found to harmonize for season {0} in {1}".format(args.season, args.data_dir)
+        logging.error(err_msg)
+        raise utils.DFSException(err_msg)
+
+    out_dir = os.path.join(args.data_dir, "harmonized_datasets", args.season)
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+
+    # Skip weeks whose inputs haven't changed since the last run
+    manifest_file = os.path.join(out_dir, MANIFEST_FILE)
+    manifest = read_manifest(manifest_file)
+    tasks_to_run = []
+    for week_task in week_tasks:
+        signature = get_input_signature(week_task)
+        week_key = str(week_task["week"])
+        if not args.force and manifest.get(week_key) == signature and os.path.exists(week_task["out_file"]):
+            logging.info("Inputs unchanged for week {0}. Skipping...".format(week_task["week"]))
+            continue
+        week_task["signature"] = signature
+        tasks_to_run.append(week_task)
+
+    logging.info("Harmonizing {0} of {1} weeks with {2} workers".format(len(tasks_to_run),
+                                                                        len(week_tasks),
+                                                                        args.num_workers))
+    # Harmonize weeks across process pool
+    timings = []
+    errors = False
+    with ProcessPoolExecutor(max_workers=args.num_workers) as executor:
+        futures = {executor.submit(harmonize_week, week_task, args.season, args.alias_db, args.cache_dir): week_task
+                   for week_task in tasks_to_run}
+        for future in as_completed(futures):
+            week_task = futures[future]
+            try:
+                timing = future.result()
+            except BaseException as e:
+                logging.error("Failed to harmonize week {0}: {1}".format(week_task["week"], e))
+                errors = True
+                continue
+
+            # Only record weeks in manifest once they've been written successfully
+            manifest[str(week_task["week"])] = week_task["signature"]
+            timings.append(timing)
+
+    write_manifest(manifest_file, manifest)
+
+    # Report timing for each week
+    if timings:
+        timing_df = pd.DataFrame(timings).sort_values(by="week").reset_index(drop=True)
+        logging.info("Harmonization timing report:\n{0}".format(timing_df))
+        print(timing_df.to_string(index=False))
+        if args.report_file is not None:
+            timing_df.to_csv(args.report_file, index=False)
+
+    if errors:
+        raise utils.DFSException("One or more weeks failed to harmonize! See above errors")
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,8 @@ import json
 
 import utils
 import data_import as imp
+from alias_store import PlayerAliasStore
+from review_queue import MatchReviewQueue, apply_review_decisions
 
 def configure_argparser(argparser_obj):
 
@@ -54,6 +56,60 @@ def configure_argparser(argparser_obj):
                                dest="is_pricelist",
                                help="Flag for indicating this is a current price list and not historical data")
 
+    # Path to persistent player alias store
+    argparser_obj.add_argument("--alias-db",
+                               action="store",
+                               type=str,
+                               dest="alias_db",
+                               default=None,
+                               help="Path to SQLite store of resolved player name mappings reused across runs")
+
+    # Season used to scope player alias store
+    argparser_obj.add_argument("--season",
+                               action="store",
+                               type=str,
+                               dest="season",
+                               default=None,
+                               help="Season the input files belong to (scopes player alias store)")
+
+    # Invalidate alias store for season
+    argparser_obj.add_argument("--invalidate-season",
+                               action="store_true",
+                               dest="invalidate_season",
+                               help="Clear player alias store mappings for --season before harmonizing")
+
+    # Run without prompting for uncertain player matches
+    argparser_obj.add_argument("--no-prompt",
+                               action="store_true",
+                               dest="no_prompt",
+                               help="Never prompt for uncertain player matches. "
+                                    "Writes them to a review file and merges confident matches only")
+
+    # Path to review file
+    argparser_obj.add_argument("--review",
+                               action="store",
+                               type=str,
+                               dest="review_file",
+                               default=None,
+                               help="Path to review file written with --no-prompt (default: <out>.review.csv)")
+
+    # Path to reviewed file to apply
+    argparser_obj.add_argument("--apply-review",
+                               action="store",
+                               type=file_type,
+                               dest="apply_review_file",
+                               default=None,
+                               help="Path to review file with filled in 'is_match' decisions. "
+                                    "Adds accepted players to an existing --out file without re-matching")
+
+    # Path to import cache directory
+    argparser_obj.add_argument("--cache-dir",
+                               action="store",
+                               type=str,
+                               dest="cache_dir",
+                               default=None,
+                               help="Directory for columnar cache of imported player data")
+
     # Verbosity level
     argparser_obj.add_argument("-v",
                                action='count',
@@ -83,23 +139,53 @@ def main():
     dfs_file    = args.dfs_file
     out_file    = args.output_file
     is_price_list = args.is_pricelist
+    review_file = args.review_file
+    if review_file is None:
+        review_file = "{0}.review.csv".format(os.path.splitext(out_file)[0])
+
+    if args.apply_review_file is not None and not os.path.exists(out_file):
+        err_msg = "Output file must already exist to apply review: {0}".format(out_file)
+        logging.error(err_msg)
+        raise utils.DFSException(err_msg)
+
+    # Open persistent store of player names resolved in previous runs
+    alias_store = None
+    if args.alias_db is not None:
+        alias_store = PlayerAliasStore(args.alias_db, season=args.season)
+        if args.invalidate_season:
+            alias_store.invalidate()
 
     if not is_price_list:
         logging.info("Reading Draft Kings results...")
-        dk_df = imp.DKResultsImporter(dfs_file)
+        dk_df = imp.DKResultsImporter(dfs_file, cache_dir=args.cache_dir)
     else:
         logging.info("Reading current draft kings prices")
-        dk_df = imp.DKPriceImporter(dfs_file)
+        dk_df = imp.DKPriceImporter(dfs_file, cache_dir=args.cache_dir)
 
     logging.info("Reading FFA Projections...")
-    proj_df = imp.FFAProjectionsImporter(proj_file)
+    proj_df = imp.FFAProjectionsImporter(proj_file, cache_dir=args.cache_dir)
 
     print(proj_df.data.head(25))
     print()
     print(dk_df.data.head(25))
 
-    # Merge the two datasets
-    data = imp.merge_datasets(proj_df.data, ref_data=dk_df.data)
+    if args.apply_review_file is not None:
+        # Fold reviewed matches into previously harmonized output
+        decisions = MatchReviewQueue.read_decisions(args.apply_review_file)
+        data = apply_review_decisions(pd.read_csv(out_file), proj_df.data, dk_df.data,
+                                      decisions, alias_store=alias_store)
+    else:
+        # Merge the two datasets
+        review_queue = MatchReviewQueue() if args.no_prompt else None
+        data = imp.merge_datasets(proj_df.data, ref_data=dk_df.data, alias_store=alias_store,
+                                  review_queue=review_queue)
+
+        if review_queue is not None and len(review_queue):
+            review_queue.write(review_file)
+
+    if alias_store is not None:
+        alias_store.log_stats()
+        alias_store.close()
 
     # Write to output file
     data.to_csv(out_file, index=False)
@@ -0,0 +1,545 @@
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+
+import utils
+import constants as cols
+import data_import as imp
+import optimizer as opt
+from review_queue import MatchReviewQueue
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Max request body and latency samples kept per route
+MAX_BODY_BYTES = 1 << 20
+MAX_LATENCY_SAMPLES = 10000
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                500: "Internal Server Error"}
+
+# Lineup request options passed through to the lineup generator
+GENERATOR_OPTIONS = {"backend": "pulp",
+                     "max_overlap": None,
+                     "max_exposure": 1.0,
+                     "max_qb_exposure": 1.0}
+
+# Overlap cuts a reused lineup generator can accumulate before its model is rebuilt. Cuts of earlier
+# requests are relaxed rather than deleted so they still cost the solver a little
+MAX_GENERATOR_CUTS = 2000
+
+# Per-worker-process caches so slates are harmonized and compiled once and reused by every request. Slates
+# are kept per slate id with the key they were loaded with and name indexes per price list with its file
+# signature, so a reloaded slate replaces its old entry instead of accumulating next to it
+_loaded_slates = {}
+_name_indexes = {}
+
+# Lineup generators per slate id and lineup options with the number of rows their model was built with. Dropped
+# when their slate is reloaded
+_lineup_generators = {}
+
+
+def configure_argparser(argparser_obj):
+
+    # Host to listen on
+    argparser_obj.add_argument("--host",
+                               action="store",
+                               type=str,
+                               dest="host",
+                               default=DEFAULT_HOST,
+                               help="Local address to listen on")
+
+    # Port to listen on
+    argparser_obj.add_argument("--port",
+                               action="store",
+                               type=int,
+                               dest="port",
+                               default=DEFAULT_PORT,
+                               help="Port to listen on")
+
+    # Unix socket to listen on instead of host/port
+    argparser_obj.add_argument("--unix-socket",
+                               action="store",
+                               type=str,
+                               dest="unix_socket",
+                               default=None,
+                               help="Path to unix socket to listen on instead of --host/--port")
+
+    # Number of worker processes
+    argparser_obj.add_argument("--workers",
+                               action="store",
+                               type=int,
+                               dest="num_workers",
+                               default=os.cpu_count(),
+                               help="Number of worker processes solving lineup requests")
+
+    # Path to import cache directory
+    argparser_obj.add_argument("--cache-dir",
+                               action="store",
+                               type=str,
+                               dest="cache_dir",
+                               default=None,
+                               help="Directory for columnar cache of imported player data")
+
+    # Verbosity level
+    argparser_obj.add_argument("-v",
+                               action='count',
+                               dest='verbosity_level',
+                               required=False,
+                               default=0,
+                               help="Increase verbosity of the program."
+                                    "Multiple -v's increase the verbosity level:\n"
+                                    "0 = Errors\n"
+                                    "1 = Errors + Warnings\n"
+                                    "2 = Errors + Warnings + Info\n"
+                                    "3 = Errors + Warnings + Info + Debug")
+
+
+def get_file_signature(source):
+    stat = os.stat(source)
+    return [os.path.abspath(source), stat.st_size, stat.st_mtime_ns]
+
+
+def get_slate_key(slate_spec):
+    # Slates are keyed by their spec and the signature of their input files so an updated price list
+    # or projections file is reloaded while unchanged slates stay resident
+    signatures = [get_file_signature(slate_spec[field]) for field in ["harm_file", "dfs_file", "proj_file", "lines_file"]
+                  if slate_spec.get(field) is not None]
+    return json.dumps([slate_spec, signatures], sort_keys=True)
+
+
+def get_name_index(dk_df, dfs_file):
+    # Build reference player name index once per DK price list
+    signature = get_file_signature(dfs_file)
+    index_key = signature[0]
+    if index_key not in _name_indexes or _name_indexes[index_key][0] != signature:
+        _name_indexes[index_key] = (signature, imp.PlayerNameIndex.from_data(dk_df.data))
+    return _name_indexes[index_key][1]
+
+
+def load_slate_data(slate_spec, cache_dir=None):
+    # Harmonized player data from a harmonized csv or from a DK price list and FFA projections
+    if slate_spec.get("harm_file") is not None:
+        data = pd.read_csv(slate_spec["harm_file"])
+    else:
+        dk_df = imp.DKPriceImporter(slate_spec["dfs_file"], cache_dir=cache_dir)
+        proj_df = imp.FFAProjectionsImporter(slate_spec["proj_file"], cache_dir=cache_dir)
+
+        # Service never prompts for uncertain matches so they're dropped and reported instead
+        review_queue = MatchReviewQueue()
+        data = imp.merge_datasets(proj_df.data, ref_data=dk_df.data,
+                                  name_index=get_name_index(dk_df, slate_spec["dfs_file"]),
+                                  review_queue=review_queue)
+        if len(review_queue):
+            logging.warning("{0} uncertain player matches dropped from slate. Harmonize offline "
+                            "to review them".format(len(review_queue)))
+
+    if slate_spec.get("lines_file") is not None:
+        lines_df = imp.GameLinesImporter(slate_spec["lines_file"], cache_dir=cache_dir)
+        data = imp.append_game_lines(data, lines_df.data)
+    return data
+
+
+def load_slate(slate_id, slate_spec, cache_dir=None):
+    # Compile a slate once per worker process. Recompiled when the slate id is registered with a new spec
+    # or its input files change
+    slate_key = get_slate_key(slate_spec)
+    if slate_id not in _loaded_slates or _loaded_slates[slate_id][0] != slate_key:
+        slate = opt.Slate(load_slate_data(slate_spec, cache_dir),
+                          min_projection_cutoff=slate_spec.get("min_projection_cutoff", 2),
+                          exclude_teams=slate_spec.get("exclude_teams"))
+        _loaded_slates[slate_id] = (slate_key, slate)
+        for generator_key in [key for key in _lineup_generators if key[0] == slate_id]:
+            del _lineup_generators[generator_key]
+    return _loaded_slates[slate_id][1]
+
+
+def validate_slate_spec(slate_spec):
+    if slate_spec.get("harm_file") is None and (slate_spec.get("dfs_file") is None or
+                                                slate_spec.get("proj_file") is None):
+        err_msg = "Slate requires a harm_file or both a dfs_file and proj_file!"
+        logging.error(err_msg)
+        raise utils.DFSException(err_msg)
+
+    for field in ["harm_file", "dfs_file", "proj_file", "lines_file"]:
+        if slate_spec.get(field) is not None and not os.path.exists(slate_spec[field]):
+            err_msg = "Slate {0} does not exist: {1}".format(field, slate_spec[field])
+            logging.error(err_msg)
+            raise utils.DFSException(err_msg)
+
+
+def get_player_indices(slate, players):
+    # Slate indices of players given by player id or name
+    name_idx = collections.defaultdict(list)
+    for i, name in enumerate(slate.data[cols.NAME_FIELD]):
+        name_idx[name].append(i)
+    id_idx = {player_id: i for i, player_id in enumerate(slate.player_ids)}
+
+    player_idx = []
+    for player in players:
+        if player in id_idx:
+            player_idx.append(id_idx[player])
+            continue
+        matches = name_idx.get(player, [])
+        if len(matches) != 1:
+            err_msg = "{0} player on slate: {1}".format("Ambiguous" if matches else "Unknown", player)
+            logging.error(err_msg)
+            raise utils.DFSException(err_msg)
+        player_idx.append(matches[0])
+    return np.array(player_idx, dtype=np.int64)
+
+
+def get_lineup_record(slate, solution):
+    lineup = slate.data.iloc[solution.player_idx]
+    return {"objective": solution.objective,
+            "player_ids": slate.player_ids[solution.player_idx].tolist(),
+            "players": lineup[cols.NAME_FIELD].tolist(),
+            "positions": lineup[cols.POS_FIELD].tolist(),
+            "teams": lineup[cols.TEAM_FIELD].tolist(),
+            "salary": float(slate.salary[solution.player_idx].sum()),
+            "projection": float(slate.projection[solution.player_idx].sum())}
+
+
+def get_lineup_generator(request, slate):
+    # Lineup generator of the worker for a slate and lineup options. A cached generator is reset to the
+    # compiled model's starting state (no lineups, locks or removed players) instead of being rebuilt
+    options = {option: request.get(option, default) for option, default in GENERATOR_OPTIONS.items()}
+    model_options = {"pos_max": request.get("pos_max"),
+                     "pos_min": request.get("pos_min"),
+                     "model_config": request.get("model_config", {})}
+    generator_key = (request["slate_id"], json.dumps([model_options, options], sort_keys=True))
+
+    if generator_key in _lineup_generators:
+        generator, num_base_rows = _lineup_generators[generator_key]
+        if generator.model.num_rows - num_base_rows <= MAX_GENERATOR_CUTS:
+            generator.remove_lineups(np.arange(len(generator.lineups)))
+            generator.set_available(np.flatnonzero(generator.fixed_out), True)
+            generator.set_locked(np.flatnonzero(generator.locked), False)
+            return generator, False
+
+    model = opt.build_lineup_model(slate, model_options["pos_max"], model_options["pos_min"],
+                                   **model_options["model_config"])
+    generator = opt.LineupGenerator(model, **options)
+    _lineup_generators[generator_key] = (generator, model.num_rows)
+    return generator, True
+
+
+def solve_lineup_request(request, cache_dir=None):
+    # Generate lineups for one request. Runs in a worker process and reuses the worker's compiled slate
+    # and lineup generator
+    start = time.perf_counter()
+    slate = load_slate(request["slate_id"], request["slate"], cache_dir)
+    load_secs = time.perf_counter() - start
+
+    locked = get_player_indices(slate, request.get("lock", []))
+    removed = get_player_indices(slate, request.get("remove", []))
+    if len(np.intersect1d(locked, removed)):
+        err_msg = "Players can't be both locked and removed!"
+        logging.error(err_msg)
+        raise utils.DFSException(err_msg)
+
+    # Lock and remove players by fixing their columns before the first solve
+    generator, is_new = get_lineup_generator(request, slate)
+    if len(locked):
+        generator.set_locked(locked)
+    if len(removed):
+        generator.set_available(removed, False)
+    build_secs = time.perf_counter() - start - load_secs
+
+    num_solves = generator.backend.num_solves
+    solutions = generator.generate(request.get("num_lineups", 1))
+    return {"lineups": [get_lineup_record(slate, solution) for solution in solutions],
+            "num_solves": generator.backend.num_solves - num_solves,
+            "generation_status": generator.status,
+            "new_generator": is_new,
+            "load_secs": load_secs,
+            "build_secs": build_secs,
+            "solve_secs": time.perf_counter() - start - load_secs - build_secs}
+
+
+def warm_slate(slate_id, slate_spec, cache_dir=None):
+    # Load a slate into a worker's cache ahead of lineup requests
+    return load_slate(slate_id, slate_spec, cache_dir).num_players
+
+
+class LatencyMetrics(object):
+    # Request latencies per route over the most recent requests
+    def __init__(self, max_samples=MAX_LATENCY_SAMPLES):
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=max_samples))
+        self.counts = collections.Counter()
+        self.errors = collections.Counter()
+        self.in_flight = 0
+
+    def record(self, route, secs, is_error=False):
+        self.latencies[route].append(secs)
+        self.counts[route] += 1
+        if is_error:
+            self.errors[route] += 1
+
+    def summary(self):
+        routes = {}
+        for route, latencies in self.latencies.items():
+            latencies_ms = 1000 * np.array(latencies)
+            routes[route] = {"count": self.counts[route],
+                             "errors": self.errors[route],
+                             "mean_ms": float(latencies_ms.mean()),
+                             "p50_ms": float(np.percentile(latencies_ms, 50)),
+                             "p95_ms": float(np.percentile(latencies_ms, 95)),
+                             "max_ms": float(latencies_ms.max())}
+        return {"in_flight": self.in_flight, "routes": routes}
+
+
+class LineupService(object):
+    # Local HTTP service that keeps registered slates compiled in a pool of worker processes and
+    # serves lineup requests concurrently. Routes:
+    #   GET  /health   - registered slates
+    #   GET  /metrics  - request latency metrics
+    #   POST /slates   - register (or reload) a slate: {"slate_id", "harm_file"} or {"slate_id", "dfs_file", "proj_file"}
+    #   POST /lineups  - {"slate_id", "num_lineups", "lock", "remove", "model_config", ...generator options}
+    def __init__(self, num_workers=None, cache_dir=None):
+        self.num_workers = num_workers or os.cpu_count()
+        self.cache_dir = cache_dir
+        self.executor = self.make_executor()
+        self.slates = {}
+        self.metrics = LatencyMetrics()
+        self.server = None
+        self.routes = {("GET", "/health"): self.health,
+                       ("GET", "/metrics"): self.get_metrics,
+                       ("POST", "/slates"): self.register_slate,
+                       ("POST", "/lineups"): self.generate_lineups}
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None):
+        if unix_socket is not None:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port)
+        logging.info("Lineup service listening on {0} with {1} workers".format(
+            unix_socket or self.server.sockets[0].getsockname(), self.num_workers))
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    def make_executor(self):
+        # Workers are spawned rather than forked from the event loop's process so they never inherit its
+        # sockets and threads
+        return ProcessPoolExecutor(max_workers=self.num_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def run_in_worker(self, func, *args):
+        executor = self.executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # Requests in flight when the pool broke all fail but only the first one replaces it
+            if executor is self.executor:
+                await self.restart_workers()
+            raise
+
+    async def restart_workers(self):
+        # A worker process that dies (e.g. killed for running out of memory) breaks the whole pool. Replace
+        # it and compile registered slates in the new workers again
+        logging.error("Lineup service worker died. Restarting {0} workers".format(self.num_workers))
+        self.executor.shutdown(wait=False)
+        self.executor = self.make_executor()
+
+        loop = asyncio.get_running_loop()
+        for slate_id, slate_spec in list(self.slates.items()):
+            warm_tasks = [loop.run_in_executor(self.executor, warm_slate, slate_id, slate_spec,
+                                              self.cache_dir) for _ in range(self.num_workers)]
+            for result in await asyncio.gather(*warm_tasks, return_exceptions=True):
+                if isinstance(result, BaseException):
+                    logging.error("Failed to reload slate {0} after restart: {1}".format(slate_id, result))
+                    break
+
+    async def health(self, payload):
+        return {"status": "ok", "slates": sorted(self.slates)}
+
+    async def get_metrics(self, payload):
+        return self.metrics.summary()
+
+    async def register_slate(self, payload):
+        slate_spec = dict(payload)
+        slate_id = slate_spec.pop("slate_id", None)
+        if slate_id is None:
+            raise utils.DFSException("Slate request missing slate_id!")
+        validate_slate_spec(slate_spec)
+
+        # Compile slate in every worker up front so the first lineup requests don't pay for it.
+        # Workers pick up warm tasks as they're free so this is best effort when the pool is busy
+        warm_tasks = [self.run_in_worker(warm_slate, slate_id, slate_spec, self.cache_dir)
+                      for _ in range(self.num_workers)]
+        num_players = (await asyncio.gather(*warm_tasks))[0]
+        self.slates[slate_id] = slate_spec
+        return {"slate_id": slate_id, "num_players": num_players}
+
+    async def generate_lineups(self, payload):
+        request = dict(payload)
+        slate_id = request.pop("slate_id", None)
+        if slate_id not in self.slates:
+            raise utils.DFSException("Unknown slate: {0}".format(slate_id))
+
+        # Reject bad model options before they reach a worker
+        opt.get_model_config(**request.get("model_config", {}))
+        unknown = [option for option in request if option not in GENERATOR_OPTIONS and
+                   option not in ["num_lineups", "lock", "remove", "model_config", "pos_max", "pos_min"]]
+        if unknown:
+            raise utils.DFSException("Unknown lineup request option(s): {0}".format(", ".join(sorted(unknown))))
+
+        request["slate_id"] = slate_id
+        request["slate"] = self.slates[slate_id]
+        return await self.run_in_worker(solve_lineup_request, request, self.cache_dir)
+
+    async def handle_connection(self, reader, writer):
+        start = time.perf_counter()
+        self.metrics.in_flight += 1
+        route = None
+        status = 200
+        try:
+            method, path, body = await read_http_request(reader)
+            route = "{0} {1}".format(method, path)
+            handler = self.routes.get((method, path))
+            if handler is None:
+                status, response = 404, {"error": "Unknown route: {0}".format(route)}
+            else:
+                response = await handler(json.loads(body) if body else {})
+        except RequestTooLarge as e:
+            status, response = 413, {"error": str(e)}
+            logging.error("Failed request {0}: {1}".format(route, e))
+        except (utils.DFSException, ValueError, asyncio.IncompleteReadError) as e:
+            # Invalid requests, including malformed HTTP and JSON bodies
+            status, response = 400, {"error": str(e)}
+            logging.error("Failed request {0}: {1}".format(route, e))
+        except Exception as e:
+            status, response = 500, {"error": "Internal error: {0}".format(e)}
+            logging.exception("Failed request {0}".format(route))
+
+        try:
+            await write_http_response(writer, status, response)
+        except ConnectionError:
+            logging.warning("Client disconnected before response to {0}".format(route))
+        finally:
+            writer.close()
+            self.metrics.in_flight -= 1
+            if route is not None:
+                self.metrics.record(route, time.perf_counter() - start, is_error=status != 200)
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+async def read_http_request(reader):
+    # Minimal HTTP/1.1 request parser for JSON requests. Returns (method, path, body)
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) != 3:
+        raise ValueError("Malformed HTTP request line")
+    method, path, _ = request_line
+
+    content_length = 0
+    while True:
+        header = (await reader.readline()).decode("latin-1").strip()
+        if not header:
+            break
+        name, _, value = header.partition(":")
+        if name.strip().lower() == "content-length":
+            content_length = int(value.strip())
+
+    if content_length > MAX_BODY_BYTES:
+        raise RequestTooLarge("Request body larger than {0} bytes".format(MAX_BODY_BYTES))
+    body = await reader.readexactly(content_length) if content_length else b""
+    return method.upper(), path.split("?")[0], body
+
+
+async def write_http_response(writer, status, response):
+    body = json.dumps(response).encode("utf-8")
+    header = "HTTP/1.1 {0} {1}\r\nContent-Type: application/json\r\nContent-Length: {2}\r\n" \
+             "Connection: close\r\n\r\n".format(status, HTTP_REASONS.get(status, ""), len(body))
+    writer.write(header.encode("latin-1") + body)
+    await writer.drain()
+
+
+class LineupServiceClient(object):
+    # Async client for a local lineup service. Opens one connection per request
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None):
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+
+    async def request(self, method, path, payload=None):
+        if self.unix_socket is not None:
+            reader, writer = await asyncio.open_unix_connection(self.unix_socket)
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+
+        try:
+            body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+            writer.write("{0} {1} HTTP/1.1\r\nHost: {2}\r\nContent-Type: application/json\r\n"
+                         "Content-Length: {3}\r\n\r\n".format(method, path, self.host, len(body)).encode("latin-1") + body)
+            await writer.drain()
+
+            status = int((await reader.readline()).split()[1])
+            response = await reader.read()
+        finally:
+            writer.close()
+
+        response = json.loads(response.split(b"\r\n\r\n", 1)[1])
+        if status != 200:
+            err_msg = "Lineup service request {0} {1} failed ({2}): {3}".format(method, path, status,
+                                                                               response.get("error"))
+            logging.error(err_msg)
+            raise utils.DFSException(err_msg)
+        return response
+
+    async def health(self):
+        return await self.request("GET", "/health")
+
+    async def get_metrics(self):
+        return await self.request("GET", "/metrics")
+
+    async def register_slate(self, slate_id, **slate_spec):
+        return await self.request("POST", "/slates", dict(slate_spec, slate_id=slate_id))
+
+    async def generate_lineups(self, slate_id, num_lineups=1, lock=None, remove=None, **options):
+        return await self.request("POST", "/lineups", dict(options, slate_id=slate_id, num_lineups=num_lineups,
+                                                           lock=lock or [], remove=remove or []))
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None, num_workers=None, cache_dir=None):
+    service = LineupService(num_workers, cache_dir)
+    server = await service.start(host, port, unix_socket)
+    try:
+        await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main():
+    # Configure argparser
+    argparser = argparse.ArgumentParser(prog="lineup_service.py")
+    configure_argparser(argparser)
+
+    # Parse the arguments
+    args = argparser.parse_args()
+
+    # Configure logging
+    utils.configure_logging(args.verbosity_level)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix_socket, args.num_workers, args.cache_dir))
+    except KeyboardInterrupt:
+        logging.info("Lineup service stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import logging
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from utils import DFSException
+import constants as cols
+
+PLAYER_ID_FIELD = "player_id"
+DK_ROSTER_SIZE = 9
+DK_SLOTS = ["QB", "RB", "RB", "WR", "WR", "WR", "TE", "FLEX", "DST"]
+DK_SLOT_POS = {"DST": cols.REQUIRED_POS["D"]}
+DK_FLEX_POS = ["RB", "WR", "TE"]
+FLEX_SLOT = "FLEX"
+LINEUP_FIELD = "lineup"
+INITIAL_CAPACITY = 64
+OVERLAP_CHUNK_SIZE = 2048
+
+# Number of set bits in every byte value
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.int16)
+
+
+class LineupSet(object):
+    # Set of lineups stored as a fixed width (num_lineups x roster_size) int16 array of sorted slate player indices
+    # plus a packed bitset of the players in each lineup. Storage grows by doubling so adding a lineup is
+    # amortized O(1) and per lineup memory stays at roster_size * 2 + num_players / 8 bytes
+    def __init__(self, num_players, roster_size=DK_ROSTER_SIZE, capacity=INITIAL_CAPACITY):
+        if num_players > np.iinfo(np.int16).max:
+            err_msg = "Too many players for int16 lineup indices: {0}".format(num_players)
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+        self.num_players = num_players
+        self.roster_size = roster_size
+        self.num_bytes = (num_players + 7) // 8
+        self.size = 0
+        self._player_idx = np.zeros((capacity, roster_size), dtype=np.int16)
+        self._bits = np.zeros((capacity, self.num_bytes), dtype=np.uint8)
+        self._keys = {}
+
+    @classmethod
+    def from_lineups(cls, num_players, lineups, roster_size=DK_ROSTER_SIZE, dedup=True):
+        # Build from player index arrays or solved lineups
+        lineup_set = cls(num_players, roster_size, capacity=max(len(lineups), 1))
+        lineup_set.extend(lineups, dedup)
+        return lineup_set
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        return self.player_idx[i]
+
+    def __iter__(self):
+        return iter(self.player_idx)
+
+    def __contains__(self, player_idx):
+        return self.get_key(player_idx) in self._keys
+
+    @property
+    def player_idx(self):
+        return self._player_idx[:self.size]
+
+    @property
+    def bits(self):
+        return self._bits[:self.size]
+
+    def get_key(self, player_idx):
+        return np.sort(np.asarray(player_idx, dtype=np.int16)).tobytes()
+
+    def get_bits(self, player_idx):
+        bits = np.zeros(self.num_bytes * 8, dtype=bool)
+        bits[np.asarray(player_idx, dtype=np.int64)] = True
+        return np.packbits(bits)
+
+    def grow(self):
+        capacity = max(2 * len(self._player_idx), INITIAL_CAPACITY)
+        player_idx = np.zeros((capacity, self.roster_size), dtype=np.int16)
+        bits = np.zeros((capacity, self.num_bytes), dtype=np.uint8)
+        player_idx[:self.size] = self.player_idx
+        bits[:self.size] = self.bits
+        self._player_idx = player_idx
+        self._bits = bits
+
+    def add(self, player_idx, dedup=True):
+        # Add a lineup. Returns False if dedup is set and the lineup is already in the set
+        player_idx = getattr(player_idx, "player_idx", player_idx)
+        if len(player_idx) != self.roster_size:
+            err_msg = "Lineup has {0} players but roster size is {1}!".format(len(player_idx), self.roster_size)
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+
+        key = self.get_key(player_idx)
+        if dedup and key in self._keys:
+            return False
+        if self.size == len(self._player_idx):
+            self.grow()
+
+        self._player_idx[self.size] = np.frombuffer(key, dtype=np.int16)
+        self._bits[self.size] = self.get_bits(player_idx)
+        self._keys.setdefault(key, self.size)
+        self.size += 1
+        return True
+
+    def extend(self, lineups, dedup=True):
+        # Add lineups and return the number actually added
+        return sum(self.add(lineup, dedup) for lineup in lineups)
+
+    def take(self, lineup_idx):
+        # New set with only the given lineups, in the given order
+        lineup_set = LineupSet(self.num_players, self.roster_size, capacity=max(len(lineup_idx), 1))
+        lineup_set.extend(self.player_idx[lineup_idx], dedup=False)
+        return lineup_set
+
+    def unique(self):
+        # New set without duplicate lineups, keeping first occurrences in order
+        _, first_idx = np.unique(self.player_idx, axis=0, return_index=True)
+        return self.take(np.sort(first_idx))
+
+    def to_matrix(self):
+        # Sparse (num_players x num_lineups) matrix with a 1 where a player is in a lineup
+        players = self.player_idx.ravel().astype(np.int64)
+        lineup_cols = np.repeat(np.arange(self.size), self.roster_size)
+        return sp.csc_matrix((np.ones(len(players), dtype=np.int16), (players, lineup_cols)),
+                             shape=(self.num_players, self.size))
+
+    def overlap_with(self, player_idx):
+        # Number of players each lineup shares with a single lineup
+        return POPCOUNT[self.bits & self.get_bits(getattr(player_idx, "player_idx", player_idx))].sum(axis=1)
+
+    def pairwise_overlap(self, other=None):
+        # Dense (len(self) x len(other)) matrix of shared players. Use max_overlap for large sets
+        other = self if other is None else other
+        return (self.to_matrix().T @ other.to_matrix()).toarray().astype(np.int16)
+
+    def max_overlap(self, other=None):
+        # Most players each lineup shares with any other lineup (of other, if given). Computed in row chunks
+        # so memory stays bounded for 10k+ lineups
+        other_mat = (self if other is None else other).to_matrix().tocsr()
+        lineups_mat = self.to_matrix().T.tocsr()
+        max_overlap = np.zeros(self.size, dtype=np.int16)
+        for start in range(0, self.size, OVERLAP_CHUNK_SIZE):
+            end = min(start + OVERLAP_CHUNK_SIZE, self.size)
+            overlap = (lineups_mat[start:end] @ other_mat).toarray()
+            if other is None:
+                overlap[np.arange(end - start), np.arange(start, end)] = 0
+            if overlap.shape[1]:
+                max_overlap[start:end] = overlap.max(axis=1)
+        return max_overlap
+
+    def player_exposure(self):
+        # Number of lineups each player is in
+        return np.bincount(self.player_idx.ravel(), minlength=self.num_players)
+
+    def team_exposure(self, team_codes, num_teams=None):
+        # Number of lineups using at least one player from each team
+        num_teams = int(np.max(team_codes)) + 1 if num_teams is None else num_teams
+        uses_team = np.zeros((self.size, num_teams), dtype=bool)
+        uses_team[np.arange(self.size)[:, None], np.asarray(team_codes)[self.player_idx]] = True
+        return uses_team.sum(axis=0)
+
+    def to_frame(self, slate):
+        # Slate rows of every lineup with a lineup column
+        frame = slate.data.iloc[self.player_idx.ravel()].copy()
+        frame.insert(0, LINEUP_FIELD, np.repeat(np.arange(self.size), self.roster_size))
+        return frame.reset_index(drop=True)
+
+    @classmethod
+    def from_frame(cls, slate, frame, id_col=PLAYER_ID_FIELD, dedup=True):
+        # Build from a frame with one row per (lineup, player) keyed by lineup column and a slate id column
+        player_idx = get_player_indices(slate, frame[id_col], id_col)
+        lineup_codes, _ = pd.factorize(frame[LINEUP_FIELD])
+        order = np.argsort(lineup_codes, kind="stable")
+        sizes = np.bincount(lineup_codes)
+        if len(sizes) and (sizes != sizes[0]).any():
+            err_msg = "Lineups in frame have different numbers of players!"
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+        roster_size = int(sizes[0]) if len(sizes) else DK_ROSTER_SIZE
+        return cls.from_lineups(slate.num_players, player_idx[order].reshape(-1, roster_size), roster_size, dedup)
+
+    def to_dk_csv(self, csv_file, slate, id_col=cols.NAME_FIELD):
+        # Write DraftKings upload file with one lineup per row in roster slot order
+        positions = slate.data[cols.POS_FIELD].to_numpy(dtype=object)
+        ids = slate.data[id_col].to_numpy(dtype=object)
+        rows = [ids[get_dk_slot_order(lineup, positions)] for lineup in self.player_idx]
+        upload = pd.DataFrame(rows, columns=DK_SLOTS)
+        upload.to_csv(csv_file, index=False)
+        return upload
+
+    @classmethod
+    def from_dk_csv(cls, csv_file, slate, id_col=cols.NAME_FIELD, dedup=True):
+        # Read lineups from a DraftKings upload file
+        upload = pd.read_csv(csv_file)
+        slot_cols = [col for col in upload.columns if col.split(".")[0] in DK_SLOTS]
+        player_idx = get_player_indices(slate, upload[slot_cols].to_numpy(dtype=object).ravel(), id_col)
+        return cls.from_lineups(slate.num_players, player_idx.reshape(len(upload), len(slot_cols)),
+                                len(slot_cols), dedup)
+
+
+def get_player_indices(slate, ids, id_col):
+    # Slate indices of players given their value in id_col
+    slate_ids = pd.Index(slate.data[id_col])
+    if not slate_ids.is_unique:
+        err_msg = "Slate column '{0}' does not uniquely identify players!".format(id_col)
+        logging.error(err_msg)
+        raise DFSException(err_msg)
+    player_idx = slate_ids.get_indexer(pd.Index(ids))
+    if (player_idx < 0).any():
+        err_msg = "Players not on slate: {0}".format(", ".join(str(x) for x in pd.Index(ids)[player_idx < 0][:10]))
+        logging.error(err_msg)
+        raise DFSException(err_msg)
+    return player_idx
+
+
+def get_dk_slot_order(player_idx, positions):
+    # Order lineup players by DraftKings roster slot. The player left over after filling fixed slots is the FLEX
+    remaining = {}
+    for i in player_idx:
+        remaining.setdefault(positions[i], []).append(i)
+
+    slot_order = []
+    for slot in DK_SLOTS:
+        players = remaining.get(DK_SLOT_POS.get(slot, slot), [])
+        if slot != FLEX_SLOT and players:
+            slot_order.append(players.pop(0))
+
+    flex = [i for pos in DK_FLEX_POS for i in remaining.get(pos, [])]
+    if len(slot_order) != len(DK_SLOTS) - 1 or len(flex) != 1 or len(player_idx) != len(DK_SLOTS):
+        err_msg = "Lineup does not fit DraftKings roster slots: {0}".format(list(player_idx))
+        logging.error(err_msg)
+        raise DFSException(err_msg)
+    slot_order.insert(DK_SLOTS.index(FLEX_SLOT), flex[0])
+    return np.array(slot_order, dtype=np.int64)
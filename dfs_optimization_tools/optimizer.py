@@ -0,0 +1,939 @@
+import hashlib
+import json
+import logging
+import math
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import pulp
+
+from utils import DFSException
+import constants as cols
+import stacking
+import lineups
+import transforms
+
+PLAYER_ID_FIELD = lineups.PLAYER_ID_FIELD
+TIER_FIELD = "tier"
+PROJ_TYPES = ["avg", "floor", "ceil", "tier_avg", "sharpe"]
+POSITIONS = list(cols.REQUIRED_POS.values())
+DEFENSE_POS = cols.REQUIRED_POS["D"]
+
+# Classic DraftKings roster
+DK_ROSTER_SIZE = lineups.DK_ROSTER_SIZE
+DK_SALARY_CAP = 50000
+DK_POS_MAX = {"QB": 1, "RB": 3, "WR": 4, "TE": 2, "D": 1}
+DK_POS_MIN = {"QB": 1, "RB": 2, "WR": 3, "TE": 1, "D": 1}
+
+# LineupGenerator.status after generating every requested lineup or running out of valid lineups. Any other
+# status is the solver status that stopped generation early (e.g. the DP backend's node_limit)
+GENERATION_COMPLETE = "complete"
+GENERATION_EXHAUSTED = "exhausted"
+
+# Solutions HiGHS found along the way that are kept as candidate warm starts for later solves
+MAX_WARM_START_SOLUTIONS = 100
+
+# Lineup constraint options and their defaults (same as the notebook get_basic_dfs_solver)
+DEFAULT_CONFIG = {"salary_cap": DK_SALARY_CAP,
+                  "roster_size": DK_ROSTER_SIZE,
+                  "max_per_team": 9,
+                  "min_per_team_in_lineup": 1,
+                  "max_off_players_per_game": 9,
+                  "proj_type": "avg",
+                  "sd_multiplier": 2,
+                  "projection_transforms": None,
+                  "opposing_player_exclusions": [],
+                  "stacks": [],
+                  "point_diff_for_identical": 0,
+                  "max_offensive_games": 9,
+                  "min_offensive_games": 1,
+                  "max_offensive_teams": 9,
+                  "min_offensive_teams": 1,
+                  "game_stacks": [],
+                  "team_stacks": [],
+                  "min_from_qb_game": 0,
+                  "max_from_d_team": 0,
+                  "min_qb_stack": 0,
+                  "use_actual_points": False,
+                  "min_home_players": 0,
+                  "max_home_players": 9,
+                  "exclude_teams": [],
+                  "min_stud_rbs": 0,
+                  "min_stud_rb_salary": 0,
+                  "min_qb_salary": 0,
+                  "max_te_salary": 0,
+                  "require_home_qb": False,
+                  "min_opposing_games": 0,
+                  "min_studs": 0,
+                  "stud_salary": 0,
+                  "min_wr_rb_salary": 0,
+                  "max_wr_rb_per_team": 0,
+                  "min_per_game_in_lineup": 0,
+                  "no_qb_d_stack": False,
+                  "max_rb_per_team": 0,
+                  "max_wr_per_team": 0}
+
+
+def get_model_config(**config):
+    # Fill in defaults and reject options the model builder doesn't know about
+    unknown = [key for key in config if key not in DEFAULT_CONFIG]
+    if unknown:
+        err_msg = "Unknown lineup model option(s): {0}".format(", ".join(sorted(unknown)))
+        logging.error(err_msg)
+        raise DFSException(err_msg)
+
+    model_config = dict(DEFAULT_CONFIG)
+    model_config.update(config)
+    if model_config["proj_type"] not in PROJ_TYPES:
+        raise DFSException("proj_type must be one of {0}".format(PROJ_TYPES))
+    if model_config["projection_transforms"] is not None:
+        transforms.validate_transforms(model_config["projection_transforms"])
+    return model_config
+
+
+def incidence_matrix(codes, num_groups):
+    # Sparse (num_groups x num_players) matrix with a 1 where player belongs to group. Codes < 0 are ignored
+    codes = np.asarray(codes)
+    players = np.flatnonzero(codes >= 0)
+    return sp.csr_matrix((np.ones(len(players)), (codes[players], players)), shape=(num_groups, len(codes)))
+
+
+def load_non_main_slate_teams(json_file, week):
+    # Teams playing outside the main slate for a week
+    with open(json_file, "r") as fh:
+        return json.load(fh).get(str(week), [])
+
+
+class Slate(object):
+    # Harmonized weekly player data compiled once into numpy arrays and sparse incidence matrices
+    def __init__(self, data, min_projection_cutoff=2, exclude_teams=None):
+
+        for required_col in [cols.NAME_FIELD, cols.POS_FIELD, cols.TEAM_FIELD, cols.OPP_TEAM_FIELD,
+                             cols.SALARY_FIELD, cols.PROJ_POINTS_FIELD]:
+            if required_col not in data.columns:
+                err_msg = "Slate missing required column: {0}".format(required_col)
+                logging.error(err_msg)
+                raise DFSException(err_msg)
+
+        # Remove teams that aren't part of slate
+        data = data.reset_index(drop=True)
+        if exclude_teams:
+            data = data[~data[cols.TEAM_FIELD].isin(exclude_teams)].reset_index(drop=True)
+
+        # Generate player ids before removing players lower than minimum projection cutoff.
+        # Slates built from another slate's data (see Slate.take) keep its ids
+        if PLAYER_ID_FIELD not in data.columns:
+            data[PLAYER_ID_FIELD] = ["{0}_{1}_{2}".format(pos, team, i) for i, (pos, team) in
+                                     enumerate(zip(data[cols.POS_FIELD], data[cols.TEAM_FIELD]))]
+        data = data[data[cols.PROJ_POINTS_FIELD] >= min_projection_cutoff].reset_index(drop=True)
+        self.data = data
+        self.num_players = len(data)
+
+        # Player attribute arrays
+        self.player_ids = data[PLAYER_ID_FIELD].to_numpy(dtype=object)
+        self.salary = data[cols.SALARY_FIELD].to_numpy(dtype=np.float64)
+        self.projection = data[cols.PROJ_POINTS_FIELD].to_numpy(dtype=np.float64)
+        self.sd = self.get_optional_col(cols.PROJ_POINTS_SD_FIELD, 0.0)
+        self.actual = self.get_optional_col(cols.POINTS_FIELD, np.nan)
+        self.tier = self.get_optional_col(TIER_FIELD, np.nan)
+        if cols.HOME_TEAM_FIELD in data.columns:
+            self.home = data[cols.HOME_TEAM_FIELD].to_numpy(dtype=bool)
+        else:
+            self.home = np.zeros(self.num_players, dtype=bool)
+
+        # Position codes index into POSITIONS
+        unknown_pos = set(data[cols.POS_FIELD]) - set(POSITIONS)
+        if unknown_pos:
+            err_msg = "Slate contains invalid positions: {0}".format(", ".join(sorted(unknown_pos)))
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+        self.positions = POSITIONS
+        self.pos_codes = pd.Categorical(data[cols.POS_FIELD], categories=POSITIONS).codes.astype(np.int64)
+        self.is_defense = self.pos_codes == self.pos_index(DEFENSE_POS)
+
+        # Position/tier group of each player (-1 if player has no tier) used by projection transforms
+        self.pos_tier_codes, self.num_pos_tiers = transforms.get_group_codes(self.pos_codes, self.tier)
+
+        # Team codes index into sorted list of teams (including opponents)
+        self.teams = sorted(set(data[cols.TEAM_FIELD]) | set(data[cols.OPP_TEAM_FIELD]))
+        team_lookup = {team: i for i, team in enumerate(self.teams)}
+        self.team_codes = np.array([team_lookup[team] for team in data[cols.TEAM_FIELD]], dtype=np.int64)
+        self.opp_codes = np.array([team_lookup[team] for team in data[cols.OPP_TEAM_FIELD]], dtype=np.int64)
+
+        # Game codes index into sorted list of games named by their two sorted teams
+        game_names = ["_".join(sorted([team, opp])) for team, opp in zip(data[cols.TEAM_FIELD],
+                                                                          data[cols.OPP_TEAM_FIELD])]
+        self.games = sorted(set(game_names))
+        game_lookup = {game: i for i, game in enumerate(self.games)}
+        self.game_codes = np.array([game_lookup[game] for game in game_names], dtype=np.int64)
+        self.game_teams = [[team_lookup[team] for team in game.split("_")] for game in self.games]
+
+        # Opponent of each team (-1 if team's opponent isn't known)
+        self.team_opp = np.full(len(self.teams), -1, dtype=np.int64)
+        self.team_opp[self.team_codes] = self.opp_codes
+
+        # Incidence matrices
+        self.pos_matrix = incidence_matrix(self.pos_codes, len(self.positions))
+        self.team_matrix = incidence_matrix(self.team_codes, len(self.teams))
+        self.game_matrix = incidence_matrix(self.game_codes, len(self.games))
+        self.off_team_matrix = incidence_matrix(np.where(self.is_defense, -1, self.team_codes), len(self.teams))
+        self.off_game_matrix = incidence_matrix(np.where(self.is_defense, -1, self.game_codes), len(self.games))
+
+    def get_hash(self):
+        # Content hash of the compiled slate arrays
+        slate_hash = hashlib.sha256()
+        slate_hash.update("|".join(self.player_ids).encode("utf-8"))
+        slate_hash.update("|".join(self.teams).encode("utf-8"))
+        for values in [self.salary, self.projection, self.sd, self.actual, self.tier, self.home,
+                       self.pos_codes, self.team_codes, self.opp_codes, self.game_codes]:
+            slate_hash.update(np.ascontiguousarray(values).tobytes())
+        return slate_hash.hexdigest()
+
+    def get_optional_col(self, col, default):
+        if col in self.data.columns:
+            return self.data[col].to_numpy(dtype=np.float64)
+        return np.full(self.num_players, default, dtype=np.float64)
+
+    @classmethod
+    def from_csv(cls, harm_file, non_main_slate_teams=None, min_projection_cutoff=2):
+        return cls(pd.read_csv(harm_file), min_projection_cutoff=min_projection_cutoff, exclude_teams=non_main_slate_teams)
+
+    def take(self, player_idx):
+        # New slate with only the given players. Players keep their ids
+        return Slate(self.data.iloc[player_idx], min_projection_cutoff=-np.inf)
+
+    def pos_index(self, pos):
+        return self.positions.index(pos)
+
+    def players_at(self, pos, team=None):
+        # Indices of players at a position (optionally on a team)
+        mask = self.pos_codes == self.pos_index(pos)
+        if team is not None:
+            mask &= self.team_codes == team
+        return np.flatnonzero(mask)
+
+    def get_objective(self, proj_type="avg", sd_multiplier=2, use_actual_points=False, projection_transforms=None):
+        # Objective coefficient of each player. projection_transforms is an optional list of transform steps
+        # (see transforms.py) used instead of proj_type
+        if use_actual_points:
+            return self.actual.copy()
+        if projection_transforms is None:
+            projection_transforms = transforms.get_proj_type_transforms(proj_type, sd_multiplier)
+        return transforms.apply_transforms(self, projection_transforms)
+
+    def lineup_frame(self, player_idx):
+        # Slate rows for players in a lineup
+        return self.data.iloc[np.sort(player_idx)]
+
+
+class LineupModel(object):
+    # Lineup MILP stored as arrays. The first slate.num_players columns are player binaries and
+    # any auxiliary binaries follow. Rows are appended, never rebuilt, so solver backends can sync incrementally
+    def __init__(self, slate, objective=None):
+        self.slate = slate
+        self.col_names = list(slate.player_ids)
+        self.col_lb = [0.0] * slate.num_players
+        self.col_ub = [1.0] * slate.num_players
+        self.objective = np.zeros(slate.num_players) if objective is None else np.asarray(objective, dtype=np.float64)
+        self.row_indices = []
+        self.row_coefs = []
+        self.row_lb = []
+        self.row_ub = []
+
+        # Roster template (salary, roster size and position rows). build_lineup_model adds these rows first
+        # so specialized backends can tell them apart from any other constraints
+        self.salary_cap = DK_SALARY_CAP
+        self.roster_size = DK_ROSTER_SIZE
+        self.pos_min = DK_POS_MIN
+        self.pos_max = DK_POS_MAX
+        self.num_template_rows = 0
+        self.salary_row = None
+
+        # Options the model was built with (see build_lineup_model)
+        self.config = None
+
+        # Counters backends use to detect what changed since their last sync
+        self.objective_version = 0
+        self.bounds_version = 0
+        self.row_bounds_version = 0
+
+    @property
+    def num_cols(self):
+        return len(self.col_names)
+
+    @property
+    def num_rows(self):
+        return len(self.row_lb)
+
+    @property
+    def num_players(self):
+        return self.slate.num_players
+
+    def add_col(self, name, lb=0.0, ub=1.0):
+        # Add auxiliary binary column and return its index
+        self.col_names.append(name)
+        self.col_lb.append(lb)
+        self.col_ub.append(ub)
+        self.objective = np.append(self.objective, 0.0)
+        return self.num_cols - 1
+
+    def add_row(self, indices, coefs=1.0, lb=-np.inf, ub=np.inf):
+        indices = np.asarray(indices, dtype=np.int64)
+        coefs = np.broadcast_to(np.asarray(coefs, dtype=np.float64), indices.shape).copy()
+        self.row_indices.append(indices)
+        self.row_coefs.append(coefs)
+        self.row_lb.append(float(lb))
+        self.row_ub.append(float(ub))
+        return self.num_rows - 1
+
+    def add_matrix_rows(self, matrix, lb=-np.inf, ub=np.inf, extra=None):
+        # Add one row per row of a sparse matrix over player columns.
+        # extra is an optional list of (column, coef) per row for auxiliary columns
+        matrix = sp.csr_matrix(matrix)
+        rows = []
+        for i in range(matrix.shape[0]):
+            start, end = matrix.indptr[i], matrix.indptr[i+1]
+            indices = matrix.indices[start:end]
+            coefs = matrix.data[start:end]
+            if extra is not None and extra[i] is not None:
+                indices = np.append(indices, extra[i][0])
+                coefs = np.append(coefs, extra[i][1])
+            row_lb = lb[i] if np.ndim(lb) else lb
+            row_ub = ub[i] if np.ndim(ub) else ub
+            rows.append(self.add_row(indices, coefs, row_lb, row_ub))
+        return rows
+
+    def set_objective(self, player_objective):
+        # Replace player objective coefficients (auxiliary columns stay at 0)
+        player_objective = np.asarray(player_objective, dtype=np.float64)
+        if len(player_objective) != self.num_players:
+            raise DFSException("Objective has {0} coefficients but slate has {1} players!".format(len(player_objective),
+                                                                                                 self.num_players))
+        self.objective = np.zeros(self.num_cols)
+        self.objective[:self.num_players] = player_objective
+        self.objective_version += 1
+
+    def set_col_bounds(self, cols_to_set, lb, ub):
+        for col in np.atleast_1d(cols_to_set):
+            self.col_lb[col] = float(lb)
+            self.col_ub[col] = float(ub)
+        self.bounds_version += 1
+
+    def set_row_bounds(self, rows, lb, ub):
+        # Change bounds of existing rows, e.g. to relax the overlap cut of a lineup being re-solved
+        for row in np.atleast_1d(rows):
+            self.row_lb[row] = float(lb)
+            self.row_ub[row] = float(ub)
+        self.row_bounds_version += 1
+
+    def add_max_overlap_cut(self, player_idx, max_overlap):
+        # Prevent any future lineup from sharing more than max_overlap players with a lineup
+        return self.add_row(player_idx, 1.0, ub=max_overlap)
+
+    def get_matrix(self):
+        # Constraint matrix as CSR (num_rows x num_cols)
+        if not self.num_rows:
+            return sp.csr_matrix((0, self.num_cols))
+        indptr = np.concatenate([[0], np.cumsum([len(x) for x in self.row_indices])])
+        return sp.csr_matrix((np.concatenate(self.row_coefs), np.concatenate(self.row_indices), indptr),
+                             shape=(self.num_rows, self.num_cols))
+
+    def is_feasible(self, values, tol=1e-6):
+        # Mask of candidate solutions (one per row of values) within the current column and row bounds
+        values = np.atleast_2d(values)
+        in_bounds = np.all((values >= np.array(self.col_lb) - tol) & (values <= np.array(self.col_ub) + tol), axis=1)
+        row_values = (self.get_matrix() @ values.T).T
+        return in_bounds & np.all((row_values >= np.array(self.row_lb) - tol) &
+                                  (row_values <= np.array(self.row_ub) + tol), axis=1)
+
+
+def build_lineup_model(slate, pos_max=None, pos_min=None, **config):
+    # Build lineup MILP for a compiled slate. Supports the same options as the notebook get_basic_dfs_solver
+    pos_max = DK_POS_MAX if pos_max is None else pos_max
+    pos_min = DK_POS_MIN if pos_min is None else pos_min
+    config = get_model_config(**config)
+    n = slate.num_players
+    all_players = np.arange(n)
+    is_off = ~slate.is_defense
+
+    objective = slate.get_objective(config["proj_type"], config["sd_multiplier"], config["use_actual_points"],
+                                    config["projection_transforms"])
+    model = LineupModel(slate, objective)
+    model.config = config
+
+    # Add salary and total player constraints
+    model.salary_row = model.add_row(all_players, slate.salary, ub=config["salary_cap"])
+    model.add_row(all_players, 1.0, lb=config["roster_size"], ub=config["roster_size"])
+
+    # Add positional constraints
+    pos_counts = np.asarray(slate.pos_matrix.sum(axis=1)).ravel()
+    for i, pos in enumerate(slate.positions):
+        if pos_counts[i]:
+            model.add_row(slate.players_at(pos), 1.0, lb=pos_min[pos], ub=pos_max[pos])
+    model.salary_cap = config["salary_cap"]
+    model.roster_size = config["roster_size"]
+    model.pos_min = pos_min
+    model.pos_max = pos_max
+    model.num_template_rows = model.num_rows
+
+    # Teams with players on slate
+    teams = [team for team in range(len(slate.teams)) if np.any(slate.team_codes == team)]
+
+    # Remove excluded teams
+    for team in config["exclude_teams"]:
+        if team in slate.teams:
+            model.set_col_bounds(np.flatnonzero(slate.team_codes == slate.teams.index(team)), 0, 0)
+
+    # Add team-level constraints
+    off_team_matrix = slate.off_team_matrix
+    model.add_matrix_rows(off_team_matrix[teams], ub=config["max_per_team"])
+
+    team_vars = {}
+    # Team and game variables are only added when their constraints can actually bind. Lineups always include
+    # offensive players, so limits of at least 1 and at most a full roster of teams/games never cut off a lineup
+    # but make every solve (especially after overlap cuts) much slower
+    roster_size = config["roster_size"]
+    has_offense = roster_size > pos_max.get(DEFENSE_POS, 0)
+    max_offensive_games = config["max_offensive_games"] or config["min_offensive_games"]
+    need_team_count = 0 < config["max_offensive_teams"] < roster_size or config["min_offensive_teams"] > int(has_offense) or \
+                      config["min_per_team_in_lineup"] > 1
+    need_game_vars = (0 < max_offensive_games < roster_size) or config["min_offensive_games"] > int(has_offense) or \
+                     config["min_per_game_in_lineup"] > 1
+    need_team_vars = need_team_count or need_game_vars or config["min_opposing_games"] > 0
+    if need_team_vars:
+        assert config["max_offensive_teams"] >= config["min_offensive_teams"]
+        assert config["max_offensive_teams"] <= config["roster_size"]
+        for team in teams:
+            var = model.add_col("team_offense_{0}".format(slate.teams[team]))
+            team_vars[team] = var
+            # Offensive players can only be used if team variable is set
+            for player in np.flatnonzero(is_off & (slate.team_codes == team)):
+                model.add_row([player, var], [1.0, -1.0], ub=0)
+
+        # Team variable only set if at least min_per_team_in_lineup offensive players are used
+        model.add_matrix_rows(off_team_matrix[teams], lb=0,
+                              extra=[([team_vars[team]], [-config["min_per_team_in_lineup"]]) for team in teams])
+
+    for team in teams:
+        team_players = slate.team_codes == team
+        qbs = np.flatnonzero(team_players & (slate.pos_codes == slate.pos_index("QB")))
+
+        if config["min_qb_stack"]:
+            # Number of QB teammates must be >= min_qb_stack if QB is used
+            off_players = np.flatnonzero(team_players & is_off & (slate.pos_codes != slate.pos_index("QB")))
+            model.add_row(np.concatenate([off_players, qbs]),
+                          np.concatenate([np.ones(len(off_players)), np.full(len(qbs), -config["min_qb_stack"])]),
+                          lb=0)
+
+        if config["max_wr_rb_per_team"]:
+            for pos in ["RB", "WR"]:
+                model.add_row(slate.players_at(pos, team), 1.0, ub=config["max_wr_rb_per_team"])
+
+        if config["max_wr_per_team"]:
+            model.add_row(slate.players_at("WR", team), 1.0, ub=config["max_wr_per_team"])
+
+        if config["max_rb_per_team"]:
+            model.add_row(slate.players_at("RB", team), 1.0, ub=config["max_rb_per_team"])
+
+        if config["no_qb_d_stack"]:
+            model.add_row(np.concatenate([qbs, slate.players_at(DEFENSE_POS, team)]), 1.0, ub=1)
+
+        if config["max_from_d_team"]:
+            # At most max_from_d_team offensive players from the team whose defense is used
+            off_players = np.flatnonzero(team_players & is_off)
+            dst = slate.players_at(DEFENSE_POS, team)
+            big_m = config["max_per_team"]
+            model.add_row(np.concatenate([off_players, dst]),
+                          np.concatenate([np.ones(len(off_players)), np.full(len(dst), big_m)]),
+                          ub=big_m + config["max_from_d_team"])
+
+    # Add constraint that some number of opposing matchups must be included
+    if config["min_opposing_games"]:
+        opposing_vars = []
+        for i, game in enumerate(slate.games):
+            var = model.add_col("opposing_players_{0}".format(game))
+            opposing_vars.append(var)
+            game_team_vars = [team_vars[team] for team in slate.game_teams[i] if team in team_vars]
+            model.add_row(game_team_vars + [var], [1.0] * len(game_team_vars) + [-2.0], lb=0)
+        model.add_row(opposing_vars, 1.0, lb=config["min_opposing_games"])
+
+    # Add constraint that total number of teams cannot exceed max number of teams
+    if need_team_count and (config["max_offensive_teams"] > 0 or config["min_offensive_teams"] > 0):
+        model.add_row(list(team_vars.values()), 1.0, lb=config["min_offensive_teams"], ub=config["max_offensive_teams"])
+
+    # Add max games constraint
+    game_vars = {}
+    if need_game_vars:
+        assert max_offensive_games >= config["min_offensive_games"]
+        for i, game in enumerate(slate.games):
+            var = model.add_col("game_{0}".format(game))
+            game_vars[i] = var
+            game_team_vars = [team_vars[team] for team in slate.game_teams[i] if team in team_vars]
+            for team_var in game_team_vars:
+                model.add_row([team_var, var], [1.0, -1.0], ub=0)
+            model.add_row(game_team_vars + [var], [1.0] * len(game_team_vars) + [-1.0], lb=0)
+        model.add_row(list(game_vars.values()), 1.0, lb=config["min_offensive_games"], ub=max_offensive_games)
+
+    # Add max per game constraint
+    off_game_matrix = slate.off_game_matrix
+    model.add_matrix_rows(off_game_matrix, ub=config["max_off_players_per_game"])
+    if config["min_per_game_in_lineup"] > 1:
+        model.add_matrix_rows(off_game_matrix, lb=0,
+                              extra=[([game_vars[i]], [-config["min_per_game_in_lineup"]])
+                                     for i in range(len(slate.games))])
+    if config["min_from_qb_game"]:
+        for qb in slate.players_at("QB"):
+            game_players = np.flatnonzero(is_off & (slate.game_codes == slate.game_codes[qb]) & (all_players != qb))
+            model.add_row(np.append(game_players, qb),
+                          np.append(np.ones(len(game_players)), 1.0 - config["min_from_qb_game"]), lb=0)
+
+    # Add game stacks. Each game stack enforces at least N players from same game appear in lineup
+    # e.g. [4,2] means 4 players must come from same game and at least 2 must come from another game
+    if config["game_stacks"]:
+        add_group_stacks(model, off_game_matrix, slate.games, config["game_stacks"], "gamestack", config["roster_size"])
+
+    # Add constraints for types of positions that can oppose each other on same team
+    for opposing_player_exclusion in config["opposing_player_exclusions"]:
+        stacking.restrict_positions_from_opposing_teams(model, opposing_player_exclusion, pos_max)
+
+    # Stack eligibility always uses projections, even when optimizing actual points
+    if config["stacks"]:
+        stacks = stacking.StackSet(config["stacks"], pos_max, config["max_per_team"])
+        stack_projection = slate.get_objective(config["proj_type"], config["sd_multiplier"],
+                                               projection_transforms=config["projection_transforms"])
+        stacking.add_stacks(model, stacks, stack_projection, config["point_diff_for_identical"])
+
+    if config["team_stacks"]:
+        add_group_stacks(model, off_team_matrix[teams], [slate.teams[team] for team in teams],
+                         config["team_stacks"], "teamstack", config["roster_size"])
+
+    if config["min_home_players"]:
+        home_players = np.flatnonzero(slate.home)
+        if config["min_home_players"] == config["roster_size"]:
+            model.set_col_bounds(np.flatnonzero(~slate.home), 0, 0)
+        else:
+            model.add_row(home_players, 1.0, lb=config["min_home_players"], ub=config["max_home_players"])
+
+    is_pos = {pos: slate.pos_codes == slate.pos_index(pos) for pos in slate.positions}
+    if config["min_stud_rbs"] and config["min_stud_rb_salary"]:
+        model.add_row(np.flatnonzero(is_pos["RB"] & (slate.salary >= config["min_stud_rb_salary"])), 1.0,
+                      lb=config["min_stud_rbs"])
+
+    if config["min_qb_salary"]:
+        model.set_col_bounds(np.flatnonzero(is_pos["QB"] & (slate.salary < config["min_qb_salary"])), 0, 0)
+
+    if config["max_te_salary"]:
+        model.set_col_bounds(np.flatnonzero(is_pos["TE"] & (slate.salary > config["max_te_salary"])), 0, 0)
+
+    if config["require_home_qb"]:
+        model.set_col_bounds(np.flatnonzero(is_pos["QB"] & ~slate.home), 0, 0)
+
+    if config["min_studs"]:
+        model.add_row(np.flatnonzero(slate.salary >= config["stud_salary"]), 1.0, lb=config["min_studs"])
+
+    if config["min_wr_rb_salary"]:
+        model.set_col_bounds(np.flatnonzero((is_pos["WR"] | is_pos["RB"]) & (slate.salary < config["min_wr_rb_salary"])), 0, 0)
+
+    return model
+
+
+def add_group_stacks(model, group_matrix, group_names, group_stacks, var_prefix, roster_size):
+    # At least one group (game/team) must contain group_stack offensive players for every stack size,
+    # and a single group can satisfy only one stack
+    if sum(group_stacks) > roster_size:
+        raise DFSException("Sum of players in stacks ({0}) is larger than roster!".format(sum(group_stacks)))
+
+    group_stack_vars = [[] for i in range(len(group_names))]
+    for i, group_stack in enumerate(group_stacks):
+        if group_stack <= 1:
+            raise DFSException("Can't have a stack of 1 or less players as that's not a stack!")
+        stack_vars = []
+        for j, group_name in enumerate(group_names):
+            var = model.add_col("{0}_{1}_{2}_{3}".format(var_prefix, group_name, group_stack, i))
+            stack_vars.append(var)
+            group_stack_vars[j].append(var)
+        model.add_row(stack_vars, 1.0, lb=1)
+
+    # Since a group satisfies at most one stack, a single row per group covering every stack size is
+    # equivalent to one row per (group, stack) but gives a much tighter LP relaxation
+    model.add_matrix_rows(group_matrix, lb=0, extra=[(stack_vars, [-x for x in group_stacks])
+                                                     for stack_vars in group_stack_vars])
+    for stack_vars in group_stack_vars:
+        model.add_row(stack_vars, 1.0, ub=1)
+
+
+class LineupSolution(object):
+    # Result of solving a lineup model
+    def __init__(self, status, player_idx=None, objective=None):
+        self.status = status
+        self.player_idx = np.array([], dtype=np.int64) if player_idx is None else np.sort(player_idx)
+        self.objective = objective
+        self.solve_secs = None
+
+    @property
+    def is_optimal(self):
+        return self.status == "optimal"
+
+
+class PulpBackend(object):
+    # Keeps one PuLP problem in sync with a LineupModel. Only rows added since the last solve are
+    # converted, and the objective is only rebuilt when it changed
+    def __init__(self, model, solver=None):
+        self.model = model
+        self.solver = pulp.PULP_CBC_CMD(msg=False) if solver is None else solver
+        self.prob = pulp.LpProblem("Fantasy", pulp.LpMaximize)
+        self.vars = []
+        self.row_constraints = []
+        self.rows_synced = 0
+        self.objective_version = None
+        self.bounds_version = None
+        self.row_bounds_version = None
+        self.num_solves = 0
+
+    def sync_row(self, row):
+        # Add constraint(s) for a row. Named by row so they can be replaced if the row's bounds change
+        model = self.model
+        expr = pulp.LpAffineExpression(zip([self.vars[col] for col in model.row_indices[row]],
+                                           model.row_coefs[row].tolist()))
+        row_lb = model.row_lb[row]
+        row_ub = model.row_ub[row]
+        constraints = []
+        if row_lb == row_ub:
+            constraints.append(("r{0}_eq".format(row), pulp.LpConstraint(expr, pulp.LpConstraintEQ, rhs=row_lb)))
+        else:
+            if row_lb > -np.inf:
+                constraints.append(("r{0}_lb".format(row), pulp.LpConstraint(expr, pulp.LpConstraintGE, rhs=row_lb)))
+            if row_ub < np.inf:
+                constraints.append(("r{0}_ub".format(row), pulp.LpConstraint(expr, pulp.LpConstraintLE, rhs=row_ub)))
+        for name, constraint in constraints:
+            self.prob.addConstraint(constraint, name=name)
+        return row_lb, row_ub, [name for name, _ in constraints]
+
+    def sync(self):
+        model = self.model
+
+        # Add new columns
+        for col in range(len(self.vars), model.num_cols):
+            self.vars.append(pulp.LpVariable(model.col_names[col], lowBound=model.col_lb[col],
+                                             upBound=model.col_ub[col], cat="Binary"))
+
+        # Update bounds
+        if self.bounds_version != model.bounds_version:
+            for col, var in enumerate(self.vars):
+                var.lowBound = model.col_lb[col]
+                var.upBound = model.col_ub[col]
+            self.bounds_version = model.bounds_version
+
+        # Replace constraints of rows whose bounds changed
+        if self.row_bounds_version != model.row_bounds_version:
+            for row in range(self.rows_synced):
+                row_lb, row_ub, names = self.row_constraints[row]
+                if row_lb == model.row_lb[row] and row_ub == model.row_ub[row]:
+                    continue
+                for name in names:
+                    del self.prob.constraints[name]
+                self.row_constraints[row] = self.sync_row(row)
+            self.row_bounds_version = model.row_bounds_version
+
+        # Add new rows
+        for row in range(self.rows_synced, model.num_rows):
+            self.row_constraints.append(self.sync_row(row))
+        self.rows_synced = model.num_rows
+
+        # Update objective
+        if self.objective_version != model.objective_version:
+            self.prob.setObjective(pulp.LpAffineExpression(zip(self.vars, model.objective.tolist())))
+            self.objective_version = model.objective_version
+
+    def solve(self):
+        start = time.perf_counter()
+        self.sync()
+        self.num_solves += 1
+        status = self.prob.solve(self.solver)
+        if status != pulp.LpStatusOptimal:
+            solution = LineupSolution(pulp.LpStatus[status].lower())
+        else:
+            values = np.array([var.varValue or 0.0 for var in self.vars[:self.model.num_players]])
+            player_idx = np.flatnonzero(values > 0.5)
+            solution = LineupSolution("optimal", player_idx, float(self.model.objective[player_idx].sum()))
+        solution.solve_secs = time.perf_counter() - start
+        return solution
+
+
+class HighsBackend(object):
+    # Keeps one in-memory HiGHS model in sync with a LineupModel. New columns/rows, bounds and objective
+    # changes are passed through the native API so nothing is written to disk and no solver process is spawned
+    def __init__(self, model, options=None):
+        try:
+            import highspy
+        except ImportError:
+            err_msg = "highspy not installed! Unable to use HiGHS solver backend"
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+
+        self.highspy = highspy
+        self.model = model
+        self.highs = highspy.Highs()
+        self.highs.setOptionValue("output_flag", False)
+        self.highs.setOptionValue("mip_improving_solution_save", True)
+        for option, value in (options or {}).items():
+            self.highs.setOptionValue(option, value)
+        self.highs.changeObjectiveSense(highspy.ObjSense.kMaximize)
+        self.cols_synced = 0
+        self.rows_synced = 0
+        self.objective_version = None
+        self.bounds_version = None
+        self.row_bounds_version = None
+        self.solutions = np.zeros((0, 0))
+        self.num_solves = 0
+        self.num_warm_starts = 0
+
+    def sync(self):
+        model = self.model
+        highs = self.highs
+        inf = self.highspy.kHighsInf
+
+        # Add new columns as binaries
+        num_new_cols = model.num_cols - self.cols_synced
+        if num_new_cols:
+            new_cols = np.arange(self.cols_synced, model.num_cols, dtype=np.int32)
+            highs.addVars(num_new_cols, np.array(model.col_lb[self.cols_synced:]), np.array(model.col_ub[self.cols_synced:]))
+            highs.changeColsIntegrality(num_new_cols, new_cols,
+                                        np.array([self.highspy.HighsVarType.kInteger] * num_new_cols))
+            self.cols_synced = model.num_cols
+
+        # Update bounds
+        if self.bounds_version != model.bounds_version:
+            all_cols = np.arange(model.num_cols, dtype=np.int32)
+            highs.changeColsBounds(model.num_cols, all_cols, np.array(model.col_lb), np.array(model.col_ub))
+            self.bounds_version = model.bounds_version
+
+        # Update bounds of existing rows
+        if self.row_bounds_version != model.row_bounds_version and self.rows_synced:
+            synced_rows = np.arange(self.rows_synced, dtype=np.int32)
+            highs.changeRowsBounds(self.rows_synced, synced_rows,
+                                   np.clip(np.array(model.row_lb[:self.rows_synced]), -inf, inf),
+                                   np.clip(np.array(model.row_ub[:self.rows_synced]), -inf, inf))
+        self.row_bounds_version = model.row_bounds_version
+
+        # Add new rows in one call
+        num_new_rows = model.num_rows - self.rows_synced
+        if num_new_rows:
+            row_indices = model.row_indices[self.rows_synced:]
+            starts = np.concatenate([[0], np.cumsum([len(x) for x in row_indices])[:-1]]).astype(np.int32)
+            indices = np.concatenate(row_indices).astype(np.int32)
+            values = np.concatenate(model.row_coefs[self.rows_synced:])
+            lower = np.clip(np.array(model.row_lb[self.rows_synced:]), -inf, inf)
+            upper = np.clip(np.array(model.row_ub[self.rows_synced:]), -inf, inf)
+            highs.addRows(num_new_rows, lower, upper, len(indices), starts, indices, values)
+            self.rows_synced = model.num_rows
+
+        # Update objective
+        if self.objective_version != model.objective_version:
+            highs.changeColsCost(model.num_cols, np.arange(model.num_cols, dtype=np.int32), model.objective)
+            self.objective_version = model.objective_version
+
+    def solve(self):
+        start = time.perf_counter()
+        self.sync()
+
+        warm_start = self.get_warm_start()
+        if warm_start is not None:
+            highs_solution = self.highspy.HighsSolution()
+            highs_solution.col_value = warm_start.tolist()
+            self.highs.setSolution(highs_solution)
+            self.num_warm_starts += 1
+
+        self.num_solves += 1
+        self.highs.run()
+        status = self.highs.getModelStatus()
+        if status != self.highspy.HighsModelStatus.kOptimal:
+            solution = LineupSolution(self.highs.modelStatusToString(status).lower())
+        else:
+            values = np.round(self.highs.getSolution().col_value)
+            self.save_solutions([values] + [np.round(saved.col_value) for saved in self.highs.getSavedMipSolutions()])
+            player_idx = np.flatnonzero(values[:self.model.num_players] > 0.5)
+            solution = LineupSolution("optimal", player_idx, float(self.model.objective[player_idx].sum()))
+        solution.solve_secs = time.perf_counter() - start
+        return solution
+
+    def save_solutions(self, solutions):
+        # Keep the most recent distinct solutions of the current width as warm start candidates
+        solutions = np.array([values for values in solutions if len(values) == self.model.num_cols])
+        if self.solutions.shape[1] != self.model.num_cols:
+            self.solutions = np.zeros((0, self.model.num_cols))
+        if len(solutions):
+            solutions = np.vstack([self.solutions, solutions])
+            _, first = np.unique(solutions, axis=0, return_index=True)
+            self.solutions = solutions[np.sort(first)][-MAX_WARM_START_SOLUTIONS:]
+
+    def get_warm_start(self):
+        # Best saved solution that is still feasible. Every earlier optimum is cut off by its own max overlap
+        # cut, but incumbents HiGHS passed through on the way to it usually aren't
+        if self.solutions.shape[1] != self.model.num_cols or not len(self.solutions):
+            return None
+        feasible = self.solutions[self.model.is_feasible(self.solutions)]
+        if not len(feasible):
+            return None
+        return feasible[np.argmax(feasible @ self.model.objective)]
+
+
+def get_backend(model, backend="pulp", solver_options=None):
+    if backend == "pulp":
+        return PulpBackend(model)
+    elif backend == "highs":
+        return HighsBackend(model, solver_options)
+    elif backend == "dp":
+        # Imported here since the DP solver builds on this module
+        from dp_solver import DpBackend
+        return DpBackend(model, **(solver_options or {}))
+    err_msg = "Unknown solver backend: {0}".format(backend)
+    logging.error(err_msg)
+    raise DFSException(err_msg)
+
+
+def optimize_lineup(slate, pos_max=None, pos_min=None, backend="pulp", **config):
+    # Build and solve lineup model for a slate. Returns the solution and the backend so it can be re-solved
+    model = build_lineup_model(slate, pos_max, pos_min, **config)
+    solver = get_backend(model, backend)
+    return solver.solve(), solver
+
+
+def get_max_lineups_per_player(slate, num_lineups, max_exposure=1.0, max_qb_exposure=1.0):
+    # Max lineups each player can appear in
+    max_lineups = np.full(slate.num_players, int(math.ceil(num_lineups * max_exposure)))
+    is_qb = slate.pos_codes == slate.pos_index("QB")
+    max_lineups[is_qb] = np.minimum(max_lineups[is_qb], int(math.ceil(num_lineups * max_qb_exposure)))
+    return max_lineups
+
+
+class LineupGenerator(object):
+    # Generates multiple lineups from a single solver instance. After each lineup a max overlap cut is added
+    # and players that reached their exposure limit are fixed to 0 before the next warm-started solve
+    def __init__(self, model, backend="pulp", max_overlap=None, max_exposure=1.0, max_qb_exposure=1.0,
+                 solver_options=None):
+        self.model = model
+        self.backend = get_backend(model, backend, solver_options) if isinstance(backend, str) else backend
+        self.max_overlap = max_overlap
+        self.max_exposure = max_exposure
+        self.max_qb_exposure = max_qb_exposure
+        self.lineups = []
+        self.cut_rows = []
+        self.lineup_set = lineups.LineupSet(model.num_players, model.roster_size)
+        self.exposure = np.zeros(model.num_players, dtype=np.int64)
+        self.max_lineups = None
+        self.status = None
+
+        # Player bounds the model started with, players fixed out since (at max exposure or unavailable)
+        # and players locked into every lineup since
+        self.base_lb = np.array(model.col_lb[:model.num_players])
+        self.base_ub = np.array(model.col_ub[:model.num_players])
+        self.maxed_out = np.zeros(model.num_players, dtype=bool)
+        self.fixed_out = np.zeros(model.num_players, dtype=bool)
+        self.locked = np.zeros(model.num_players, dtype=bool)
+
+    def get_max_lineups_per_player(self, num_lineups):
+        # Locked players are in every lineup so max exposure doesn't apply to them
+        max_lineups = get_max_lineups_per_player(self.model.slate, num_lineups, self.max_exposure,
+                                                 self.max_qb_exposure)
+        max_lineups[self.locked | (self.base_lb > 0.5)] = num_lineups
+        return max_lineups
+
+    def add_lineup(self, solution, max_lineups):
+        self.lineups.append(solution)
+        self.lineup_set.add(solution.player_idx, dedup=False)
+
+        # Add lineup to model to prevent duplication
+        max_overlap = len(solution.player_idx) - 1 if self.max_overlap is None else self.max_overlap
+        self.cut_rows.append(self.model.add_max_overlap_cut(solution.player_idx, max_overlap))
+
+        # Remove players who reached max exposure from future lineups
+        self.exposure[solution.player_idx] += 1
+        maxed_out = solution.player_idx[self.exposure[solution.player_idx] >= max_lineups[solution.player_idx]]
+        if len(maxed_out):
+            logging.debug("Reached lineup exposure max for: {0}".format(", ".join(self.model.col_names[i] for i in maxed_out)))
+            self.maxed_out[maxed_out] = True
+            self.model.set_col_bounds(maxed_out, 0, 0)
+
+    def update_col_bounds(self, player_idx):
+        # Restore players' starting bounds unless they're at max exposure, fixed out or locked
+        player_idx = np.atleast_1d(player_idx)
+        is_out = self.maxed_out[player_idx] | self.fixed_out[player_idx]
+        if np.any(is_out):
+            self.model.set_col_bounds(player_idx[is_out], 0, 0)
+        is_locked = self.locked[player_idx] & ~is_out
+        if np.any(is_locked):
+            self.model.set_col_bounds(player_idx[is_locked], 1, 1)
+        for player in player_idx[~is_out & ~is_locked]:
+            self.model.set_col_bounds(player, self.base_lb[player], self.base_ub[player])
+
+    def set_available(self, player_idx, available=True):
+        # Fix players out of future lineups (e.g. after injury news) or make them available again
+        player_idx = np.atleast_1d(player_idx)
+        self.fixed_out[player_idx] = not available
+        self.update_col_bounds(player_idx)
+
+    def set_locked(self, player_idx, locked=True):
+        # Lock players into every future lineup or release them
+        player_idx = np.atleast_1d(player_idx)
+        self.locked[player_idx] = locked
+        self.update_col_bounds(player_idx)
+
+    def remove_lineups(self, lineup_idx):
+        # Drop lineups so they can be re-solved. Their overlap cuts are relaxed and players they held at
+        # max exposure are released. Returns the removed lineups
+        lineup_idx = np.unique(np.asarray(lineup_idx, dtype=np.int64))
+        if not len(lineup_idx):
+            return []
+        removed = [self.lineups[i] for i in lineup_idx]
+        self.model.set_row_bounds([self.cut_rows[i] for i in lineup_idx], -np.inf, np.inf)
+        for lineup in removed:
+            self.exposure[lineup.player_idx] -= 1
+
+        keep = np.setdiff1d(np.arange(len(self.lineups)), lineup_idx)
+        self.lineups = [self.lineups[i] for i in keep]
+        self.cut_rows = [self.cut_rows[i] for i in keep]
+        self.lineup_set = self.lineup_set.take(keep)
+
+        released = np.flatnonzero(self.maxed_out & (self.exposure < self.max_lineups))
+        self.maxed_out[released] = False
+        self.update_col_bounds(released)
+        return removed
+
+    def generate(self, num_lineups):
+        # Generate up to num_lineups more lineups. Stops early if no more valid lineups exist or the solver gives
+        # up without proving that (see status)
+        max_lineups = self.get_max_lineups_per_player(len(self.lineups) + num_lineups)
+        self.max_lineups = max_lineups
+        self.status = GENERATION_COMPLETE
+        new_lineups = []
+        for i in range(num_lineups):
+            solution = self.backend.solve()
+            if solution.status == "infeasible":
+                logging.info("Exhausted list of possible teams fitting constraints after {0} lineups".format(len(self.lineups)))
+                self.status = GENERATION_EXHAUSTED
+                break
+            if not solution.is_optimal:
+                logging.warning("Stopped generating lineups after {0} of {1}: solver status {2}".format(
+                    len(new_lineups), num_lineups, solution.status))
+                self.status = solution.status
+                break
+            self.add_lineup(solution, max_lineups)
+            new_lineups.append(solution)
+        return new_lineups
+
+    def timing(self):
+        # Solve time of each generated lineup
+        return pd.DataFrame({"lineup": np.arange(len(self.lineups)),
+                             "objective": [lineup.objective for lineup in self.lineups],
+                             "solve_ms": [1000 * lineup.solve_secs for lineup in self.lineups]})
+
+
+def generate_lineups(slate, num_lineups, pos_max=None, pos_min=None, backend="pulp", max_overlap=None,
+                     max_exposure=1.0, max_qb_exposure=1.0, **config):
+    # Build lineup model for a slate and generate num_lineups lineups from it
+    model = build_lineup_model(slate, pos_max, pos_min, **config)
+    generator = LineupGenerator(model, backend, max_overlap=max_overlap, max_exposure=max_exposure,
+                                max_qb_exposure=max_qb_exposure)
+    return generator.generate(num_lineups), generator
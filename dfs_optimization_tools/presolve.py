@@ -0,0 +1,142 @@
+import logging
+import time
+import numpy as np
+import pandas as pd
+
+import optimizer as opt
+
+EPSILON = 1e-9
+
+
+def is_redundant_row(model, row):
+    # Packing rows no lineup can violate (e.g. max 9 players per team) don't restrict swaps
+    coefs = model.row_coefs[row]
+    return model.row_lb[row] <= 0 and np.all(coefs >= 0) and \
+        np.sort(coefs)[::-1][:model.roster_size].sum() <= model.row_ub[row] + EPSILON
+
+
+def get_constraint_classes(model):
+    # Class code of each player column. Players in the same class have identical coefficients in every row
+    # that can bind except the salary row, so swapping one for another only changes lineup salary and objective
+    num_players = model.num_players
+    keep_rows = [row for row in range(model.num_rows) if row != model.salary_row and not is_redundant_row(model, row)]
+    matrix = model.get_matrix()[keep_rows][:, :num_players].tocsc()
+    matrix.sort_indices()
+
+    keys = [matrix.indices[matrix.indptr[col]:matrix.indptr[col+1]].tobytes() +
+            matrix.data[matrix.indptr[col]:matrix.indptr[col+1]].tobytes() for col in range(num_players)]
+    codes, classes = pd.factorize(pd.Series(keys, dtype=object))
+    return codes, len(classes)
+
+
+def count_dominators(salary, objective, available):
+    # Number of available players in a group that cost no more and have a strictly higher objective
+    dominates = (salary[None, :] <= salary[:, None] + EPSILON) & (objective[None, :] > objective[:, None] + EPSILON)
+    return (dominates & available[None, :]).sum(axis=1)
+
+
+class PresolveResult(object):
+    # Reduced lineup model and the original index of each of its players
+    def __init__(self, model, player_idx, stats):
+        self.model = model
+        self.player_idx = player_idx
+        self.stats = stats
+
+    def restore(self, solution):
+        # Solution of the reduced model in terms of the original model's players
+        restored = opt.LineupSolution(solution.status, self.player_idx[solution.player_idx], solution.objective)
+        restored.solve_secs = solution.solve_secs
+        return restored
+
+
+def get_dominated_players(model, num_lineups=1, max_overlap=None, max_exposure=1.0, max_qb_exposure=1.0):
+    # Players no optimal lineup among the first num_lineups generated can use. Swapping a player for an available
+    # player in its constraint class that costs no more and projects strictly higher gives a strictly better
+    # lineup, so a player in the k-th lineup needs every such swap blocked. Dominators in the lineup itself block
+    # at most pos_max - 1 swaps and each earlier lineup blocks at most pos_max (only its own players can break
+    # its overlap cut or reach max exposure), or exactly the one swap that recreates it when lineups are only
+    # kept distinct
+    slate = model.slate
+    max_in_lineup = {pos: min(model.pos_max.get(pos, model.roster_size), model.roster_size)
+                     for pos in slate.positions}
+    max_lineups = opt.get_max_lineups_per_player(slate, num_lineups, max_exposure, max_qb_exposure)
+    only_distinct = (max_overlap is None or max_overlap >= model.roster_size - 1) and \
+        np.all(max_lineups >= num_lineups)
+    if only_distinct:
+        min_dominators = {pos: num_lineups + max_pos - 1 for pos, max_pos in max_in_lineup.items()}
+    else:
+        min_dominators = {pos: num_lineups * max_pos for pos, max_pos in max_in_lineup.items()}
+
+    objective = model.objective[:model.num_players]
+    col_lb = np.array(model.col_lb[:model.num_players])
+    col_ub = np.array(model.col_ub[:model.num_players])
+    available = col_ub > 0.5
+    dominated = ~available
+
+    # Cheaper swaps are only safe while salary is just capped
+    if model.salary_row is None or model.row_lb[model.salary_row] > -np.inf:
+        logging.warning("Lineup model has no upper bounded salary row. Only removing players fixed out")
+        return dominated
+
+    class_codes, num_classes = get_constraint_classes(model)
+    for code in range(num_classes):
+        players = np.flatnonzero(class_codes == code)
+        if len(players) < 2:
+            continue
+        pos = slate.positions[slate.pos_codes[players[0]]]
+        num_dominators = count_dominators(slate.salary[players], objective[players], available[players])
+        dominated[players] |= num_dominators >= min_dominators[pos]
+
+    # Locked players always stay
+    return dominated & (col_lb < 0.5)
+
+
+def presolve_model(model, num_lineups=1, max_overlap=None, max_exposure=1.0, max_qb_exposure=1.0):
+    # Lineup model without dominated players. Rows, auxiliary columns and bounds are sliced from the
+    # compiled model rather than rebuilt, so the reduced model is the original with those players fixed out
+    start = time.perf_counter()
+    num_players = model.num_players
+    dominated = get_dominated_players(model, num_lineups, max_overlap, max_exposure, max_qb_exposure)
+    player_idx = np.flatnonzero(~dominated)
+
+    reduced = opt.LineupModel(model.slate.take(player_idx), model.objective[player_idx])
+    reduced.col_lb = [model.col_lb[col] for col in player_idx]
+    reduced.col_ub = [model.col_ub[col] for col in player_idx]
+    for col in range(num_players, model.num_cols):
+        reduced.add_col(model.col_names[col], model.col_lb[col], model.col_ub[col])
+    reduced.objective[len(player_idx):] = model.objective[num_players:]
+
+    col_map = np.full(model.num_cols, -1, dtype=np.int64)
+    col_map[player_idx] = np.arange(len(player_idx))
+    col_map[num_players:] = np.arange(len(player_idx), reduced.num_cols)
+    num_nonzeros = 0
+    for row in range(model.num_rows):
+        cols = col_map[model.row_indices[row]]
+        keep = cols >= 0
+        reduced.add_row(cols[keep], model.row_coefs[row][keep], model.row_lb[row], model.row_ub[row])
+        num_nonzeros += len(model.row_indices[row]) - int(keep.sum())
+
+    for attr in ["salary_cap", "roster_size", "pos_min", "pos_max", "num_template_rows", "salary_row", "config"]:
+        setattr(reduced, attr, getattr(model, attr))
+
+    removed_pos = pd.Series(model.slate.pos_codes[dominated]).map(lambda code: model.slate.positions[code])
+    stats = {"players": num_players,
+             "players_removed": int(dominated.sum()),
+             "cols_removed": int(dominated.sum()),
+             "nonzeros_removed": num_nonzeros,
+             "removed_by_pos": removed_pos.value_counts().to_dict(),
+             "presolve_secs": time.perf_counter() - start}
+    logging.info("Presolve removed {0} of {1} players ({2} nonzeros)".format(stats["players_removed"], num_players,
+                                                                            num_nonzeros))
+    return PresolveResult(reduced, player_idx, stats)
+
+
+def generate_lineups(slate, num_lineups, pos_max=None, pos_min=None, backend="pulp", max_overlap=None,
+                     max_exposure=1.0, max_qb_exposure=1.0, **config):
+    # Same lineups as optimizer.generate_lineups, solved on a model without dominated players.
+    # Returns lineups in terms of the slate's players, the reduced model's generator and the presolve result
+    model = opt.build_lineup_model(slate, pos_max, pos_min, **config)
+    result = presolve_model(model, num_lineups, max_overlap, max_exposure, max_qb_exposure)
+    generator = opt.LineupGenerator(result.model, backend, max_overlap=max_overlap, max_exposure=max_exposure,
+                                    max_qb_exposure=max_qb_exposure)
+    return [result.restore(solution) for solution in generator.generate(num_lineups)], generator, result
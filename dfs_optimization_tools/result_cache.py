@@ -0,0 +1,159 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+import numpy as np
+
+import optimizer as opt
+
+RESULT_CACHE_VERSION = 2
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Eviction trims the cache to this fraction of max_bytes so it isn't rescanned on every following put
+EVICT_TARGET_FRACTION = 0.9
+
+
+class ResultCache(object):
+    # Content-addressed disk cache of generated lineups keyed by slate contents + canonical model config.
+    # Entries are small JSON files. Reading an entry refreshes its mtime and the least recently used
+    # entries are removed once the cache grows past max_bytes. Cache size is scanned on the first put and
+    # then tracked from this process's writes, so the directory is only rescanned when eviction is due
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.total_bytes = None
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def get_key(slate, config):
+        # Slate contents, canonical config and cache format version hashed into one key
+        cache_key = json.dumps({"version": RESULT_CACHE_VERSION, "slate": slate.get_hash(), "config": config},
+                               sort_keys=True)
+        return hashlib.sha256(cache_key.encode("utf-8")).hexdigest()
+
+    def get_cache_file(self, key):
+        return os.path.join(self.cache_dir, key[:2], "{0}.json".format(key))
+
+    def get(self, key):
+        cache_file = self.get_cache_file(key)
+        try:
+            with open(cache_file, "r") as fh:
+                value = json.load(fh)
+            os.utime(cache_file)
+        except (IOError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        cache_file = self.get_cache_file(key)
+        if not os.path.isdir(os.path.dirname(cache_file)):
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+
+        try:
+            old_bytes = os.path.getsize(cache_file)
+        except OSError:
+            old_bytes = 0
+
+        # Write to temporary file first so other processes never read a partial entry
+        tmp_file = "{0}.{1}.tmp".format(cache_file, os.getpid())
+        with open(tmp_file, "w") as fh:
+            json.dump(value, fh)
+        new_bytes = os.path.getsize(tmp_file)
+        os.replace(tmp_file, cache_file)
+
+        if self.total_bytes is None:
+            self.evict()
+            return
+        self.total_bytes += new_bytes - old_bytes
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        # Once cache is past max_bytes, remove least recently used entries until it fits in
+        # EVICT_TARGET_FRACTION of max_bytes
+        entries = []
+        for cache_file in glob.glob(os.path.join(self.cache_dir, "*", "*.json")):
+            try:
+                stat = os.stat(cache_file)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, cache_file))
+
+        total_bytes = sum(entry[1] for entry in entries)
+        if total_bytes <= self.max_bytes:
+            self.total_bytes = total_bytes
+            return
+        for mtime, size, cache_file in sorted(entries):
+            if total_bytes <= EVICT_TARGET_FRACTION * self.max_bytes:
+                break
+            try:
+                os.remove(cache_file)
+            except OSError:
+                pass
+            total_bytes -= size
+            logging.debug("Evicted cached result {0}".format(cache_file))
+        self.total_bytes = total_bytes
+
+    def log_stats(self):
+        logging.info("Result cache: {0} hits, {1} misses".format(self.hits, self.misses))
+
+
+def get_generation_config(pos_max=None, pos_min=None, backend="pulp", max_overlap=None, max_exposure=1.0,
+                          max_qb_exposure=1.0, **config):
+    # Canonical description of everything that determines the generated lineups. Defaults are filled in first
+    # so configs that only differ by explicitly passing a default share an entry
+    return {"pos_max": opt.DK_POS_MAX if pos_max is None else pos_max,
+            "pos_min": opt.DK_POS_MIN if pos_min is None else pos_min,
+            "model": opt.get_model_config(**config),
+            "backend": backend,
+            "max_overlap": max_overlap,
+            "max_exposure": max_exposure,
+            "max_qb_exposure": max_qb_exposure}
+
+
+def cached_generate_lineups(result_cache, slate, num_lineups, pos_max=None, pos_min=None, backend="pulp",
+                            max_overlap=None, max_exposure=1.0, max_qb_exposure=1.0, **config):
+    # Same as optimizer.generate_lineups but reuses lineups already generated for an identical slate and config.
+    # result_cache can be None to always solve. Returns the lineups and solver stats
+    # ({num_solves, build_secs, solve_secs, cache_hit, generation_status}) of this call. Runs the solver
+    # stopped early (e.g. at the DP node limit) aren't cached
+    generation_config = get_generation_config(pos_max, pos_min, backend, max_overlap, max_exposure,
+                                              max_qb_exposure, **config)
+    generation_config["num_lineups"] = num_lineups
+    key = None
+    if result_cache is not None:
+        key = result_cache.get_key(slate, generation_config)
+        cached = result_cache.get(key)
+        if cached is not None:
+            lineups = []
+            for player_idx, objective, solve_secs in zip(cached["lineups"], cached["objectives"], cached["solve_secs"]):
+                lineup = opt.LineupSolution("optimal", np.array(player_idx, dtype=np.int64), objective)
+                lineup.solve_secs = solve_secs
+                lineups.append(lineup)
+            return lineups, {"num_solves": 0, "build_secs": 0.0, "solve_secs": 0.0, "cache_hit": True,
+                             "generation_status": cached["status"]}
+
+    build_start = time.perf_counter()
+    model = opt.build_lineup_model(slate, pos_max, pos_min, **config)
+    generator = opt.LineupGenerator(model, backend, max_overlap=max_overlap, max_exposure=max_exposure,
+                                    max_qb_exposure=max_qb_exposure)
+    build_secs = time.perf_counter() - build_start
+    lineups = generator.generate(num_lineups)
+    stats = {"num_solves": generator.backend.num_solves, "build_secs": build_secs,
+             "solve_secs": sum(lineup.solve_secs for lineup in lineups), "cache_hit": False,
+             "generation_status": generator.status}
+
+    if result_cache is not None and generator.status in [opt.GENERATION_COMPLETE, opt.GENERATION_EXHAUSTED]:
+        result_cache.put(key, {"lineups": [lineup.player_idx.tolist() for lineup in lineups],
+                               "objectives": [lineup.objective for lineup in lineups],
+                               "solve_secs": [lineup.solve_secs for lineup in lineups],
+                               "num_solves": stats["num_solves"],
+                               "status": generator.status})
+    return lineups, stats
@@ -0,0 +1,91 @@
+import logging
+import os
+import pandas as pd
+
+from utils import DFSException
+import constants as cols
+
+REF_NAME_FIELD = "ref_player"
+REF_POS_FIELD = "ref_position"
+REF_TEAM_FIELD = "ref_team"
+MATCH_SCORE_FIELD = "match_score"
+IS_MATCH_FIELD = "is_match"
+
+REVIEW_COLS = [cols.NAME_FIELD, cols.POS_FIELD, cols.TEAM_FIELD,
+               REF_NAME_FIELD, REF_POS_FIELD, REF_TEAM_FIELD,
+               MATCH_SCORE_FIELD, IS_MATCH_FIELD]
+
+
+class MatchReviewQueue(object):
+    # Collects below-threshold name matches instead of prompting so harmonization can run unattended.
+    # Decisions are filled into the 'is_match' column (0=No, 1=Yes) of the review file and applied later
+    def __init__(self):
+        self.candidates = []
+
+    def add(self, name, pos, team, ref_name, ref_pos, ref_team, match_score):
+        self.candidates.append((name, pos, team, ref_name, ref_pos, ref_team, match_score, ""))
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def to_frame(self):
+        return pd.DataFrame(self.candidates, columns=REVIEW_COLS)
+
+    def write(self, review_file):
+        review_df = self.to_frame()
+        review_df.to_csv(review_file, index=False)
+        logging.info("Wrote {0} player matches needing review to {1}".format(len(review_df), review_file))
+
+    @staticmethod
+    def read_decisions(review_file):
+        # Return reviewed rows with a decision of 0 or 1
+        if not os.path.exists(review_file):
+            err_msg = "Review file does not exist: {0}".format(review_file)
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+
+        review_df = pd.read_csv(review_file, dtype={IS_MATCH_FIELD: str})
+        for review_col in REVIEW_COLS:
+            if review_col not in review_df.columns:
+                err_msg = "Review file missing required column: {0}".format(review_col)
+                logging.error(err_msg)
+                raise DFSException(err_msg)
+
+        review_df[IS_MATCH_FIELD] = review_df[IS_MATCH_FIELD].fillna("").str.strip()
+        undecided = ~review_df[IS_MATCH_FIELD].isin(["0", "1"])
+        if undecided.any():
+            logging.warning("Ignoring {0} review rows without a 0/1 decision".format(undecided.sum()))
+        return review_df[~undecided].copy()
+
+
+def apply_review_decisions(merged_data, data, ref_data, decisions, alias_store=None):
+    # Add players accepted during review to an already harmonized dataset.
+    # Only the accepted source rows are merged, nothing else is re-matched
+    key_cols = [cols.NAME_FIELD, cols.POS_FIELD, cols.TEAM_FIELD]
+
+    # Record decisions so later runs never ask about the same pair again
+    if alias_store is not None:
+        for row in decisions.itertuples(index=False):
+            row = row._asdict()
+            if row[IS_MATCH_FIELD] == "1":
+                alias_store.add_alias(row[cols.NAME_FIELD], row[cols.POS_FIELD], row[cols.TEAM_FIELD], row[REF_NAME_FIELD])
+            else:
+                alias_store.add_rejection(row[cols.NAME_FIELD], row[cols.POS_FIELD], row[cols.TEAM_FIELD], row[REF_NAME_FIELD])
+
+    # Use first accepted reference player for each source player
+    accepted = decisions[decisions[IS_MATCH_FIELD] == "1"].drop_duplicates(subset=key_cols)
+    if not len(accepted):
+        logging.info("No player matches accepted during review")
+        return merged_data
+
+    name_map = accepted[key_cols + [REF_NAME_FIELD]]
+    accepted_data = data.merge(name_map, how="inner", on=key_cols)
+    accepted_data[cols.NAME_FIELD] = accepted_data[REF_NAME_FIELD]
+    accepted_data = accepted_data.drop(columns=[REF_NAME_FIELD])
+
+    # Merge with reference dataset exactly the way merge_datasets does
+    new_rows = ref_data.merge(accepted_data, how="inner", on=key_cols)
+    logging.info("Adding {0} players accepted during review".format(len(new_rows)))
+
+    merged_data = pd.concat([merged_data, new_rows[merged_data.columns]], ignore_index=True)
+    return merged_data.drop_duplicates(subset=key_cols).reset_index(drop=True)
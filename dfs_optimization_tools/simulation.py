@@ -0,0 +1,138 @@
+import logging
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from utils import DFSException
+import constants as cols
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_PERCENTILES = [10, 25, 50, 75, 90, 99]
+
+
+class ProjectionSimulator(object):
+    # Simulates player outcomes as normal draws around projected points. Outcomes are drawn in float32 chunks
+    # of (chunk_size x num_players) so memory stays bounded no matter how many sims are run.
+    # game_factors is an optional list of (player indices, Cholesky factor) per game used to correlate draws
+    def __init__(self, mean, sd, seed=None, chunk_size=DEFAULT_CHUNK_SIZE, game_factors=None):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.sd = np.nan_to_num(np.asarray(sd, dtype=np.float32))
+        if self.mean.shape != self.sd.shape:
+            err_msg = "Different number of projection means ({0}) and sds ({1})!".format(len(self.mean), len(self.sd))
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+        self.num_players = len(self.mean)
+        self.chunk_size = chunk_size
+        self.game_factors = game_factors or []
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_data(cls, data, seed=None, chunk_size=DEFAULT_CHUNK_SIZE, correlation_model=None):
+        game_factors = None
+        if correlation_model is not None:
+            game_factors = correlation_model.get_game_factors(data[cols.POS_FIELD], data[cols.TEAM_FIELD],
+                                                              data[cols.OPP_TEAM_FIELD])
+        return cls(data[cols.PROJ_POINTS_FIELD], data[cols.PROJ_POINTS_SD_FIELD], seed=seed, chunk_size=chunk_size,
+                   game_factors=game_factors)
+
+    @classmethod
+    def from_slate(cls, slate, seed=None, chunk_size=DEFAULT_CHUNK_SIZE, correlation_model=None):
+        game_factors = None
+        if correlation_model is not None:
+            game_factors = correlation_model.get_game_factors(slate.data[cols.POS_FIELD], slate.data[cols.TEAM_FIELD],
+                                                              slate.data[cols.OPP_TEAM_FIELD])
+        return cls(slate.projection, slate.sd, seed=seed, chunk_size=chunk_size, game_factors=game_factors)
+
+    def standard_normal(self, num_sims):
+        # Standard normal draws for every player, correlated within each game
+        draws = self.rng.standard_normal((num_sims, self.num_players), dtype=np.float32)
+        for players, factor in self.game_factors:
+            draws[:, players] = draws[:, players] @ factor.T
+        return draws
+
+    def sample(self, num_sims):
+        # Simulated points (num_sims x num_players)
+        outcomes = self.standard_normal(num_sims)
+        outcomes *= self.sd
+        outcomes += self.mean
+        return outcomes
+
+    def sample_chunks(self, num_sims):
+        # Yield simulated points in chunks of at most chunk_size sims
+        for start in range(0, num_sims, self.chunk_size):
+            yield self.sample(min(self.chunk_size, num_sims - start))
+
+    def jitter(self):
+        # Single simulated outcome for every player (e.g. to re-solve a lineup model against a jittered objective)
+        return self.sample(1)[0].astype(np.float64)
+
+
+def get_lineup_indices(lineups):
+    # Player indices of each lineup. Accepts index arrays or solved lineups
+    return [np.asarray(getattr(lineup, "player_idx", lineup), dtype=np.int64) for lineup in lineups]
+
+
+def lineup_matrix(lineups, num_players):
+    # Sparse (num_players x num_lineups) matrix with a 1 where a player is in a lineup
+    lineups = get_lineup_indices(lineups)
+    players = np.concatenate(lineups) if lineups else np.array([], dtype=np.int64)
+    lineup_cols = np.repeat(np.arange(len(lineups)), [len(lineup) for lineup in lineups])
+    return sp.csc_matrix((np.ones(len(players), dtype=np.float32), (players, lineup_cols)),
+                         shape=(num_players, len(lineups)))
+
+
+class LineupSimulation(object):
+    # Simulated scores (num_sims x num_lineups) of a set of lineups
+    def __init__(self, scores):
+        self.scores = scores
+
+    @property
+    def num_sims(self):
+        return self.scores.shape[0]
+
+    @property
+    def num_lineups(self):
+        return self.scores.shape[1]
+
+    def mean(self):
+        return self.scores.mean(axis=0, dtype=np.float64)
+
+    def sd(self):
+        return self.scores.std(axis=0, dtype=np.float64)
+
+    def percentiles(self, percentiles=DEFAULT_PERCENTILES):
+        # (len(percentiles) x num_lineups)
+        return np.percentile(self.scores, percentiles, axis=0)
+
+    def win_probability(self):
+        # Fraction of sims each lineup scored highest among the set. Ties are split evenly
+        best = self.scores.max(axis=1, keepdims=True)
+        is_best = self.scores == best
+        return (is_best / is_best.sum(axis=1, keepdims=True)).sum(axis=0) / self.num_sims
+
+    def prob_above(self, score):
+        # Fraction of sims each lineup scored at least score
+        return (self.scores >= score).mean(axis=0)
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES, target_score=None):
+        summary = pd.DataFrame({"lineup": np.arange(self.num_lineups),
+                                "mean": self.mean(),
+                                "sd": self.sd()})
+        for percentile, values in zip(percentiles, self.percentiles(percentiles)):
+            summary["p{0}".format(percentile)] = values
+        summary["win_prob"] = self.win_probability()
+        if target_score is not None:
+            summary["prob_above_target"] = self.prob_above(target_score)
+        return summary
+
+
+def simulate_lineups(simulator, lineups, num_sims):
+    # Score every lineup against num_sims simulated outcomes, one sparse product per chunk of sims
+    lineups_mat = lineup_matrix(lineups, simulator.num_players)
+    scores = np.empty((num_sims, lineups_mat.shape[1]), dtype=np.float32)
+    start = 0
+    for outcomes in simulator.sample_chunks(num_sims):
+        end = start + len(outcomes)
+        scores[start:end] = (lineups_mat.T @ outcomes.T).T
+        start = end
+    return LineupSimulation(scores)
@@ -0,0 +1,217 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from utils import DFSException
+import constants as cols
+import data_import as imp
+import optimizer as opt
+import transforms
+from review_queue import MatchReviewQueue
+
+# Columns identifying a harmonized player
+PLAYER_KEY_FIELDS = [cols.NAME_FIELD, cols.TEAM_FIELD, cols.POS_FIELD]
+
+# Reference (DK) name matched to each projection row. Missing if the row didn't match anyone
+REF_NAME_FIELD = "ref_player"
+
+# Projection columns patched in place. Slate arrays that hold each of them
+PROJ_DELTA_FIELDS = {cols.PROJ_POINTS_FIELD: "projection",
+                     cols.PROJ_POINTS_SD_FIELD: "sd",
+                     opt.TIER_FIELD: "tier"}
+
+
+def get_player_keys(data):
+    return pd.MultiIndex.from_arrays([data[field].to_numpy(dtype=object) for field in PLAYER_KEY_FIELDS])
+
+
+def values_changed(old_values, new_values):
+    # Elementwise change treating NaN as equal to NaN
+    return ~((old_values == new_values) | (np.isnan(old_values) & np.isnan(new_values)))
+
+
+class SlateDelta(object):
+    # Changes between a harmonized slate and refreshed projections or prices, as slate player indices.
+    # changed players have new projections, out players are no longer available (dropped from projections
+    # or prices, or under the projection cutoff) and returned players are available again. new_players and
+    # salary_changed can't be patched into a compiled model and need the slate rebuilt
+    def __init__(self, changed, out, returned, new_players, salary_changed, values, proj_data=None, dk_data=None):
+        self.changed = changed
+        self.out = out
+        self.returned = returned
+        self.new_players = new_players
+        self.salary_changed = salary_changed
+        self.values = values
+        self.proj_data = proj_data
+        self.dk_data = dk_data
+
+    @property
+    def affected(self):
+        # Players whose existing lineups may no longer be optimal or valid
+        return np.union1d(np.union1d(self.changed, self.out), self.salary_changed)
+
+    @property
+    def requires_rebuild(self):
+        return len(self.new_players) > 0 or len(self.salary_changed) > 0
+
+    def summary(self):
+        return {"changed": len(self.changed),
+                "out": len(self.out),
+                "returned": len(self.returned),
+                "new_players": len(self.new_players),
+                "salary_changed": len(self.salary_changed)}
+
+
+class HarmonizedSlate(object):
+    # Compiled slate that keeps the DK reference data, player name index and projection name matches it was
+    # harmonized from, so refreshed projections or prices are diffed against it instead of being re-imported,
+    # re-matched and recompiled. Only rows with a player not seen before go through name matching
+    def __init__(self, dk_data, proj_data, min_projection_cutoff=2, exclude_teams=None, alias_store=None):
+        self.dk_data = dk_data
+        self.name_index = imp.PlayerNameIndex.from_data(dk_data)
+        self.alias_store = alias_store
+        self.review_queue = MatchReviewQueue()
+        self.min_projection_cutoff = min_projection_cutoff
+        self.exclude_teams = exclude_teams
+        self.proj_data = self.match_names(proj_data)
+        self.slate = opt.Slate(self.merge_data(self.proj_data), min_projection_cutoff, exclude_teams)
+        self.player_keys = get_player_keys(self.slate.data)
+        self.available = np.ones(self.slate.num_players, dtype=bool)
+
+    @classmethod
+    def from_files(cls, dfs_file, proj_file, is_price_list=True, cache_dir=None, **kwargs):
+        if is_price_list:
+            dk_df = imp.DKPriceImporter(dfs_file, cache_dir=cache_dir)
+        else:
+            dk_df = imp.DKResultsImporter(dfs_file, cache_dir=cache_dir)
+        proj_df = imp.FFAProjectionsImporter(proj_file, cache_dir=cache_dir)
+        return cls(dk_df.data, proj_df.data, **kwargs)
+
+    def match_names(self, proj_data, prev_proj_data=None):
+        # Reference name of each projection row. Rows whose player was already matched keep their match
+        proj_data = proj_data.copy()
+        keys = get_player_keys(proj_data)
+        if prev_proj_data is None:
+            to_match = np.ones(len(proj_data), dtype=bool)
+            ref_names = pd.Series(None, index=proj_data.index, dtype=object)
+        else:
+            prev_names = pd.Series(prev_proj_data[REF_NAME_FIELD].to_numpy(dtype=object),
+                                   index=get_player_keys(prev_proj_data))
+            prev_names = prev_names[~prev_names.index.duplicated()]
+            prev_idx = prev_names.index.get_indexer(keys)
+            to_match = prev_idx < 0
+            ref_names = pd.Series(np.where(to_match, None, prev_names.to_numpy()[prev_idx]), index=proj_data.index,
+                                  dtype=object)
+
+        if np.any(to_match):
+            logging.info("Matching {0} new projection rows to reference players".format(int(to_match.sum())))
+            ref_names[to_match] = self.name_index.match_frame(proj_data[to_match], match_threshold=90,
+                                                              min_match_threshold=75, alias_store=self.alias_store,
+                                                              review_queue=self.review_queue)
+        proj_data[REF_NAME_FIELD] = ref_names
+        return proj_data
+
+    def merge_data(self, proj_data, dk_data=None):
+        # Same merge as data_import.merge_datasets using stored name matches
+        dk_data = self.dk_data if dk_data is None else dk_data
+        matched = proj_data[~pd.isnull(proj_data[REF_NAME_FIELD])].copy()
+        matched[cols.NAME_FIELD] = matched[REF_NAME_FIELD]
+        matched = matched.drop(columns=[REF_NAME_FIELD])
+        return dk_data.merge(matched, how="inner", on=PLAYER_KEY_FIELDS)
+
+    def diff_data(self, data):
+        # Diff harmonized data against the slate
+        slate = self.slate
+        new_players = data[~get_player_keys(data).isin(self.player_keys)]
+        if self.exclude_teams:
+            new_players = new_players[~new_players[cols.TEAM_FIELD].isin(self.exclude_teams)]
+        new_players = new_players[new_players[cols.PROJ_POINTS_FIELD] >= self.min_projection_cutoff]
+
+        # Position of each slate player in the new data (-1 if missing)
+        data = data[~get_player_keys(data).duplicated()]
+        data_idx = get_player_keys(data).get_indexer(self.player_keys)
+        present = data_idx >= 0
+        data = data.iloc[np.maximum(data_idx, 0)]
+        is_available = present & (data[cols.PROJ_POINTS_FIELD].to_numpy() >= self.min_projection_cutoff)
+
+        values = {}
+        changed = np.zeros(slate.num_players, dtype=bool)
+        for field, attr in PROJ_DELTA_FIELDS.items():
+            if field not in slate.data.columns or field not in data.columns:
+                continue
+            values[field] = np.where(present, data[field].to_numpy(dtype=np.float64), getattr(slate, attr))
+            changed |= values_changed(getattr(slate, attr), values[field])
+        salary = np.where(present, data[cols.SALARY_FIELD].to_numpy(dtype=np.float64), slate.salary)
+
+        return SlateDelta(changed=np.flatnonzero(changed & is_available),
+                          out=np.flatnonzero(self.available & ~is_available),
+                          returned=np.flatnonzero(~self.available & is_available),
+                          new_players=new_players,
+                          salary_changed=np.flatnonzero(present & (salary != slate.salary)),
+                          values=values)
+
+    def diff_projections(self, proj_data):
+        # Diff refreshed projections (e.g. a midweek FFA download) against the slate
+        proj_data = self.match_names(proj_data, self.proj_data)
+        delta = self.diff_data(self.merge_data(proj_data))
+        delta.proj_data = proj_data
+        return delta
+
+    def diff_prices(self, dk_data):
+        # Diff a refreshed DK price list against the slate. Players new to the price list need the name index
+        # rebuilt so they're reported as new players
+        delta = self.diff_data(self.merge_data(self.proj_data, dk_data))
+        new_keys = ~get_player_keys(dk_data).isin(get_player_keys(self.dk_data))
+        if np.any(new_keys):
+            logging.warning("{0} players added to price list. Rebuild slate to include them".format(int(new_keys.sum())))
+        delta.dk_data = dk_data
+        return delta
+
+    def apply(self, delta, model, generator=None):
+        # Patch slate arrays, model objective and player availability in place. Pass the model's
+        # LineupGenerator so players it fixed out at max exposure stay out
+        if delta.requires_rebuild:
+            err_msg = "Slate delta adds players or changes salaries ({0}). Rebuild the slate".format(delta.summary())
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+        if model.config["stacks"] and len(delta.changed):
+            err_msg = "Stack eligibility depends on projections. Rebuild lineup models with stacks"
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+
+        # Slate data and arrays
+        slate = self.slate
+        for field, values in delta.values.items():
+            setattr(slate, PROJ_DELTA_FIELDS[field], values)
+            slate.data[field] = values
+        if opt.TIER_FIELD in delta.values:
+            slate.pos_tier_codes, slate.num_pos_tiers = transforms.get_group_codes(slate.pos_codes, slate.tier)
+        if delta.proj_data is not None:
+            self.proj_data = delta.proj_data
+        if delta.dk_data is not None:
+            self.dk_data = delta.dk_data
+
+        # Model objective and availability
+        config = model.config
+        model.set_objective(slate.get_objective(config["proj_type"], config["sd_multiplier"],
+                                                config["use_actual_points"], config["projection_transforms"]))
+        self.available[delta.out] = False
+        self.available[delta.returned] = True
+        if generator is not None:
+            generator.set_available(delta.out, False)
+            generator.set_available(delta.returned, True)
+        else:
+            model.set_col_bounds(delta.out, 0, 0)
+            model.set_col_bounds(delta.returned, 0, 1)
+
+
+def refresh_lineups(generator, delta):
+    # Re-solve only the lineups using players affected by an applied delta. Returns the new lineups
+    if not len(generator.lineups):
+        return []
+    is_affected = np.zeros(generator.model.num_players, dtype=bool)
+    is_affected[delta.affected] = True
+    stale = np.flatnonzero(is_affected[generator.lineup_set.player_idx].any(axis=1))
+    logging.info("Re-solving {0} of {1} lineups with affected players".format(len(stale), len(generator.lineups)))
+    generator.remove_lineups(stale)
+    return generator.generate(len(stale))
@@ -0,0 +1,226 @@
+import logging
+from itertools import product, permutations, combinations_with_replacement
+import numpy as np
+
+from utils import DFSException
+
+
+class InvalidStackError(DFSException):
+    pass
+
+
+class TeamStack(object):
+    # Positions that must come from the same team. Positions starting with '-' come from the opposing team
+    # e.g. [QB, WR, -WR] means a QB stacked with one of his WRs and a WR he's facing
+    def __init__(self, stack_positions, stack_id=""):
+
+        if not isinstance(stack_positions, list) or len(stack_positions) < 2:
+            raise InvalidStackError("Invalid stack! Stack must be a list with at least 2 positions")
+
+        self.id = "_".join(sorted(stack_positions)) if not stack_id else stack_id
+        self.pos = [pos for pos in stack_positions if not pos.startswith("-") and "/" not in pos]
+        self.opp_pos = [pos.replace("-", "") for pos in stack_positions if pos.startswith("-")]
+        self.is_opp_stack = len(self.opp_pos) > 0
+        self.total_positions = self.pos + self.opp_pos
+
+        if len(self.pos) <= 0:
+            raise InvalidStackError("{0} only specifies opponent positions! Must include a team to oppose!".format(self.id))
+
+    @staticmethod
+    def count_positions(positions):
+        return {pos: positions.count(pos) for pos in positions}
+
+    @property
+    def position_counts(self):
+        return self.count_positions(self.pos)
+
+    @property
+    def opp_position_counts(self):
+        return self.count_positions(self.opp_pos)
+
+    @property
+    def total_counts(self):
+        return self.count_positions(self.total_positions)
+
+    def __str__(self):
+        return "Stack: {0}. Pos: {1}. Opp Pos: {2}".format(self.id, ", ".join(self.pos), ", ".join(self.opp_pos))
+
+
+class StackSet(object):
+    # Set of stacks a lineup must contain. Flex stacks (e.g. [QB, WR/TE:1]) are split into one TeamStack per
+    # possible position combination and only one of them needs to be satisfied
+    def __init__(self, stacks, max_team_pos, max_per_team):
+        self.max_team_pos = max_team_pos
+        self.max_per_team = max_per_team
+
+        self.stacks = []
+        self.flex_stacks = {}
+        for i, stack in enumerate(stacks):
+            stack_id = "{0}_{1}".format("_".join(stack), i)
+            if not [pos for pos in stack if "/" in pos]:
+                self.stacks.append(TeamStack(stack, stack_id))
+                continue
+
+            # Only keep split stacks that don't violate team constraints
+            valid_stacks = []
+            for j, split_stack in enumerate(self.expand_flexible_stack(stack)):
+                # Skip configurations with only opponent players as we know these are invalid
+                if len([pos for pos in split_stack if "-" in pos]) == len(split_stack):
+                    continue
+                new_stack = TeamStack(split_stack, "{0}_{1}".format(stack_id, j))
+                try:
+                    self.validate_stack(new_stack)
+                    valid_stacks.append(new_stack)
+                except InvalidStackError as e:
+                    logging.info("Skipping invalid split stack: {0}\n{1}".format(new_stack, e))
+
+            if not valid_stacks:
+                raise InvalidStackError("Flex stack yielded 0 valid stacks: {0}".format(stack))
+            self.flex_stacks[stack_id] = valid_stacks
+
+        if not self.stacks and not self.flex_stacks:
+            raise InvalidStackError("No stack left after removing invalid stacks!")
+
+        self.validate_stack_set()
+
+    def validate_stack(self, stack):
+        for pos in stack.total_positions:
+            # Check position is a valid position
+            if pos not in self.max_team_pos:
+                raise InvalidStackError("(Stack: {0}) Invalid position: {1}".format(stack.id, pos))
+
+            # Check stack doesn't exceed team position limits
+            if stack.total_positions.count(pos) > self.max_team_pos[pos]:
+                raise InvalidStackError("(Stack: {0}) Number of {1} in stack exceed positional limits!".format(stack.id,
+                                                                                                              pos))
+        # Check to make sure stack doesn't exceed total team size
+        if len(stack.pos) > self.max_per_team:
+            raise InvalidStackError("Stack '{0}' is larger than max per single team ({1})!".format(stack.id,
+                                                                                                   self.max_per_team))
+        if len(stack.opp_pos) > self.max_per_team:
+            raise InvalidStackError("Opp Stack '{0}' is larger than max per single team ({1})!".format(stack.id,
+                                                                                                       self.max_per_team))
+
+    def validate_stack_set(self):
+        for stack in self.all_stacks():
+            logging.debug(stack)
+            self.validate_stack(stack)
+
+        # Check all combinations of flex stacks to make sure no combination violates positional limits
+        stack_choices = [flex_stacks for flex_stacks in self.flex_stacks.values()] + [self.stacks]
+        for stack_combo in product(*stack_choices):
+            for pos in self.max_team_pos:
+                num_at_pos = sum([stack.total_counts.get(pos, 0) for stack in stack_combo])
+                if num_at_pos > self.max_team_pos[pos]:
+                    raise InvalidStackError("Number of {0} across stacks exceeds positional limits!".format(pos))
+
+    def all_stacks(self):
+        return self.stacks + [stack for flex_stacks in self.flex_stacks.values() for stack in flex_stacks]
+
+    def stack_groups(self):
+        # Groups of stacks where any one stack in the group satisfies the requirement
+        return [[stack] for stack in self.stacks] + list(self.flex_stacks.values())
+
+    @staticmethod
+    def expand_flexible_stack(stack_positions):
+        # Enumerate every stack a flexible stack can resolve to
+        fixed_pos = [pos for pos in stack_positions if "/" not in pos]
+        free_pos = [pos for pos in stack_positions if "/" in pos and ":" in pos]
+        stack_combos = [[pos] for pos in fixed_pos] + [StackSet.expand_flex_pos(pos) for pos in free_pos]
+        return [flatten(list(stack_combo)) for stack_combo in product(*stack_combos)]
+
+    @staticmethod
+    def expand_flex_pos(pos):
+        num_to_choose = int(pos.split(":")[1])
+        pos_to_choose = set(pos.split(":")[0].split("/"))
+        if len(pos_to_choose) <= 1:
+            raise InvalidStackError("Flexible stack {0} contains only one position! "
+                                    "Need to specify at least two for flex stack!".format(pos))
+        return [list(combo) for combo in set(combinations_with_replacement(pos_to_choose, num_to_choose))]
+
+
+def flatten(x):
+    if isinstance(x, list):
+        return [a for i in x for a in flatten(i)]
+    return [x]
+
+
+def get_stack_eligible(slate, projection, team, pos, num_to_get, point_diff_for_identical=0):
+    # Top num_to_get players at a position on a team plus anyone within point_diff_for_identical of the worst of them
+    players = slate.players_at(pos, team)
+    if len(players) <= num_to_get:
+        return players
+    worst_score = np.sort(projection[players])[::-1][num_to_get-1]
+    return players[projection[players] >= worst_score - point_diff_for_identical]
+
+
+def add_stack_counts(model, stack, team, var, projection, point_diff_for_identical=0):
+    # Stack variable can only be set if enough eligible players at each stack position are used
+    slate = model.slate
+    stack_teams = [(team, stack.position_counts)]
+    if stack.is_opp_stack:
+        stack_teams.append((slate.team_opp[team], stack.opp_position_counts))
+
+    for stack_team, position_counts in stack_teams:
+        for pos, count in position_counts.items():
+            eligible = np.array([], dtype=np.int64) if stack_team < 0 else \
+                get_stack_eligible(slate, projection, stack_team, pos, count, point_diff_for_identical)
+            model.add_row(np.append(eligible, var), np.append(np.ones(len(eligible)), -count), lb=0)
+
+
+def add_stacks(model, stacks, projection, point_diff_for_identical=0):
+    # Add a StackSet to a lineup model. Each (stack, team) gets a single binary backed by one count row per stack
+    # position instead of one binary per combination of eligible players
+    slate = model.slate
+    teams = np.unique(slate.team_codes)
+    team_stack_vars = {team: [] for team in teams}
+
+    for stack_group in stacks.stack_groups():
+        stack_vars = []
+        for stack in stack_group:
+            for team in teams:
+                var = model.add_col("rules_{0}_{1}".format(stack.id, slate.teams[team]))
+                stack_vars.append(var)
+                add_stack_counts(model, stack, team, var, projection, point_diff_for_identical)
+
+                # Opposing stacks use both teams in the game
+                team_stack_vars[team].append(var)
+                if stack.is_opp_stack and slate.team_opp[team] in team_stack_vars:
+                    team_stack_vars[slate.team_opp[team]].append(var)
+
+        # At least one team must have the stack
+        model.add_row(stack_vars, 1.0, lb=1)
+
+    # Teams can have no more than 1 stack
+    for team, stack_vars in team_stack_vars.items():
+        if stack_vars:
+            model.add_row(stack_vars, 1.0, ub=1)
+
+
+def restrict_positions_from_opposing_teams(model, exclude_pos, pos_max):
+    # Players at each ordered pair of positions can't be used against each other (e.g. ["QB", "D"]).
+    # Rather than a row per pair of players, each (game, position pair) becomes a count row
+    # sum(B) + cap_B * sum(A) <= cap_B when at most one A player can be used, otherwise an indicator z with
+    # sum(A) <= cap_A * z and sum(B) <= cap_B * (1 - z)
+    slate = model.slate
+    for team_a, team_b in slate.game_teams:
+        for pos_a, pos_b in permutations(exclude_pos, 2):
+            players_a = slate.players_at(pos_a, team_a)
+            players_b = slate.players_at(pos_b, team_b)
+            if not len(players_a) or not len(players_b):
+                continue
+
+            cap_a = min(len(players_a), pos_max[pos_a])
+            cap_b = min(len(players_b), pos_max[pos_b])
+            if cap_a == 1 or cap_b == 1:
+                if cap_a != 1:
+                    players_a, players_b, cap_a, cap_b = players_b, players_a, cap_b, cap_a
+                model.add_row(np.concatenate([players_b, players_a]),
+                              np.concatenate([np.ones(len(players_b)), np.full(len(players_a), cap_b)]),
+                              ub=cap_b)
+                continue
+
+            var = model.add_col("opp_exclusion_{0}_{1}_{2}_{3}".format(slate.teams[team_a], pos_a,
+                                                                       slate.teams[team_b], pos_b))
+            model.add_row(np.append(players_a, var), np.append(np.ones(len(players_a)), -cap_a), ub=0)
+            model.add_row(np.append(players_b, var), np.append(np.ones(len(players_b)), cap_b), ub=cap_b)
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+import constants as cols
+import optimizer as opt
+
+# Players per team at each position on a synthetic slate
+SYNTHETIC_ROSTER = {"QB": 2, "RB": 4, "WR": 6, "TE": 3, "D": 1}
+
+# Salary range of the most and least expensive player at a position (DK NFL classic)
+SYNTHETIC_SALARY_RANGE = {"QB": (4800, 8000),
+                          "RB": (3000, 9500),
+                          "WR": (3000, 9000),
+                          "TE": (2500, 7000),
+                          "D": (2000, 4000)}
+
+# Suffix of copied players in scaled slates. Long enough that copies never fuzzy match each other
+COPY_SUFFIX = " Copy{0}"
+
+# Suffix added to projection names that should only resolve through fuzzy matching
+FUZZY_SUFFIX = " Jr"
+
+FIRST_NAMES = ["Aaron", "Adrian", "Alvin", "Amari", "Austin", "Brandin", "Calvin", "Cam", "Carlos", "Chris",
+               "Cooper", "Dalvin", "Darren", "Davante", "Derrick", "Deshaun", "Dion", "Evan", "Ezekiel", "Gerald",
+               "Golden", "Hunter", "Jared", "Jarvis", "Julio", "Kareem", "Keenan", "Kenyan", "Lamar", "Latavius",
+               "Marlon", "Melvin", "Nelson", "Odell", "Patrick", "Phillip", "Royce", "Russell", "Stefon", "Tarik",
+               "Terry", "Tevin", "Travis", "Tyler", "Tyreek", "Zach"]
+LAST_NAMES = ["Abbott", "Barkley", "Beckham", "Boyd", "Carson", "Chubb", "Cooks", "Crowder", "Diggs", "Drake",
+              "Ebron", "Edelman", "Elliott", "Engram", "Fournette", "Fuller", "Gallup", "Godwin", "Gordon", "Goedert",
+              "Henry", "Higgins", "Hilton", "Hopkins", "Howard", "Ingram", "Jacobs", "Jeffery", "Jones", "Kamara",
+              "Kelce", "Kittle", "Landry", "Lindsay", "Lockett", "Mack", "Metcalf", "Mixon", "Montgomery", "Moore",
+              "Olsen", "Perriman", "Prescott", "Ridley", "Sanders", "Samuel", "Shepard", "Singletary", "Sutton",
+              "Thielen", "Thomas", "Waller", "Watson", "Williams", "Woods", "Yeldon"]
+
+
+def make_harmonized_data(num_teams=32, seed=0):
+    # Harmonized weekly dataset (same columns as harmonize_weekly_dfs_data.py output) for num_teams teams
+    # paired into games. Projections grow with salary plus noise so lineups trade salary against points
+    rng = np.random.RandomState(seed)
+    teams = sorted(cols.TEAM_ABBREVIATIONS.values())[:num_teams]
+    opps = {}
+    for i in range(0, len(teams) - 1, 2):
+        opps[teams[i]] = teams[i + 1]
+        opps[teams[i + 1]] = teams[i]
+
+    rows = []
+    for team in teams:
+        for pos, num_players in SYNTHETIC_ROSTER.items():
+            min_salary, max_salary = SYNTHETIC_SALARY_RANGE[pos]
+            salaries = np.round(rng.uniform(min_salary, max_salary, num_players) / 100) * 100
+            for salary in salaries:
+                projection = max(salary / 1000 * rng.uniform(1.5, 3.0) + rng.normal(0, 2), 0.0)
+                rows.append({cols.POS_FIELD: cols.REQUIRED_POS[pos],
+                             cols.TEAM_FIELD: team,
+                             cols.OPP_TEAM_FIELD: opps.get(team, team),
+                             cols.HOME_TEAM_FIELD: team < opps.get(team, team),
+                             cols.SALARY_FIELD: salary,
+                             cols.PROJ_POINTS_FIELD: projection,
+                             cols.PROJ_POINTS_SD_FIELD: rng.uniform(0.1, 0.4) * projection,
+                             cols.POINTS_FIELD: round(projection + rng.normal(0, 6), 2)})
+
+    # Unique first/last name pairs and tiers of 8 players per position
+    data = pd.DataFrame(rows)
+    names = rng.permutation(len(FIRST_NAMES) * len(LAST_NAMES))[:len(data)]
+    data.insert(0, cols.NAME_FIELD, ["{0} {1}".format(FIRST_NAMES[i // len(LAST_NAMES)],
+                                                      LAST_NAMES[i % len(LAST_NAMES)]) for i in names])
+    pos_rank = data.groupby(cols.POS_FIELD)[cols.PROJ_POINTS_FIELD].rank(ascending=False, method="first")
+    data[opt.TIER_FIELD] = (pos_rank.to_numpy() // 8 + 1).astype(int)
+    return data
+
+
+def scale_harmonized_data(data, scale, fuzzy_fraction=0.0, seed=0):
+    # Harmonized data with every player copied scale times under new names, plus projection names with a
+    # fuzzy_fraction of original players renamed so they only match through fuzzy matching.
+    # Copies keep team and position and get jittered projections so lineups don't tie
+    rng = np.random.RandomState(seed)
+    copies = []
+    for i in range(scale):
+        copy = data.copy()
+        if i:
+            copy[cols.NAME_FIELD] = copy[cols.NAME_FIELD] + COPY_SUFFIX.format(i + 1)
+            copy[cols.PROJ_POINTS_FIELD] *= rng.uniform(0.9, 1.1, len(copy))
+        copies.append(copy)
+    scaled = pd.concat(copies, ignore_index=True)
+
+    proj_names = scaled[cols.NAME_FIELD].copy()
+    is_fuzzy = np.zeros(len(scaled), dtype=bool)
+    is_fuzzy[:len(data)] = rng.uniform(size=len(data)) < fuzzy_fraction
+    proj_names[is_fuzzy] = proj_names[is_fuzzy] + FUZZY_SUFFIX
+    return scaled, scaled.assign(**{cols.NAME_FIELD: proj_names})
+
+
+def write_dk_prices(data, dfs_file):
+    # DK price list in the format read by DKPriceImporter
+    is_home = data[cols.HOME_TEAM_FIELD].astype(bool)
+    away = np.where(is_home, data[cols.OPP_TEAM_FIELD], data[cols.TEAM_FIELD])
+    home = np.where(is_home, data[cols.TEAM_FIELD], data[cols.OPP_TEAM_FIELD])
+    pos = data[cols.POS_FIELD].replace({cols.REQUIRED_POS["D"]: "DST"})
+    ids = np.arange(len(data)) + 10000
+    pd.DataFrame({"Position": pos,
+                  "Name + ID": ["{0} ({1})".format(name, i) for name, i in zip(data[cols.NAME_FIELD], ids)],
+                  "Name": data[cols.NAME_FIELD],
+                  "ID": ids,
+                  "Roster Position": pos,
+                  "Salary": data[cols.SALARY_FIELD],
+                  "Game Info": ["{0}@{1} 10/06/2019 01:00PM ET".format(a, h) for a, h in zip(away, home)],
+                  "TeamAbbrev": data[cols.TEAM_FIELD],
+                  "AvgPointsPerGame": data[cols.POINTS_FIELD]}).to_csv(dfs_file, index=False)
+
+
+def write_projections(data, proj_file):
+    # FFA projections in the format read by FFAProjectionsImporter
+    pd.DataFrame({"playerId": np.arange(len(data)),
+                  "player": data[cols.NAME_FIELD],
+                  "team": data[cols.TEAM_FIELD],
+                  "position": data[cols.POS_FIELD].replace({cols.REQUIRED_POS["D"]: "DST"}),
+                  "age": 27,
+                  "points": data[cols.PROJ_POINTS_FIELD],
+                  "sdPts": data[cols.PROJ_POINTS_SD_FIELD],
+                  "tier": data[opt.TIER_FIELD]}).to_csv(proj_file, index=False)
@@ -0,0 +1,107 @@
+import inspect
+import logging
+import numpy as np
+import pandas as pd
+
+from utils import DFSException
+
+TRANSFORM_FIELD = "transform"
+
+
+def get_group_codes(*keys):
+    # Code of each row's combination of keys (-1 where any key is missing) and the number of groups
+    frame = pd.DataFrame({i: key for i, key in enumerate(keys)})
+    missing = frame.isnull().any(axis=1).to_numpy()
+    codes = frame.groupby(list(frame.columns), sort=True).ngroup().to_numpy(dtype=np.int64, copy=True)
+    codes[missing] = -1
+    return codes, int(codes.max()) + 1 if len(codes) else 0
+
+
+def group_mean(values, codes, num_groups):
+    # Mean of values within each group broadcast back to its rows. Rows without a group keep their value
+    in_group = codes >= 0
+    sums = np.bincount(codes[in_group], weights=values[in_group], minlength=num_groups)
+    counts = np.bincount(codes[in_group], minlength=num_groups)
+    means = sums / np.maximum(counts, 1)
+    return np.where(in_group, means[np.maximum(codes, 0)], values)
+
+
+def group_median(values, codes, num_groups):
+    # Median of values within each group broadcast back to its rows, from one sort of (group, value)
+    order = np.lexsort((values, codes))
+    counts = np.bincount(codes, minlength=num_groups)
+    starts = np.cumsum(counts) - counts
+    sorted_values = values[order]
+    lower = sorted_values[np.minimum(starts + (counts - 1) // 2, len(values) - 1)]
+    upper = sorted_values[np.minimum(starts + counts // 2, len(values) - 1)]
+    return ((lower + upper) / 2)[codes]
+
+
+def floor(values, slate, sd_multiplier=2):
+    return values - sd_multiplier * slate.sd
+
+
+def ceil(values, slate, sd_multiplier=2):
+    return values + sd_multiplier * slate.sd
+
+
+def tier_avg(values, slate):
+    # Replace values with the average of players in the same position/tier
+    return group_mean(values, slate.pos_tier_codes, slate.num_pos_tiers)
+
+
+def sharpe(values, slate):
+    # Points above the position median per unit of projection sd. Players without a usable sd use the
+    # median sd at their position
+    if not np.any(slate.sd > 0):
+        err_msg = "sharpe transform requires projection sds!"
+        logging.error(err_msg)
+        raise DFSException(err_msg)
+    num_positions = len(slate.positions)
+    has_sd = slate.sd > 0
+    pos_sd = np.full(num_positions, np.median(slate.sd[has_sd]))
+    pos_sd[slate.pos_codes[has_sd]] = group_median(slate.sd[has_sd], slate.pos_codes[has_sd], num_positions)
+    sd = np.where(has_sd, slate.sd, pos_sd[slate.pos_codes])
+    return (values - group_median(values, slate.pos_codes, num_positions)) / sd
+
+
+TRANSFORMS = {"floor": floor,
+              "ceil": ceil,
+              "tier_avg": tier_avg,
+              "sharpe": sharpe}
+
+
+def validate_transforms(steps):
+    # Steps are dicts like {"transform": "floor", "sd_multiplier": 1.5} applied in order
+    for step in steps:
+        name = step.get(TRANSFORM_FIELD) if isinstance(step, dict) else None
+        if name not in TRANSFORMS:
+            err_msg = "Invalid projection transform: {0}. Must be one of {1}".format(step, sorted(TRANSFORMS))
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+        params = [param for param in inspect.signature(TRANSFORMS[name]).parameters][2:]
+        unknown = [param for param in step if param != TRANSFORM_FIELD and param not in params]
+        if unknown:
+            err_msg = "Unknown option(s) for {0} transform: {1}".format(name, ", ".join(sorted(unknown)))
+            logging.error(err_msg)
+            raise DFSException(err_msg)
+
+
+def get_proj_type_transforms(proj_type="avg", sd_multiplier=2):
+    # Transform steps equivalent to a notebook proj_type
+    if proj_type in ["floor", "ceil"]:
+        return [{TRANSFORM_FIELD: proj_type, "sd_multiplier": sd_multiplier}]
+    elif proj_type in TRANSFORMS:
+        return [{TRANSFORM_FIELD: proj_type}]
+    return []
+
+
+def apply_transforms(slate, steps, values=None):
+    # New objective vector from chaining transform steps over slate projections (or values).
+    # Only the arrays being transformed are allocated so one compiled slate can serve a whole grid of transforms
+    validate_transforms(steps)
+    values = slate.projection if values is None else np.asarray(values, dtype=np.float64)
+    for step in steps:
+        params = {param: value for param, value in step.items() if param != TRANSFORM_FIELD}
+        values = TRANSFORMS[step[TRANSFORM_FIELD]](values, slate, **params)
+    return values.copy() if not steps else values
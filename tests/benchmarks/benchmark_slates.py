@@ -0,0 +1,38 @@
+import functools
+import glob
+import os
+import pandas as pd
+
+import optimizer as opt
+import synthetic_data
+from conftest import DATA_DIR, is_lfs_pointer
+
+# Harmonized weeks the solver benchmarks run on: a full synthetic slate plus every committed week checked out
+# of Git LFS (the csv fixtures are pointers otherwise)
+HARM_FILES = {os.path.splitext(os.path.basename(harm_file))[0]: harm_file
+              for harm_file in sorted(glob.glob(os.path.join(DATA_DIR, "harmonized_datasets", "*",
+                                                             "dfk_harm_wk*_*.csv")))
+              if not is_lfs_pointer(harm_file)}
+SYNTHETIC_WEEK = "synthetic"
+WEEKS = [SYNTHETIC_WEEK] + sorted(HARM_FILES)
+
+
+def get_harm_data(week):
+    if week == SYNTHETIC_WEEK:
+        return synthetic_data.make_harmonized_data()
+    return pd.read_csv(HARM_FILES[week])
+
+
+@functools.lru_cache(maxsize=None)
+def load_slate(week):
+    # Slates are only read, so every benchmark of a week shares one
+    return opt.Slate(get_harm_data(week))
+
+
+def write_harm_file(week, tmp_dir):
+    # Path to a harmonized csv for the week, written to tmp_dir if it's synthetic
+    if week != SYNTHETIC_WEEK:
+        return HARM_FILES[week]
+    harm_file = os.path.join(str(tmp_dir), "dfk_harm_synthetic.csv")
+    get_harm_data(week).to_csv(harm_file, index=False)
+    return harm_file
@@ -0,0 +1,66 @@
+import glob
+import os
+import pandas as pd
+import pytest
+
+import constants as cols
+import data_import as imp
+import synthetic_data
+from conftest import DATA_DIR, is_lfs_pointer
+
+pytest.importorskip("pytest_benchmark")
+
+# Committed 2019 price lists checked out of Git LFS plus a full synthetic price list
+PRICE_FILES = {os.path.basename(price_file): price_file
+               for price_file in sorted(glob.glob(os.path.join(DATA_DIR, "dfs_prices", "2019", "dk_prices_wk*_2019.*")))
+               if not is_lfs_pointer(price_file)}
+SYNTHETIC_PRICES = "synthetic"
+
+
+class RowwiseDKPriceImporter(imp.DKPriceImporter):
+    # Previous row-wise preprocessing kept as the baseline for the benchmark
+    def preprocess_data(self, data):
+        data = data[["Name", "Roster Position", "Game Info", "TeamAbbrev", "AvgPointsPerGame", "Salary"]].copy()
+
+        def get_opp_team(row):
+            player_team = row["TeamAbbrev"]
+            field = row["Game Info"]
+            for team in field.split()[0].split("@"):
+                if team != player_team:
+                    return team
+
+        data[cols.OPP_TEAM_FIELD] = data.apply(get_opp_team, axis=1)
+        data = data[["Name", "Roster Position", "TeamAbbrev", cols.OPP_TEAM_FIELD, "AvgPointsPerGame", "Salary"]].copy()
+        data.columns = [cols.NAME_FIELD, cols.POS_FIELD, cols.TEAM_FIELD,
+                        cols.OPP_TEAM_FIELD, cols.POINTS_FIELD, cols.SALARY_FIELD]
+
+        def fix_pos(field):
+            return field.split("/")[0]
+
+        data[cols.POS_FIELD] = data[cols.POS_FIELD].map(fix_pos)
+        data[cols.POS_FIELD] = data[cols.POS_FIELD].str.replace("DST", cols.REQUIRED_POS["D"])
+        return data
+
+
+@pytest.fixture(scope="module", params=[SYNTHETIC_PRICES] + sorted(PRICE_FILES))
+def raw_prices(request, tmp_path_factory):
+    # Parsed but not yet preprocessed price list
+    if request.param == SYNTHETIC_PRICES:
+        price_file = str(tmp_path_factory.mktemp("prices") / "dk_prices_synthetic.csv")
+        synthetic_data.write_dk_prices(synthetic_data.make_harmonized_data(), price_file)
+    else:
+        price_file = PRICE_FILES[request.param]
+    return request.param, imp.DKPriceImporter.__new__(imp.DKPriceImporter).read_data(price_file)
+
+
+@pytest.mark.parametrize("importer_cls", [RowwiseDKPriceImporter, imp.DKPriceImporter], ids=["rowwise", "vectorized"])
+def test_preprocess_prices(benchmark, raw_prices, importer_cls):
+    # Preprocess without re-running the importer constructor so only preprocessing is timed
+    name, raw_data = raw_prices
+    importer = importer_cls.__new__(importer_cls)
+    benchmark.group = "preprocess_prices-{0}".format(name)
+    benchmark.extra_info["players"] = len(raw_data)
+    data = benchmark(lambda: importer.preprocess_data(raw_data.copy()))
+
+    rowwise = RowwiseDKPriceImporter.__new__(RowwiseDKPriceImporter)
+    pd.testing.assert_frame_equal(data, rowwise.preprocess_data(raw_data.copy()))
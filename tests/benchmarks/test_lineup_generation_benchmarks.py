@@ -0,0 +1,59 @@
+import functools
+import numpy as np
+import pytest
+
+import optimizer as opt
+import dp_solver
+from benchmark_slates import WEEKS, load_slate
+
+pytest.importorskip("pytest_benchmark")
+
+ROUNDS = 3
+NUM_LINEUPS = 20
+MAX_OVERLAP = 6
+
+# Pseudo backend that finds all lineups in a single DP search
+TOP_LINEUPS_SEARCH = "topk"
+BACKENDS = ["pulp", "highs", "dp", TOP_LINEUPS_SEARCH]
+
+# Model configs every backend is timed on. DP backend supports the roster template plus packing constraints
+MODEL_CONFIGS = {"default": {},
+                 "ceil": {"proj_type": "ceil"},
+                 "floor_max_per_team": {"proj_type": "floor", "max_per_team": 3},
+                 "actual_points": {"use_actual_points": True}}
+
+
+def generate(slate, backend, model_config):
+    # Lineup models are changed by every lineup generated so each round builds a fresh one
+    if backend == TOP_LINEUPS_SEARCH:
+        lineups, _, search = dp_solver.generate_top_lineups(slate, NUM_LINEUPS, max_overlap=MAX_OVERLAP,
+                                                            **model_config)
+        return lineups, search.model
+    generator = opt.LineupGenerator(opt.build_lineup_model(slate, **model_config), backend, max_overlap=MAX_OVERLAP)
+    return generator.generate(NUM_LINEUPS), generator.model
+
+
+@functools.lru_cache(maxsize=None)
+def get_pulp_objectives(week, config):
+    lineups, _ = generate(load_slate(week), "pulp", MODEL_CONFIGS[config])
+    return tuple(lineup.objective for lineup in lineups)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("config", sorted(MODEL_CONFIGS))
+@pytest.mark.parametrize("week", WEEKS)
+def test_generate_lineups(benchmark, week, config, backend):
+    if backend == "highs":
+        pytest.importorskip("highspy")
+    slate = load_slate(week)
+    benchmark.group = "generate_lineups-{0}-{1}".format(week, config)
+    lineups, model = benchmark.pedantic(generate, args=(slate, backend, MODEL_CONFIGS[config]), rounds=ROUNDS,
+                                        iterations=1)
+
+    solve_ms = 1000 * np.array([lineup.solve_secs for lineup in lineups])
+    benchmark.extra_info.update({"rows": model.num_rows,
+                                 "cols": model.num_cols,
+                                 "first_ms": solve_ms[0],
+                                 "next_median_ms": float(np.median(solve_ms[1:]))})
+    np.testing.assert_allclose([lineup.objective for lineup in lineups], get_pulp_objectives(week, config),
+                               atol=1e-6)
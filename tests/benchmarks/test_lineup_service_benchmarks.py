@@ -0,0 +1,86 @@
+import asyncio
+import os
+import threading
+import pandas as pd
+import pytest
+
+import constants as cols
+import lineup_service as svc
+from benchmark_slates import WEEKS, write_harm_file
+
+pytest.importorskip("pytest_benchmark")
+
+ROUNDS = 3
+NUM_WORKERS = min(4, os.cpu_count())
+NUM_REQUESTS = 20
+NUM_LINEUPS = 5
+BACKEND = "pulp"
+
+
+@pytest.fixture(scope="module", params=["tcp", "unix_socket"])
+def service(request, tmp_path_factory):
+    # Service running on an event loop in a background thread, driven from a local client. Yields a function
+    # running a coroutine on that loop and the client
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def run(coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    lineup_service = svc.LineupService(NUM_WORKERS)
+    unix_socket = str(tmp_path_factory.mktemp("service") / "lineups.sock") if request.param == "unix_socket" else None
+    server = run(lineup_service.start(port=0, unix_socket=unix_socket))
+    port = None if unix_socket else server.sockets[0].getsockname()[1]
+    try:
+        yield run, svc.LineupServiceClient(port=port, unix_socket=unix_socket)
+    finally:
+        run(lineup_service.close())
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+@pytest.fixture(scope="module", params=WEEKS)
+def harm_file(request, tmp_path_factory):
+    return request.param, write_harm_file(request.param, tmp_path_factory.mktemp("harm"))
+
+
+def test_register_slate(benchmark, service, harm_file):
+    run, client = service
+    week, harm_file = harm_file
+    benchmark.group = "register_slate-{0}".format(week)
+    response = benchmark.pedantic(lambda: run(client.register_slate(week, harm_file=harm_file)), rounds=ROUNDS,
+                                  iterations=1)
+    assert response["num_players"] > 0
+
+
+def test_concurrent_lineup_requests(benchmark, service, harm_file):
+    # Late swap style requests against the resident slate: every other one removes a top projected player
+    run, client = service
+    week, harm_file = harm_file
+    run(client.register_slate(week, harm_file=harm_file))
+    data = pd.read_csv(harm_file)
+    names = data.sort_values(cols.PROJ_POINTS_FIELD, ascending=False)[cols.NAME_FIELD].drop_duplicates(keep=False)
+    requests = [{"remove": [name]} if i % 2 else {} for i, name in enumerate(names.iloc[:NUM_REQUESTS])]
+
+    async def send_requests():
+        return await asyncio.gather(*[client.generate_lineups(week, NUM_LINEUPS, backend=BACKEND, max_overlap=6,
+                                                              **request) for request in requests])
+
+    benchmark.group = "lineup_requests-{0}".format(week)
+    responses = benchmark.pedantic(lambda: run(send_requests()), rounds=ROUNDS, iterations=1)
+    worker_timing = pd.DataFrame([{field: response[field] for field in ["load_secs", "build_secs", "solve_secs"]}
+                                  for response in responses])
+    benchmark.extra_info.update(worker_timing.mean().to_dict())
+    benchmark.extra_info["requests_per_sec"] = NUM_REQUESTS / benchmark.stats.stats.mean
+
+    for request, response in zip(requests, responses):
+        assert len(response["lineups"]) == NUM_LINEUPS
+        for lineup in response["lineups"]:
+            assert not set(request.get("remove", [])) & set(lineup["players"])
+
+    # Locked request on the resident slate
+    locked = responses[0]["lineups"][-1]["players"][:2]
+    response = run(client.generate_lineups(week, NUM_LINEUPS, lock=locked, backend=BACKEND))
+    assert all(set(locked) <= set(lineup["players"]) for lineup in response["lineups"])
@@ -0,0 +1,159 @@
+import os
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_import as imp
+import optimizer as opt
+import simulation as sim
+import synthetic_data
+from lineups import LineupSet
+from review_queue import MatchReviewQueue
+from conftest import DATA_DIR, is_lfs_pointer
+
+pytest.importorskip("pytest_benchmark")
+
+# Run with: pytest tests/benchmarks --run-benchmarks --benchmark-json=<commit>.json
+# and compare runs with --benchmark-compare=<previous run> --benchmark-compare-fail=mean:25%
+
+# Committed week with real DK points and FFA projections (the csv fixtures are Git LFS pointers)
+FIXTURE_DFS_FILE = os.path.join(DATA_DIR, "dfs_results", "2019", "dk_points_wk2_2019.xlsx")
+FIXTURE_PROJ_FILE = os.path.join(DATA_DIR, "projections", "2019", "ffa_projections_scoring_wk2.xlsx")
+
+# Synthetic slates are multiples of a full 32 team slate (512 players)
+SCALES = [1, 5, 20]
+FUZZY_FRACTION = 0.05
+
+ROUNDS = 3
+NUM_LINEUPS = 10
+MAX_OVERLAP = 6
+BACKEND = "pulp"
+NUM_SIMS = 2000
+
+
+def run_stage(benchmark, stage, func):
+    # Time func over ROUNDS rounds, then run it once more under tracemalloc for its peak memory
+    benchmark.group = stage
+    output = benchmark.pedantic(func, rounds=ROUNDS, iterations=1)
+    tracemalloc.start()
+    try:
+        func()
+        benchmark.extra_info["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+    if isinstance(output, pd.DataFrame):
+        benchmark.extra_info["rows"] = len(output)
+    return output
+
+
+@pytest.fixture(scope="module", params=["fixture_wk2_2019"] + ["synthetic_x{0}".format(scale) for scale in SCALES])
+def pipeline_input(request, tmp_path_factory):
+    # Raw DK and projection files of a slate and the importers that read them
+    if request.param.startswith("fixture"):
+        for file_name in [FIXTURE_DFS_FILE, FIXTURE_PROJ_FILE]:
+            if not os.path.exists(file_name) or is_lfs_pointer(file_name):
+                pytest.skip("Fixture not checked out: {0}".format(file_name))
+        return {"dfs_file": FIXTURE_DFS_FILE, "proj_file": FIXTURE_PROJ_FILE, "dk_importer": imp.DKResultsImporter}
+
+    scale = int(request.param.split("_x")[1])
+    price_data, proj_data = synthetic_data.scale_harmonized_data(synthetic_data.make_harmonized_data(), scale,
+                                                                 FUZZY_FRACTION)
+    tmp_dir = tmp_path_factory.mktemp(request.param)
+    dfs_file = str(tmp_dir / "dk_prices.csv")
+    proj_file = str(tmp_dir / "ffa_projections.csv")
+    synthetic_data.write_dk_prices(price_data, dfs_file)
+    synthetic_data.write_projections(proj_data, proj_file)
+    return {"dfs_file": dfs_file, "proj_file": proj_file, "dk_importer": imp.DKPriceImporter}
+
+
+@pytest.fixture(scope="module")
+def dk_data(pipeline_input):
+    return pipeline_input["dk_importer"](pipeline_input["dfs_file"]).data
+
+
+@pytest.fixture(scope="module")
+def ffa_data(pipeline_input):
+    return imp.FFAProjectionsImporter(pipeline_input["proj_file"]).data
+
+
+@pytest.fixture(scope="module")
+def name_index(dk_data):
+    return imp.PlayerNameIndex.from_data(dk_data)
+
+
+@pytest.fixture(scope="module")
+def merged_data(dk_data, ffa_data, name_index):
+    return imp.merge_datasets(ffa_data.copy(), dk_data, name_index=name_index, review_queue=MatchReviewQueue())
+
+
+@pytest.fixture(scope="module")
+def slate(merged_data):
+    return opt.Slate(merged_data)
+
+
+@pytest.fixture(scope="module")
+def generated_lineups(slate):
+    return opt.generate_lineups(slate, NUM_LINEUPS, backend=BACKEND, max_overlap=MAX_OVERLAP)[0]
+
+
+def test_import_prices(benchmark, pipeline_input):
+    run_stage(benchmark, "import_prices",
+              lambda: pipeline_input["dk_importer"](pipeline_input["dfs_file"]).data)
+
+
+def test_import_projections(benchmark, pipeline_input):
+    run_stage(benchmark, "import_projections", lambda: imp.FFAProjectionsImporter(pipeline_input["proj_file"]).data)
+
+
+def test_build_name_index(benchmark, dk_data):
+    run_stage(benchmark, "build_name_index", lambda: imp.PlayerNameIndex.from_data(dk_data))
+
+
+def test_harmonize_player_names(benchmark, dk_data, ffa_data, name_index):
+    harmonized = run_stage(benchmark, "harmonize_player_names",
+                           lambda: imp.harmonize_player_names(ffa_data.copy(), dk_data, name_index=name_index,
+                                                              review_queue=MatchReviewQueue()))
+    assert len(harmonized)
+
+
+def test_merge_datasets(benchmark, dk_data, ffa_data, name_index):
+    merged = run_stage(benchmark, "merge_datasets",
+                       lambda: imp.merge_datasets(ffa_data.copy(), dk_data, name_index=name_index,
+                                                  review_queue=MatchReviewQueue()))
+    assert len(merged)
+
+
+def test_build_slate(benchmark, merged_data):
+    run_stage(benchmark, "build_slate", lambda: opt.Slate(merged_data))
+
+
+def test_build_model(benchmark, slate):
+    model = run_stage(benchmark, "build_model", lambda: opt.build_lineup_model(slate))
+    benchmark.extra_info["rows"] = model.num_rows
+    benchmark.extra_info["cols"] = model.num_cols
+
+
+def test_generate_lineups(benchmark, slate):
+    # Lineup models are changed by every lineup generated so each round solves a freshly built one
+    def generate():
+        generator = opt.LineupGenerator(opt.build_lineup_model(slate), BACKEND, max_overlap=MAX_OVERLAP)
+        generator.generate(NUM_LINEUPS)
+        return generator
+
+    generator = run_stage(benchmark, "generate_lineups", generate)
+    benchmark.extra_info["solver_calls"] = generator.backend.num_solves
+    assert len(generator.lineups) == NUM_LINEUPS
+
+
+def test_evaluate_lineups(benchmark, slate, generated_lineups):
+    # Simulated outcomes plus actual points of every lineup
+    def evaluate():
+        simulator = sim.ProjectionSimulator.from_slate(slate, seed=0)
+        summary = sim.simulate_lineups(simulator, generated_lineups, NUM_SIMS).summary()
+        lineup_set = LineupSet.from_lineups(slate.num_players, generated_lineups, dedup=False)
+        summary["actual"] = np.nan_to_num(slate.actual)[lineup_set.player_idx].sum(axis=1)
+        return summary
+
+    summary = run_stage(benchmark, "evaluate_lineups", evaluate)
+    assert len(summary) == len(generated_lineups)
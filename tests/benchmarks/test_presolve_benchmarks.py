@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import optimizer as opt
+import presolve
+from benchmark_slates import WEEKS, load_slate
+
+pytest.importorskip("pytest_benchmark")
+
+ROUNDS = 3
+NUM_LINEUPS = 10
+BACKEND = "pulp"
+
+# Model configs every week is timed on. Team and stack rows split constraint classes so fewer players are pruned
+MODEL_CONFIGS = {"default": {},
+                 "ceil": {"proj_type": "ceil"},
+                 "max_per_team": {"max_per_team": 3},
+                 "qb_stack": {"min_qb_stack": 2},
+                 "actual_points": {"use_actual_points": True}}
+
+
+@pytest.mark.parametrize("config", sorted(MODEL_CONFIGS))
+@pytest.mark.parametrize("week", WEEKS)
+def test_presolve_generate_lineups(benchmark, week, config):
+    slate = load_slate(week)
+    model_config = MODEL_CONFIGS[config]
+    benchmark.group = "presolve-{0}-{1}".format(week, config)
+    lineups, _, result = benchmark.pedantic(presolve.generate_lineups, args=(slate, NUM_LINEUPS),
+                                            kwargs=dict(model_config, backend=BACKEND), rounds=ROUNDS, iterations=1)
+    benchmark.extra_info.update({stat: result.stats[stat] for stat in ["players", "players_removed",
+                                                                       "nonzeros_removed"]})
+
+    # Lineups can only differ between tied objectives
+    full_lineups, _ = opt.generate_lineups(slate, NUM_LINEUPS, backend=BACKEND, **model_config)
+    np.testing.assert_allclose([lineup.objective for lineup in lineups],
+                               [lineup.objective for lineup in full_lineups], atol=1e-6)
+
+
+@pytest.mark.parametrize("config", sorted(MODEL_CONFIGS))
+@pytest.mark.parametrize("week", WEEKS)
+def test_full_generate_lineups(benchmark, week, config):
+    benchmark.group = "presolve-{0}-{1}".format(week, config)
+    lineups, _ = benchmark.pedantic(opt.generate_lineups, args=(load_slate(week), NUM_LINEUPS),
+                                    kwargs=dict(MODEL_CONFIGS[config], backend=BACKEND), rounds=ROUNDS, iterations=1)
+    assert len(lineups) == NUM_LINEUPS
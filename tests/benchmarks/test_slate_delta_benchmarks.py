@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+import constants as cols
+import data_import as imp
+import optimizer as opt
+import slate_delta
+from benchmark_slates import WEEKS, get_harm_data
+from synthetic_data import write_dk_prices, write_projections
+
+pytest.importorskip("pytest_benchmark")
+
+ROUNDS = 3
+NUM_LINEUPS = 20
+NUM_CHANGED = 3
+NUM_OUT = 1
+BACKEND = "pulp"
+
+
+def build_full(dfs_file, proj_file):
+    # Import, harmonize, compile and solve from scratch
+    harmonized = slate_delta.HarmonizedSlate.from_files(dfs_file, proj_file)
+    generator = opt.LineupGenerator(opt.build_lineup_model(harmonized.slate), BACKEND)
+    generator.generate(NUM_LINEUPS)
+    return harmonized, generator
+
+
+def refresh(harmonized, generator, refresh_file):
+    # Delta path: only the refreshed projections are imported and only affected lineups re-solved
+    delta = harmonized.diff_projections(imp.FFAProjectionsImporter(refresh_file).data)
+    harmonized.apply(delta, generator.model, generator)
+    return slate_delta.refresh_lineups(generator, delta)
+
+
+@pytest.fixture(scope="module", params=WEEKS)
+def slate_files(request, tmp_path_factory):
+    # DK prices, projections and a midweek refresh where a few rostered players' projections move and a
+    # few are ruled out
+    tmp_dir = tmp_path_factory.mktemp("slate_delta")
+    data = get_harm_data(request.param).drop_duplicates(subset=[cols.NAME_FIELD]).reset_index(drop=True)
+    dfs_file = str(tmp_dir / "dk_prices_wk1_2019.csv")
+    proj_file = str(tmp_dir / "ffa_projections_scoring_wk1.csv")
+    refresh_file = str(tmp_dir / "ffa_projections_scoring_wk1_midweek.csv")
+    write_dk_prices(data, dfs_file)
+    write_projections(data, proj_file)
+
+    harmonized, generator = build_full(dfs_file, proj_file)
+    rng = np.random.RandomState(0)
+    rostered = np.unique(harmonized.slate.data[cols.NAME_FIELD].to_numpy()[generator.lineup_set.player_idx])
+    rostered = np.flatnonzero(data[cols.NAME_FIELD].isin(rostered))
+    changed = rng.choice(rostered, NUM_CHANGED, replace=False)
+    out = rng.choice(np.setdiff1d(rostered, changed), NUM_OUT, replace=False)
+    refreshed = data.copy()
+    refreshed.loc[changed, cols.PROJ_POINTS_FIELD] *= rng.uniform(0.7, 1.3, len(changed))
+    write_projections(refreshed.drop(index=out), refresh_file)
+    return request.param, dfs_file, proj_file, refresh_file
+
+
+def test_refresh_lineups(benchmark, slate_files):
+    week, dfs_file, proj_file, refresh_file = slate_files
+    benchmark.group = "slate_delta-{0}".format(week)
+    refreshed = []
+
+    def setup():
+        # Initial build isn't timed
+        harmonized, generator = build_full(dfs_file, proj_file)
+        refreshed.append((harmonized, generator))
+        return (harmonized, generator, refresh_file), {}
+
+    new_lineups = benchmark.pedantic(refresh, setup=setup, rounds=ROUNDS)
+    harmonized, generator = refreshed[-1]
+    benchmark.extra_info["lineups_resolved"] = len(new_lineups)
+
+    # Patched objective must match a freshly harmonized slate for every available player
+    fresh, fresh_generator = build_full(dfs_file, refresh_file)
+    fresh_idx = slate_delta.get_player_keys(fresh.slate.data).get_indexer(harmonized.player_keys)
+    available = np.flatnonzero(harmonized.available)
+    assert np.all(fresh_idx[available] >= 0)
+    np.testing.assert_allclose(generator.model.objective[available],
+                               fresh_generator.model.objective[fresh_idx[available]])
+    assert len(generator.lineups) == len(fresh_generator.lineups)
+    assert all(harmonized.available[lineup.player_idx].all() for lineup in generator.lineups)
+    assert len(generator.lineup_set.unique()) == len(generator.lineups)
+
+
+def test_rebuild_lineups(benchmark, slate_files):
+    week, dfs_file, _, refresh_file = slate_files
+    benchmark.group = "slate_delta-{0}".format(week)
+    _, generator = benchmark.pedantic(build_full, args=(dfs_file, refresh_file), rounds=ROUNDS, iterations=1)
+    assert len(generator.lineups) == NUM_LINEUPS
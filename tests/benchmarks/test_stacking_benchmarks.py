@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import optimizer as opt
+from benchmark_slates import WEEKS, load_slate
+from enumerated_stacking import build_enumerated_model
+
+pytest.importorskip("pytest_benchmark")
+
+ROUNDS = 3
+
+MODEL_CONFIG = {"stacks": [["QB", "WR/TE:1", "-WR"]],
+                "opposing_player_exclusions": [["QB", "D"], ["RB", "D"], ["WR", "D"]]}
+FORMULATIONS = {"enumerated": build_enumerated_model,
+                "aggregated": opt.build_lineup_model}
+
+
+def build_and_solve(slate, formulation):
+    model = FORMULATIONS[formulation](slate, **MODEL_CONFIG)
+    return model, opt.get_backend(model).solve()
+
+
+@pytest.mark.parametrize("formulation", sorted(FORMULATIONS))
+@pytest.mark.parametrize("week", WEEKS)
+def test_build_and_solve_stacks(benchmark, week, formulation):
+    slate = load_slate(week)
+    benchmark.group = "stacking-{0}".format(week)
+    model, solution = benchmark.pedantic(build_and_solve, args=(slate, formulation), rounds=ROUNDS, iterations=1)
+    benchmark.extra_info.update({"players": slate.num_players,
+                                 "rows": model.num_rows,
+                                 "cols": model.num_cols,
+                                 "solve_ms": 1000 * solution.solve_secs})
+
+    # Aggregated stack rows must not change the optimal lineup score
+    _, aggregated = build_and_solve(slate, "aggregated")
+    assert solution.status == "optimal"
+    assert np.isclose(solution.objective, aggregated.objective)
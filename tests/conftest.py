@@ -0,0 +1,41 @@
+import os
+import sys
+import pytest
+
+# Package modules import each other by module name (e.g. import optimizer as opt)
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "dfs_optimization_tools"))
+
+import optimizer as opt
+import synthetic_data
+
+DATA_DIR = os.path.join(REPO_DIR, "data")
+
+
+def is_lfs_pointer(file_name):
+    # Data files that weren't pulled from Git LFS are small text pointers
+    with open(file_name, "rb") as fh:
+        return fh.read(40).startswith(b"version https://git-lfs")
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-benchmarks",
+                     action="store_true",
+                     default=False,
+                     help="Run pipeline benchmarks (tests using the pytest-benchmark benchmark fixture)")
+
+
+def pytest_collection_modifyitems(config, items):
+    # Benchmarks take minutes so they only run when asked for
+    if config.getoption("--run-benchmarks"):
+        return
+    skip_benchmark = pytest.mark.skip(reason="Pipeline benchmarks only run with --run-benchmarks")
+    for item in items:
+        if "benchmark" in getattr(item, "fixturenames", ()):
+            item.add_marker(skip_benchmark)
+
+
+@pytest.fixture(scope="session", params=[0, 1], ids=["seed0", "seed1"])
+def synthetic_slate(request):
+    # Half size synthetic slates (16 teams) so every backend solves quickly
+    return opt.Slate(synthetic_data.make_harmonized_data(num_teams=16, seed=request.param))
@@ -0,0 +1,63 @@
+from itertools import product, permutations
+import numpy as np
+
+import optimizer as opt
+import stacking
+
+# Stack formulation from before stack and opposing position rows were aggregated, kept as the reference the
+# aggregated model is checked and benchmarked against
+STACK_OPTIONS = ["stacks", "opposing_player_exclusions"]
+
+
+def add_enumerated_stacks(model, stacks, projection, point_diff_for_identical=0):
+    # Previous formulation kept as the baseline: one binary per combination of eligible players
+    slate = model.slate
+    teams = np.unique(slate.team_codes)
+    team_stack_vars = {team: [] for team in teams}
+
+    for stack_group in stacks.stack_groups():
+        stack_vars = []
+        for stack in stack_group:
+            for team in teams:
+                eligible = []
+                for pos in stack.pos:
+                    eligible.append(stacking.get_stack_eligible(slate, projection, team, pos,
+                                                                stack.position_counts[pos], point_diff_for_identical))
+                for pos in stack.opp_pos:
+                    eligible.append(stacking.get_stack_eligible(slate, projection, slate.team_opp[team], pos,
+                                                                stack.opp_position_counts[pos], point_diff_for_identical))
+                combos = set(tuple(sorted(combo)) for combo in product(*eligible)
+                             if len(set(combo)) == len(stack.total_positions))
+                for combo in combos:
+                    var = model.add_col("rules_{0}_{1}_{2}".format(stack.id, slate.teams[team], len(stack_vars)))
+                    stack_vars.append(var)
+                    team_stack_vars[team].append(var)
+                    if stack.is_opp_stack:
+                        team_stack_vars[slate.team_opp[team]].append(var)
+                    model.add_row(list(combo) + [var], [1.0] * len(combo) + [-len(combo)], lb=0)
+        model.add_row(stack_vars, 1.0, lb=1)
+
+    for team, stack_vars in team_stack_vars.items():
+        if stack_vars:
+            model.add_row(stack_vars, 1.0, ub=1)
+
+
+def restrict_positions_pairwise(model, exclude_pos):
+    # Previous formulation kept as the baseline: one row per pair of opposing players
+    slate = model.slate
+    for team_a, team_b in slate.game_teams:
+        for pos_a, pos_b in permutations(exclude_pos, 2):
+            for players in product(slate.players_at(pos_a, team_a), slate.players_at(pos_b, team_b)):
+                model.add_row(list(players), 1.0, ub=1)
+
+
+def build_enumerated_model(slate, **config):
+    model_config = opt.get_model_config(**config)
+    model = opt.build_lineup_model(slate, **{key: value for key, value in config.items() if key not in STACK_OPTIONS})
+    for exclude_pos in model_config["opposing_player_exclusions"]:
+        restrict_positions_pairwise(model, exclude_pos)
+    if model_config["stacks"]:
+        stacks = stacking.StackSet(model_config["stacks"], opt.DK_POS_MAX, model_config["max_per_team"])
+        add_enumerated_stacks(model, stacks, slate.get_objective(model_config["proj_type"], model_config["sd_multiplier"]),
+                              model_config["point_diff_for_identical"])
+    return model
@@ -0,0 +1,19 @@
+import backtest
+import synthetic_data
+
+
+def test_load_slate_keeps_only_recent_slates(tmp_path, monkeypatch):
+    monkeypatch.setattr(backtest, "_loaded_slates", backtest.OrderedDict())
+    harm_files = []
+    for week in range(1, 4):
+        harm_file = str(tmp_path / "dfk_harm_wk{0}_2019.csv".format(week))
+        synthetic_data.make_harmonized_data(num_teams=4, seed=week).to_csv(harm_file, index=False)
+        harm_files.append(harm_file)
+
+    first = backtest.load_slate(harm_files[0], [])
+    assert backtest.load_slate(harm_files[0], []) is first
+    backtest.load_slate(harm_files[1], [])
+    backtest.load_slate(harm_files[2], [])
+    assert len(backtest._loaded_slates) == backtest.MAX_LOADED_SLATES
+    assert (harm_files[0], ()) not in backtest._loaded_slates
+    assert backtest.load_slate(harm_files[0], []) is not first
@@ -0,0 +1,76 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+import contest_results as cr
+from utils import DFSException
+
+# Two entries tied for 2nd
+POINTS = np.array([150.0, 140.0, 140.0, 130.0, 120.0])
+RANKS = np.array([1, 2, 2, 4, 5])
+
+
+@pytest.fixture
+def standings():
+    # Shuffled so the constructor has to sort by points then rank
+    order = [3, 0, 4, 2, 1]
+    return cr.ContestStandings(POINTS[order], RANKS[order])
+
+
+def test_team_ranks_place_ties_behind_entries(standings):
+    scores = [160, 150, 145, 140, 135, 130, 100]
+    assert list(standings.team_ranks(scores)) == [1, 2, 2, 3, 3, 5, 6]
+    assert standings.team_rank(140) == (3, len(POINTS))
+    np.testing.assert_allclose(standings.percentiles([160, 140, 100]), [100.0, 80.0, 0.0])
+
+
+def test_non_finite_scores_are_unranked(standings):
+    scores = [np.nan, np.inf, -np.inf, 145]
+    assert list(standings.team_ranks(scores)) == [-1, -1, -1, 2]
+    assert np.isnan(standings.percentiles(scores)[:3]).all()
+
+
+def test_from_csv_streams_chunks(tmp_path, standings):
+    results_file = str(tmp_path / "wk1_gpp_3.csv")
+    pd.DataFrame({"rank": RANKS[::-1], " Points ": POINTS[::-1], "EntryName": "x"}).to_csv(results_file, index=False)
+    read = cr.ContestStandings.from_csv(results_file, chunksize=2)
+    assert np.array_equal(read.points, standings.points)
+    assert np.array_equal(read.ranks, standings.ranks)
+    assert read.payout_score(2) == 140.0
+    with pytest.raises(DFSException):
+        read.payout_score(0)
+
+
+def test_payout_bands_include_max_rank():
+    payout_table = cr.PayoutTable([10, 1, 3], [10.0, 100.0, 50.0], entry_fee=5)
+    ranks = [1, 2, 3, 4, 10, 11, 0, -1]
+    assert list(payout_table.get_prizes(ranks)) == [100, 50, 50, 10, 10, 0, 0, 0]
+    assert payout_table.paid_rank == 10
+    assert list(cr.PayoutTable([], [], entry_fee=5).get_prizes([1, 2])) == [0, 0]
+
+
+def test_double_up_is_default_payout_table(tmp_path):
+    du_table = cr.load_payout_table(str(tmp_path / "wk3_du_5.csv"), num_entries=100)
+    assert du_table.entry_fee == 5.0
+    assert du_table.paid_rank == int(100 * cr.DOUBLE_UP_PAID_FRACTION)
+    assert list(du_table.get_prizes([1, 45, 46])) == [10.0, 10.0, 0.0]
+    assert cr.load_payout_table(str(tmp_path / "wk3_gpp_20.csv"), num_entries=100) is None
+
+    # A payout file next to the results takes precedence
+    with open(str(tmp_path / "wk3_du_5_payouts.json"), "w") as fh:
+        json.dump({"entry_fee": 5, "payouts": [{"max_rank": 2, "prize": 9}]}, fh)
+    assert cr.load_payout_table(str(tmp_path / "wk3_du_5.csv"), num_entries=100).paid_rank == 2
+
+
+def test_evaluate_scores(standings):
+    evaluator = cr.ContestEvaluator(standings, cr.PayoutTable([2, 4], [20.0, 8.0], entry_fee=4))
+    evaluation = evaluator.evaluate_scores([155, 140, 131, 90, np.nan])
+    assert list(evaluation["rank"]) == [1, 3, 3, 6, -1]
+    assert list(evaluation.prize) == [20.0, 8.0, 8.0, 0.0, 0.0]
+    assert list(evaluation.cash) == [True, True, True, False, False]
+    np.testing.assert_allclose(evaluation.roi, [4.0, 1.0, 1.0, -1.0, -1.0])
+    assert evaluator.portfolio_roi(evaluation) == pytest.approx(36.0 / 20 - 1)
+
+    unpaid = cr.ContestEvaluator(standings).evaluate_scores([155])
+    assert not unpaid.cash[0] and np.isnan(unpaid.prize[0])
@@ -0,0 +1,53 @@
+import json
+import os
+import pandas as pd
+import pytest
+
+import data_import as imp
+from conftest import DATA_DIR, REPO_DIR
+from review_queue import MatchReviewQueue
+
+# Importer output on the committed 2019 files, written before the importers and name matching were vectorized
+GOLDEN_DIR = os.path.join(REPO_DIR, "tests", "golden")
+
+# Dtype pandas infers for string columns (str from pandas 3, object before)
+STRING_DTYPE = pd.Series(["player"]).dtype
+
+RESULTS_FILE = os.path.join(DATA_DIR, "dfs_results", "2019", "dk_points_wk{0}_2019.xlsx")
+PRICES_FILE = os.path.join(DATA_DIR, "dfs_prices", "2019", "dk_prices_wk4_2019.xlsx")
+PROJ_FILE = os.path.join(DATA_DIR, "projections", "2019", "ffa_projections_scoring_wk2.xlsx")
+
+
+def load_golden(name):
+    with open(os.path.join(GOLDEN_DIR, "{0}.json".format(name))) as fh:
+        golden = json.load(fh)
+    frame = pd.DataFrame(golden["data"], index=golden["index"], columns=golden["columns"])
+    return frame.astype({col: STRING_DTYPE if dtype == "str" else dtype for col, dtype in golden["dtypes"].items()})
+
+
+@pytest.mark.parametrize("week", range(1, 10))
+def test_dk_results_import(week):
+    data = imp.DKResultsImporter(RESULTS_FILE.format(week)).data
+    pd.testing.assert_frame_equal(data, load_golden("dk_points_wk{0}_2019".format(week)))
+
+
+def test_dk_price_import():
+    pd.testing.assert_frame_equal(imp.DKPriceImporter(PRICES_FILE).data, load_golden("dk_prices_wk4_2019"))
+
+
+def test_cached_import_matches_fresh_import(tmp_path):
+    pytest.importorskip("pyarrow")
+    golden = load_golden("dk_points_wk1_2019")
+    for _ in range(2):
+        data = imp.DKResultsImporter(RESULTS_FILE.format(1), cache_dir=str(tmp_path)).data
+        pd.testing.assert_frame_equal(data, golden)
+
+
+def test_merge_datasets():
+    # Uncertain matches are queued instead of prompting, same as answering no to every prompt
+    dk_data = imp.DKResultsImporter(RESULTS_FILE.format(2)).data
+    proj_data = imp.FFAProjectionsImporter(PROJ_FILE).data
+    review_queue = MatchReviewQueue()
+    merged = imp.merge_datasets(proj_data, dk_data, review_queue=review_queue)
+    pd.testing.assert_frame_equal(merged, load_golden("merged_ffa_dk_points_wk2_2019"))
+    assert len(review_queue)
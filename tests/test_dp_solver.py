@@ -0,0 +1,95 @@
+import glob
+import os
+import numpy as np
+import pytest
+
+import dp_solver
+import optimizer as opt
+from utils import DFSException
+from conftest import DATA_DIR, is_lfs_pointer
+
+NUM_LINEUPS = 10
+
+# (model config, generator config) pairs the DP backend supports: the roster template plus packing rows
+CONFIGS = {"default": ({}, {}),
+           "max_per_team": ({"max_per_team": 2}, {}),
+           "max_overlap": ({}, {"max_overlap": 5}),
+           "exposure": ({}, {"max_exposure": 0.3, "max_qb_exposure": 0.2}),
+           "combined": ({"max_per_team": 3}, {"max_overlap": 6, "max_exposure": 0.5})}
+
+# Every harmonized week is checked with each of these model configs
+HARMONIZED_FILES = sorted(glob.glob(os.path.join(DATA_DIR, "harmonized_datasets", "*", "dfk_harm_wk*_*.csv")))
+HARMONIZED_CONFIGS = [{},
+                      {"proj_type": "ceil"},
+                      {"proj_type": "floor", "max_per_team": 3},
+                      {"use_actual_points": True}]
+HARMONIZED_MAX_OVERLAP = 6
+
+
+def get_objectives(lineups):
+    return np.array([lineup.objective for lineup in lineups])
+
+
+@pytest.mark.parametrize("config", sorted(CONFIGS))
+def test_dp_backend_matches_pulp(synthetic_slate, config):
+    model_config, generator_config = CONFIGS[config]
+    pulp_lineups, _ = opt.generate_lineups(synthetic_slate, NUM_LINEUPS, backend="pulp", **generator_config,
+                                           **model_config)
+    dp_lineups, generator = opt.generate_lineups(synthetic_slate, NUM_LINEUPS, backend="dp", **generator_config,
+                                                 **model_config)
+
+    assert len(dp_lineups) == len(pulp_lineups) == NUM_LINEUPS
+    np.testing.assert_allclose(get_objectives(dp_lineups), get_objectives(pulp_lineups), atol=1e-6)
+    assert generator.backend.num_solves == NUM_LINEUPS
+
+
+@pytest.mark.parametrize("model_config", HARMONIZED_CONFIGS, ids=lambda config: "-".join(config) or "default")
+@pytest.mark.parametrize("harm_file", HARMONIZED_FILES, ids=os.path.basename)
+def test_dp_backend_matches_pulp_on_harmonized_week(harm_file, model_config):
+    if is_lfs_pointer(harm_file):
+        pytest.skip("Harmonized dataset not pulled from Git LFS: {0}".format(harm_file))
+    slate = opt.Slate.from_csv(harm_file)
+    pulp_lineups, _ = opt.generate_lineups(slate, NUM_LINEUPS, backend="pulp", max_overlap=HARMONIZED_MAX_OVERLAP,
+                                           **model_config)
+    dp_lineups, _ = opt.generate_lineups(slate, NUM_LINEUPS, backend="dp", max_overlap=HARMONIZED_MAX_OVERLAP,
+                                         **model_config)
+
+    assert len(dp_lineups) == len(pulp_lineups)
+    np.testing.assert_allclose(get_objectives(dp_lineups), get_objectives(pulp_lineups), atol=1e-6)
+
+
+@pytest.mark.parametrize("config", sorted(CONFIGS))
+def test_top_lineups_match_pulp(synthetic_slate, config):
+    model_config, generator_config = CONFIGS[config]
+    pulp_lineups, _ = opt.generate_lineups(synthetic_slate, NUM_LINEUPS, backend="pulp", **generator_config,
+                                           **model_config)
+    top_lineups, lineup_set, _ = dp_solver.generate_top_lineups(synthetic_slate, NUM_LINEUPS, **generator_config,
+                                                                **model_config)
+
+    assert len(top_lineups) == len(lineup_set) == NUM_LINEUPS
+    np.testing.assert_allclose(get_objectives(top_lineups), get_objectives(pulp_lineups), atol=1e-6)
+
+
+def test_dp_backend_matches_pulp_with_small_cache(synthetic_slate, monkeypatch):
+    # Tables are cleared mid search when the cache fills up
+    monkeypatch.setattr(dp_solver, "MAX_CACHE_BYTES", 64 * 1024)
+    pulp_lineups, _ = opt.generate_lineups(synthetic_slate, NUM_LINEUPS, backend="pulp", max_overlap=6)
+    dp_lineups, _ = opt.generate_lineups(synthetic_slate, NUM_LINEUPS, backend="dp", max_overlap=6)
+    np.testing.assert_allclose(get_objectives(dp_lineups), get_objectives(pulp_lineups), atol=1e-6)
+
+
+def test_dp_backend_rejects_covering_rows(synthetic_slate):
+    with pytest.raises(DFSException):
+        opt.generate_lineups(synthetic_slate, 1, backend="dp", min_qb_stack=2)
+
+
+def test_node_limit_stops_generation_with_warning(synthetic_slate, caplog):
+    model = opt.build_lineup_model(synthetic_slate)
+    generator = opt.LineupGenerator(model, dp_solver.DpBackend(model, max_nodes=50), max_overlap=3)
+    generated = generator.generate(NUM_LINEUPS)
+    assert len(generated) < NUM_LINEUPS
+    assert generator.status == "node_limit"
+    assert "solver status node_limit" in caplog.text
+
+    _, generator = opt.generate_lineups(synthetic_slate, NUM_LINEUPS, backend="dp", max_overlap=6)
+    assert generator.status == opt.GENERATION_COMPLETE
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import pytest
+
+import lineup_service as svc
+import synthetic_data
+from utils import DFSException
+
+
+def write_harm_file(harm_file, num_teams, seed=0):
+    synthetic_data.make_harmonized_data(num_teams=num_teams, seed=seed).to_csv(harm_file, index=False)
+
+
+async def run_service(test, num_workers=1):
+    # Service on a free port with one worker so consecutive requests reuse the same worker's caches
+    service = svc.LineupService(num_workers=num_workers)
+    server = await service.start(port=0)
+    try:
+        await test(service, svc.LineupServiceClient(port=server.sockets[0].getsockname()[1]))
+    finally:
+        await service.close()
+
+
+def test_lineup_requests(tmp_path):
+    harm_file = str(tmp_path / "dfk_harm_wk1_2019.csv")
+    write_harm_file(harm_file, num_teams=8)
+
+    async def test(service, client):
+        registered = await client.register_slate("wk1", harm_file=harm_file)
+        assert registered["num_players"] > 0
+        assert (await client.health())["slates"] == ["wk1"]
+
+        first = await client.generate_lineups("wk1", 3, max_overlap=6)
+        assert first["new_generator"] and first["generation_status"] == "complete"
+        assert len(first["lineups"]) == 3
+        objectives = [lineup["objective"] for lineup in first["lineups"]]
+        assert objectives == sorted(objectives, reverse=True)
+
+        # Same options reuse the worker's generator reset to its starting state
+        again = await client.generate_lineups("wk1", 3, max_overlap=6)
+        assert not again["new_generator"]
+        assert [lineup["player_ids"] for lineup in again["lineups"]] == \
+               [lineup["player_ids"] for lineup in first["lineups"]]
+
+        # Lock a player missing from the best lineup and remove one of its players
+        best = first["lineups"][0]
+        locked = next(player for lineup in first["lineups"][1:] for player in lineup["player_ids"]
+                      if player not in best["player_ids"])
+        removed = best["players"][0]
+        constrained = await client.generate_lineups("wk1", 3, lock=[locked], remove=[removed], max_overlap=6)
+        assert not constrained["new_generator"]
+        for lineup in constrained["lineups"]:
+            assert locked in lineup["player_ids"] and removed not in lineup["players"]
+
+        # Locks and removals don't carry over to the next request
+        unlocked = await client.generate_lineups("wk1", 1, max_overlap=6)
+        assert unlocked["lineups"][0]["player_ids"] == best["player_ids"]
+
+    asyncio.run(run_service(test))
+
+
+def test_reregistered_slate_replaces_cached_slate(tmp_path):
+    harm_file = str(tmp_path / "dfk_harm_wk1_2019.csv")
+    write_harm_file(harm_file, num_teams=8)
+
+    async def test(service, client):
+        num_players = (await client.register_slate("wk1", harm_file=harm_file))["num_players"]
+        assert (await client.generate_lineups("wk1", 1))["new_generator"]
+
+        # Updated file is recompiled and its generators rebuilt
+        write_harm_file(harm_file, num_teams=12)
+        assert (await client.register_slate("wk1", harm_file=harm_file))["num_players"] > num_players
+        assert (await client.generate_lineups("wk1", 1))["new_generator"]
+
+    asyncio.run(run_service(test))
+
+
+def test_load_slate_replaces_stale_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(svc, "_loaded_slates", {})
+    harm_file = str(tmp_path / "dfk_harm_wk1_2019.csv")
+    write_harm_file(harm_file, num_teams=4)
+    slate_spec = {"harm_file": harm_file}
+
+    first = svc.load_slate("wk1", slate_spec)
+    assert svc.load_slate("wk1", slate_spec) is first
+    write_harm_file(harm_file, num_teams=4, seed=1)
+    stat = os.stat(harm_file)
+    os.utime(harm_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert svc.load_slate("wk1", slate_spec) is not first
+    assert list(svc._loaded_slates) == ["wk1"]
+
+
+def test_error_status(tmp_path):
+    harm_file = str(tmp_path / "dfk_harm_wk1_2019.csv")
+    write_harm_file(harm_file, num_teams=4)
+
+    async def fail(payload):
+        raise RuntimeError("boom")
+
+    async def expect_status(request, status):
+        with pytest.raises(DFSException, match=r"\({0}\)".format(status)):
+            await request
+
+    async def test(service, client):
+        await client.register_slate("wk1", harm_file=harm_file)
+        await expect_status(client.generate_lineups("unknown"), 400)
+        await expect_status(client.generate_lineups("wk1", lock=["Nobody"]), 400)
+        await expect_status(client.generate_lineups("wk1", max_overlaps=3), 400)
+        await expect_status(client.register_slate("wk2", harm_file=str(tmp_path / "missing.csv")), 400)
+        await expect_status(client.request("GET", "/unknown"), 404)
+
+        service.routes[("GET", "/health")] = fail
+        await expect_status(client.health(), 500)
+
+        metrics = (await client.get_metrics())["routes"]
+        assert metrics["POST /lineups"]["errors"] == 3
+        assert metrics["GET /health"]["errors"] == 1
+
+    asyncio.run(run_service(test))
+
+
+def test_restarts_workers_after_worker_dies(tmp_path):
+    harm_file = str(tmp_path / "dfk_harm_wk1_2019.csv")
+    write_harm_file(harm_file, num_teams=4)
+
+    async def test(service, client):
+        await client.register_slate("wk1", harm_file=harm_file)
+        await client.generate_lineups("wk1")
+        for process in list(service.executor._processes.values()):
+            process.kill()
+
+        with pytest.raises(DFSException, match=r"\(500\)"):
+            await client.generate_lineups("wk1")
+        assert len((await client.generate_lineups("wk1", 2))["lineups"]) == 2
+
+    asyncio.run(run_service(test))
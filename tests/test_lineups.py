@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+import constants as cols
+import lineups
+import optimizer as opt
+from lineups import LineupSet
+from utils import DFSException
+
+# Not a multiple of 8 so the last bitset byte is padded
+NUM_PLAYERS = 301
+
+
+def make_lineups(num_lineups, seed=0):
+    rng = np.random.RandomState(seed)
+    return [rng.choice(NUM_PLAYERS, lineups.DK_ROSTER_SIZE, replace=False) for _ in range(num_lineups)]
+
+
+def get_overlap(lineup, other):
+    return len(set(lineup) & set(other))
+
+
+def test_overlap_with_matches_set_intersection():
+    player_idx = make_lineups(50)
+    lineup_set = LineupSet.from_lineups(NUM_PLAYERS, player_idx)
+    for lineup in make_lineups(5, seed=1) + player_idx[:2]:
+        assert list(lineup_set.overlap_with(lineup)) == [get_overlap(other, lineup) for other in player_idx]
+
+
+def test_pairwise_overlap_matches_set_intersection():
+    player_idx = make_lineups(20)
+    other_idx = make_lineups(15, seed=1)
+    overlap = LineupSet.from_lineups(NUM_PLAYERS, player_idx).pairwise_overlap(
+        LineupSet.from_lineups(NUM_PLAYERS, other_idx))
+    assert overlap.tolist() == [[get_overlap(lineup, other) for other in other_idx] for lineup in player_idx]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, lineups.OVERLAP_CHUNK_SIZE])
+def test_max_overlap_matches_set_intersection(chunk_size, monkeypatch):
+    monkeypatch.setattr(lineups, "OVERLAP_CHUNK_SIZE", chunk_size)
+    player_idx = make_lineups(40)
+    other_idx = make_lineups(10, seed=1)
+    lineup_set = LineupSet.from_lineups(NUM_PLAYERS, player_idx)
+
+    expected = [max(get_overlap(lineup, other) for j, other in enumerate(player_idx) if j != i)
+                for i, lineup in enumerate(player_idx)]
+    assert list(lineup_set.max_overlap()) == expected
+    expected = [max(get_overlap(lineup, other) for other in other_idx) for lineup in player_idx]
+    assert list(lineup_set.max_overlap(LineupSet.from_lineups(NUM_PLAYERS, other_idx))) == expected
+
+
+def test_dedup_ignores_player_order():
+    player_idx = make_lineups(3)
+    lineup_set = LineupSet.from_lineups(NUM_PLAYERS, player_idx)
+    assert not lineup_set.add(player_idx[1][::-1])
+    assert len(lineup_set) == 3
+    assert player_idx[2][::-1] in lineup_set
+    assert make_lineups(1, seed=1)[0] not in lineup_set
+
+    assert lineup_set.add(player_idx[1][::-1], dedup=False)
+    assert lineup_set.extend(player_idx, dedup=True) == 0
+    unique = lineup_set.unique()
+    assert [list(lineup) for lineup in unique] == [sorted(lineup) for lineup in player_idx]
+
+
+def test_take_keeps_order_and_bits():
+    player_idx = make_lineups(10)
+    lineup_set = LineupSet.from_lineups(NUM_PLAYERS, player_idx)
+    taken = lineup_set.take([7, 2, 2, 5])
+    assert [list(lineup) for lineup in taken] == [sorted(player_idx[i]) for i in [7, 2, 2, 5]]
+    assert np.array_equal(taken.bits, lineup_set.bits[[7, 2, 2, 5]])
+    assert len(lineup_set.take([])) == 0
+
+
+def test_growth_past_initial_capacity():
+    player_idx = make_lineups(3 * lineups.INITIAL_CAPACITY + 5)
+    lineup_set = LineupSet(NUM_PLAYERS, capacity=2)
+    assert lineup_set.extend(player_idx) == len(player_idx)
+    assert [list(lineup) for lineup in lineup_set] == [sorted(lineup) for lineup in player_idx]
+    assert list(lineup_set.overlap_with(player_idx[-1])) == [get_overlap(lineup, player_idx[-1])
+                                                             for lineup in player_idx]
+    assert np.array_equal(lineup_set.player_exposure(),
+                          np.bincount(np.concatenate(player_idx), minlength=NUM_PLAYERS))
+
+
+def test_rejects_wrong_roster_size():
+    with pytest.raises(DFSException):
+        LineupSet(NUM_PLAYERS).add([1, 2, 3])
+
+
+def test_dk_csv_round_trip(synthetic_slate, tmp_path):
+    generated, _ = opt.generate_lineups(synthetic_slate, 5, max_overlap=6)
+    lineup_set = LineupSet.from_lineups(synthetic_slate.num_players, generated)
+    csv_file = str(tmp_path / "upload.csv")
+    upload = lineup_set.to_dk_csv(csv_file, synthetic_slate)
+
+    assert list(upload.columns) == lineups.DK_SLOTS
+    positions = synthetic_slate.data.set_index(cols.NAME_FIELD)[cols.POS_FIELD]
+    for i, slot in enumerate(lineups.DK_SLOTS):
+        slot_positions = positions[upload.iloc[:, i]]
+        if slot == lineups.FLEX_SLOT:
+            assert slot_positions.isin(lineups.DK_FLEX_POS).all()
+        else:
+            assert (slot_positions == lineups.DK_SLOT_POS.get(slot, slot)).all()
+
+    read = LineupSet.from_dk_csv(csv_file, synthetic_slate)
+    assert np.array_equal(read.player_idx, lineup_set.player_idx)
+
+
+def test_frame_round_trip(synthetic_slate):
+    generated, _ = opt.generate_lineups(synthetic_slate, 3, max_overlap=6)
+    lineup_set = LineupSet.from_lineups(synthetic_slate.num_players, generated)
+    frame = lineup_set.to_frame(synthetic_slate)
+    read = LineupSet.from_frame(synthetic_slate, frame, id_col=cols.NAME_FIELD)
+    assert np.array_equal(read.player_idx, lineup_set.player_idx)
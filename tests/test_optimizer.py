@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import optimizer as opt
+
+NUM_LINEUPS = 8
+
+
+def test_is_feasible_checks_column_and_row_bounds(synthetic_slate):
+    model = opt.build_lineup_model(synthetic_slate)
+    lineups, _ = opt.generate_lineups(synthetic_slate, 1)
+    values = np.zeros(model.num_cols)
+    values[lineups[0].player_idx] = 1
+    assert model.is_feasible(values)[0]
+
+    # Its own overlap cut and fixing out one of its players each make it infeasible
+    cut = model.add_max_overlap_cut(lineups[0].player_idx, 6)
+    assert not model.is_feasible(values)[0]
+    model.set_row_bounds(cut, -np.inf, np.inf)
+    model.set_col_bounds(lineups[0].player_idx[0], 0, 0)
+    assert list(model.is_feasible(np.vstack([values, np.zeros(model.num_cols)]))) == [False, False]
+
+
+def test_highs_warm_starts_from_feasible_solutions(synthetic_slate):
+    pytest.importorskip("highspy")
+    pulp_lineups, _ = opt.generate_lineups(synthetic_slate, NUM_LINEUPS, backend="pulp", max_overlap=5,
+                                           max_exposure=0.5)
+    highs_lineups, generator = opt.generate_lineups(synthetic_slate, NUM_LINEUPS, backend="highs", max_overlap=5,
+                                                    max_exposure=0.5)
+
+    np.testing.assert_allclose([lineup.objective for lineup in highs_lineups],
+                               [lineup.objective for lineup in pulp_lineups], atol=1e-6)
+    backend = generator.backend
+    assert 0 < backend.num_warm_starts < backend.num_solves
+    assert len(backend.solutions) <= opt.MAX_WARM_START_SOLUTIONS
+
+
+def test_generator_status_when_lineups_run_out(synthetic_slate):
+    model = opt.build_lineup_model(synthetic_slate)
+    model.set_col_bounds(np.flatnonzero(synthetic_slate.pos_codes == synthetic_slate.pos_index("QB")), 0, 0)
+    generator = opt.LineupGenerator(model)
+    assert generator.generate(2) == []
+    assert generator.status == opt.GENERATION_EXHAUSTED
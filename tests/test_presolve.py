@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import optimizer as opt
+import presolve
+
+# (num lineups, model config, generator config). Team and stack rows split constraint classes so fewer
+# players are pruned
+CONFIGS = {"single": (1, {}, {}),
+           "multiple": (10, {}, {}),
+           "max_overlap": (10, {}, {"max_overlap": 5}),
+           "exposure": (10, {}, {"max_exposure": 0.3, "max_qb_exposure": 0.2}),
+           "max_per_team": (10, {"max_per_team": 3}, {}),
+           "qb_stack": (10, {"min_qb_stack": 2}, {}),
+           "game_stacks": (5, {"game_stacks": [3, 2]}, {"max_overlap": 6})}
+
+
+def get_lineup_keys(lineups):
+    return [tuple(sorted(lineup.player_idx)) for lineup in lineups]
+
+
+@pytest.mark.parametrize("config", sorted(CONFIGS))
+def test_presolve_matches_full_model(synthetic_slate, config):
+    num_lineups, model_config, generator_config = CONFIGS[config]
+    full_lineups, _ = opt.generate_lineups(synthetic_slate, num_lineups, **generator_config, **model_config)
+    lineups, _, result = presolve.generate_lineups(synthetic_slate, num_lineups, **generator_config, **model_config)
+
+    assert len(lineups) == len(full_lineups) == num_lineups
+    np.testing.assert_allclose([lineup.objective for lineup in lineups],
+                               [lineup.objective for lineup in full_lineups], atol=1e-6)
+    # Projections are continuous so there are no ties that could swap lineups
+    assert get_lineup_keys(lineups) == get_lineup_keys(full_lineups)
+    assert result.stats["players"] == synthetic_slate.num_players
+
+
+def test_presolve_removes_players_for_single_lineup(synthetic_slate):
+    result = presolve.presolve_model(opt.build_lineup_model(synthetic_slate))
+    assert result.stats["players_removed"] > 0
+    assert result.model.num_players == synthetic_slate.num_players - result.stats["players_removed"]
+
+
+def test_presolve_removes_fewer_players_for_more_lineups(synthetic_slate):
+    model = opt.build_lineup_model(synthetic_slate)
+    single = presolve.presolve_model(model, 1)
+    multiple = presolve.presolve_model(model, 10, max_overlap=5)
+    assert set(multiple.player_idx) >= set(single.player_idx)
+
+
+def test_presolve_keeps_locked_players(synthetic_slate):
+    model = opt.build_lineup_model(synthetic_slate)
+    worst = int(np.argmin(model.objective[:model.num_players]))
+    assert worst not in presolve.presolve_model(model).player_idx
+
+    model.col_lb[worst] = 1
+    result = presolve.presolve_model(model)
+    assert worst in result.player_idx
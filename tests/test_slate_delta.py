@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+import constants as cols
+import data_import as imp
+import optimizer as opt
+import slate_delta
+import synthetic_data
+
+NUM_LINEUPS = 10
+
+
+@pytest.fixture(scope="module")
+def slate_files(tmp_path_factory):
+    # DK price list, projections and a midweek refresh where two rostered players lose a little and another
+    # falls under the projection cutoff. Picks the players in the fewest lineups so only some are re-solved,
+    # and the small change keeps re-solved lineups among the best so their relaxed cuts are needed
+    tmp_dir = tmp_path_factory.mktemp("slate_delta")
+    data = synthetic_data.make_harmonized_data(num_teams=16).drop_duplicates(subset=[cols.NAME_FIELD])
+    data = data.reset_index(drop=True)
+    dfs_file = str(tmp_dir / "dk_prices_wk1_2019.csv")
+    proj_file = str(tmp_dir / "ffa_projections_scoring_wk1.csv")
+    synthetic_data.write_dk_prices(data, dfs_file)
+    synthetic_data.write_projections(data, proj_file)
+
+    harmonized = slate_delta.HarmonizedSlate.from_files(dfs_file, proj_file)
+    lineups, _ = opt.generate_lineups(harmonized.slate, NUM_LINEUPS)
+    num_lineups = np.bincount(np.concatenate([lineup.player_idx for lineup in lineups]),
+                              minlength=harmonized.slate.num_players)
+    rostered = np.flatnonzero(num_lineups)
+    out, *changed = harmonized.slate.data[cols.NAME_FIELD].to_numpy()[rostered[np.argsort(num_lineups[rostered],
+                                                                                          kind="stable")[:3]]]
+
+    refreshed = data.copy()
+    refreshed.loc[refreshed[cols.NAME_FIELD].isin(changed), cols.PROJ_POINTS_FIELD] -= 0.01
+    refreshed.loc[refreshed[cols.NAME_FIELD] == out, cols.PROJ_POINTS_FIELD] = 1.0
+    refresh_file = str(tmp_dir / "ffa_projections_scoring_wk1_midweek.csv")
+    synthetic_data.write_projections(refreshed, refresh_file)
+    return dfs_file, proj_file, refresh_file
+
+
+@pytest.mark.parametrize("backend", ["pulp", "highs", "dp"])
+def test_refreshed_lineups_match_rebuilt_slate(slate_files, backend):
+    if backend == "highs":
+        pytest.importorskip("highspy")
+    dfs_file, proj_file, refresh_file = slate_files
+    harmonized = slate_delta.HarmonizedSlate.from_files(dfs_file, proj_file)
+    generator = opt.LineupGenerator(opt.build_lineup_model(harmonized.slate), backend)
+    generator.generate(NUM_LINEUPS)
+
+    delta = harmonized.diff_projections(imp.FFAProjectionsImporter(refresh_file).data)
+    assert delta.summary() == {"changed": 2, "out": 1, "returned": 0, "new_players": 0, "salary_changed": 0}
+    harmonized.apply(delta, generator.model, generator)
+    new_lineups = slate_delta.refresh_lineups(generator, delta)
+    assert 0 < len(new_lineups) < NUM_LINEUPS
+
+    # Patched objective matches the rebuilt slate for every available player
+    rebuilt = slate_delta.HarmonizedSlate.from_files(dfs_file, refresh_file)
+    rebuilt_model = opt.build_lineup_model(rebuilt.slate)
+    rebuilt_idx = slate_delta.get_player_keys(rebuilt.slate.data).get_indexer(harmonized.player_keys)
+    available = np.flatnonzero(harmonized.available)
+    assert len(available) == rebuilt.slate.num_players and np.all(rebuilt_idx[available] >= 0)
+    np.testing.assert_allclose(generator.model.objective[available], rebuilt_model.objective[rebuilt_idx[available]])
+
+    # Projections only went down so the kept lineups are still among the best and the refreshed portfolio
+    # is the rebuilt slate's top lineups
+    rebuilt_lineups = opt.LineupGenerator(rebuilt_model, backend).generate(NUM_LINEUPS)
+    np.testing.assert_allclose(sorted(lineup.objective for lineup in generator.lineups),
+                               sorted(lineup.objective for lineup in rebuilt_lineups), atol=1e-6)
+    for lineup in generator.lineups:
+        assert harmonized.available[lineup.player_idx].all()
+        assert np.isclose(lineup.objective, generator.model.objective[lineup.player_idx].sum())
+    assert len(generator.lineup_set.unique()) == NUM_LINEUPS
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import optimizer as opt
+import stacking
+from enumerated_stacking import build_enumerated_model
+
+# Aggregated stack and opposing position rows must give the same optimum as enumerating every combination
+CONFIGS = {"qb_wr": {"stacks": [["QB", "WR"]]},
+           "qb_wr_wr": {"stacks": [["QB", "WR", "WR"]]},
+           "qb_flex_opp_wr": {"stacks": [["QB", "WR/TE:1", "-WR"]]},
+           "two_stacks": {"stacks": [["QB", "WR"], ["RB", "D"]]},
+           "opposing_exclusions": {"opposing_player_exclusions": [["QB", "D"], ["RB", "D"], ["WR", "D"]]},
+           "stacks_and_exclusions": {"stacks": [["QB", "WR/TE:1", "-WR"]],
+                                     "opposing_player_exclusions": [["QB", "D"], ["RB", "D"], ["WR", "D"]]},
+           "near_identical_players": {"stacks": [["QB", "WR", "-WR"]], "point_diff_for_identical": 3},
+           "ceil_with_max_per_team": {"stacks": [["QB", "WR", "-WR"]], "proj_type": "ceil", "max_per_team": 4}}
+
+
+@pytest.mark.parametrize("config", sorted(CONFIGS))
+def test_aggregated_stacks_match_enumerated_model(synthetic_slate, config):
+    model_config = CONFIGS[config]
+    aggregated = opt.build_lineup_model(synthetic_slate, **model_config)
+    enumerated = build_enumerated_model(synthetic_slate, **model_config)
+    aggregated_solution = opt.get_backend(aggregated).solve()
+    enumerated_solution = opt.get_backend(enumerated).solve()
+
+    assert aggregated_solution.status == enumerated_solution.status == "optimal"
+    assert np.isclose(aggregated_solution.objective, enumerated_solution.objective)
+
+
+def test_stack_set_rejects_invalid_stacks():
+    with pytest.raises(stacking.InvalidStackError):
+        stacking.StackSet([["QB"]], opt.DK_POS_MAX, 9)
+    with pytest.raises(stacking.InvalidStackError):
+        stacking.StackSet([["-WR", "-TE"]], opt.DK_POS_MAX, 9)